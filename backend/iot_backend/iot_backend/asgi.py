@@ -13,4 +13,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'iot_backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from timeseries.buffer import lifespan  # noqa: E402  (needs the app registry loaded above)
+
+
+async def application(scope, receive, send):
+    # Django does not speak the lifespan protocol; it is used here to flush the ingest write buffer
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -20,6 +20,7 @@ INSTALLED_APPS = [
 
     # Third-party apps
     'rest_framework',
+    'django_filters',
     'corsheaders',
 
     # Your app
@@ -106,3 +107,18 @@ REST_FRAMEWORK = {}
 
 # CORS settings (allow all for development)
 CORS_ALLOW_ALL_ORIGINS = True
+
+# Rows per rolling correlation window stored with TimeSeriesData (0 disables them)
+TIMESERIES_CORRELATION_WINDOW = 20
+
+# Request bodies up to 10 MB, enough for a full bulk upload of readings
+DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024
+
+# Write buffer of the async ingest endpoint (timeseries.buffer)
+INGEST_BUFFER = {
+    'FLUSH_SIZE': 5000,
+    'FLUSH_INTERVAL': 0.2,
+    'MAX_PENDING': 50000,
+    'MAX_RETRIES': 5,
+    'RETRY_BACKOFF': 0.5,
+}
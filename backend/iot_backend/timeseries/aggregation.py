@@ -0,0 +1,123 @@
+import math
+import re
+
+from django.db.models import Avg, Count, Func, IntegerField, Max, Min, StdDev, Sum
+from rest_framework.exceptions import ValidationError
+
+BUCKET_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+AGGREGATES = {
+    'mean': Avg,
+    'min': Min,
+    'max': Max,
+    'sum': Sum,
+    'std': lambda field: StdDev(field, sample=True),
+}
+
+
+def parse_bucket(value):
+    """Bucket width in seconds from strings like '30s', '5m', '1h' or '1d'."""
+    match = re.fullmatch(r'(\d+)([smhd])', value or '')
+    if not match or int(match.group(1)) == 0:
+        raise ValidationError({'bucket': f"Invalid bucket {value!r}; use e.g. 30s, 5m, 1h or 1d."})
+    return int(match.group(1)) * BUCKET_UNITS[match.group(2)]
+
+
+def parse_list(value, allowed, name, default):
+    """Comma-separated choices from a query parameter, checked against `allowed`."""
+    items = [item.strip() for item in value.split(',') if item.strip()] if value else list(default)
+    unknown = [item for item in items if item not in allowed]
+    if unknown or not items:
+        raise ValidationError({name: f"Unknown {name}: {', '.join(unknown) or '(none)'}; "
+                                     f"choose from {', '.join(allowed)}."})
+    return items
+
+
+class EpochBucket(Func):
+    """
+    Start of the fixed-width time bucket containing a datetime, in seconds since the epoch.
+
+    Floors toward minus infinity, so buckets line up on multiples of the width before and
+    after 1970 alike.
+    """
+    output_field = IntegerField()
+
+    def __init__(self, expression, seconds, **extra):
+        self.seconds = int(seconds)
+        super().__init__(expression, **extra)
+
+    def _bucket_sql(self, compiler, connection, epoch_template, **extra_context):
+        sql, params = compiler.compile(self.source_expressions[0])
+        epoch = epoch_template % sql
+        width = self.seconds
+        return f'({epoch} - ((({epoch}) %% {width} + {width}) %% {width}))', params * 2
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self._bucket_sql(compiler, connection, "CAST(strftime('%%%%s', %s) AS INTEGER)")
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self._bucket_sql(compiler, connection, 'CAST(FLOOR(EXTRACT(EPOCH FROM %s)) AS BIGINT)')
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self._bucket_sql(compiler, connection, 'CAST(UNIX_TIMESTAMP(%s) AS SIGNED)')
+
+
+def aggregate_buckets(queryset, time_field, fields, aggs, seconds):
+    """
+    Group a queryset into fixed-width time buckets in the database and return the result as columns.
+
+    Returns:
+    - {'bucket_seconds', 'time' (bucket starts, epoch seconds), 'count' (rows per bucket),
+      and one {agg: [values]} column group per field}, ordered by time.
+    """
+    annotations = {'rows': Count('pk')}
+    for field in fields:
+        for agg in aggs:
+            annotations[f'{field}_{agg}'] = AGGREGATES[agg](field)
+
+    rows = (queryset.order_by()
+            .annotate(bucket=EpochBucket(time_field, seconds))
+            .values('bucket')
+            .annotate(**annotations)
+            .order_by('bucket'))
+    names = ['bucket', *annotations]
+    columns = dict(zip(names, map(list, zip(*rows.values_list(*names))))) or {name: [] for name in names}
+
+    return {
+        'bucket_seconds': seconds,
+        'rollup': None,
+        'time': columns['bucket'],
+        'count': columns['rows'],
+        **{field: {agg: columns[f'{field}_{agg}'] for agg in aggs} for field in fields},
+    }
+
+
+def _statistic(agg, count, total, total_sq, low, high):
+    if agg == 'mean':
+        return total / count
+    if agg == 'min':
+        return low
+    if agg == 'max':
+        return high
+    if agg == 'sum':
+        return total
+    # Sample standard deviation from the sums, like StdDev(sample=True)
+    return math.sqrt(max(total_sq - total * total / count, 0.0) / (count - 1)) if count > 1 else None
+
+
+def columns_from_statistics(stats, fields, aggs, seconds, resolution):
+    """
+    Columnar payload, in the format of aggregate_buckets, from per-bucket sums
+    ({bucket epoch: {field: [count, sum, sum_sq, min, max]}}, as built from the rollups).
+    """
+    buckets = list(stats)
+    return {
+        'bucket_seconds': seconds,
+        'rollup': resolution,
+        'time': buckets,
+        'count': [max(values[0] for values in stats[bucket].values()) for bucket in buckets],
+        **{field: {agg: [_statistic(agg, *stats[bucket][field]) if field in stats[bucket] else None
+                         for bucket in buckets]
+                   for agg in aggs}
+           for field in fields},
+    }
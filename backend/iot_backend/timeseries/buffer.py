@@ -0,0 +1,231 @@
+import asyncio
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+
+from .readings import ensure_streams, insert_readings
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'FLUSH_SIZE': 5000,       # rows that trigger a flush
+    'FLUSH_INTERVAL': 0.2,    # seconds a row waits at most before its flush starts
+    'MAX_PENDING': 50000,     # rows held before pushes are refused
+    'MAX_RETRIES': 5,         # failed flushes of a batch retried before it is dropped
+    'RETRY_BACKOFF': 0.5,     # seconds before the first retry, doubled for each one after
+}
+
+
+def write_readings(stream_ids, times, values):
+    """insert_readings in one transaction."""
+    with transaction.atomic():
+        insert_readings(stream_ids, times, values)
+
+
+def register_streams(keys, known):
+    """Stream ids of (device_id, metric_name) pairs, from `known` or registered; `known` is updated."""
+    missing = {}
+    for device_id, metric_name in keys:
+        if (device_id, metric_name) not in known:
+            missing.setdefault(device_id, []).append(metric_name)
+    for device_id, metrics in missing.items():
+        for metric_name, stream_id in ensure_streams(device_id, metrics).items():
+            known[device_id, metric_name] = stream_id
+    return [known[key] for key in keys]
+
+
+class WriteBuffer:
+    """
+    In-process queue of readings pushed through the ASGI app, written to the database in bulk.
+
+    A flush starts when FLUSH_SIZE rows are pending or FLUSH_INTERVAL after the oldest pending
+    row arrived, and writes everything pending with one transaction of multi-row INSERTs.
+    Pushes that would hold more than MAX_PENDING rows, counting those of a flush still being
+    written, are refused, so a slow database shows up as backpressure (429) instead of
+    unbounded memory.
+
+    A failed flush puts its rows back at the front of the queue, where they keep counting
+    against MAX_PENDING, and is retried after RETRY_BACKOFF seconds, doubled on each further
+    failure. A batch is dropped, logged and counted in rows_dropped only after MAX_RETRIES
+    retries have failed.
+
+    Requests never touch the database: streams are registered and rows written by the flushes,
+    which run one at a time on a dedicated thread. The buffer belongs to one event loop; pending
+    rows are lost if the process dies before they are flushed, and close() flushes them on a
+    clean shutdown.
+    """
+
+    def __init__(self, flush_size=None, flush_interval=None, max_pending=None, max_retries=None,
+                 retry_backoff=None):
+        config = {**DEFAULTS, **getattr(settings, 'INGEST_BUFFER', {})}
+        self.flush_size = flush_size or config['FLUSH_SIZE']
+        self.flush_interval = flush_interval or config['FLUSH_INTERVAL']
+        self.max_pending = max_pending or config['MAX_PENDING']
+        self.max_retries = config['MAX_RETRIES'] if max_retries is None else max_retries
+        self.retry_backoff = retry_backoff or config['RETRY_BACKOFF']
+
+        self._chunks = []
+        self._pending = 0
+        self._inflight = 0
+        self._oldest = None
+        self._failures = 0
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._task = None
+        self._streams = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ingest-flush')
+        self.stats = {'flushes': 0, 'rows_flushed': 0, 'rows_refused': 0, 'pushes_refused': 0,
+                      'flush_errors': 0, 'rows_dropped': 0, 'last_flush_rows': 0, 'last_flush_ms': None,
+                      'max_flush_ms': None, 'total_flush_ms': 0.0}
+
+    def offer(self, device_id, metric_name, times, values):
+        """Queue the readings of one device metric; False, with nothing queued, when the buffer is full."""
+        if self._closing or self.pending + len(times) > self.max_pending:
+            self.stats['pushes_refused'] += 1
+            self.stats['rows_refused'] += len(times)
+            return False
+        if self._task is None:
+            # A fresh context, so the flusher does not inherit the request that happened to start it
+            self._task = asyncio.get_running_loop().create_task(self._run(), context=contextvars.Context())
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        self._chunks.append(((device_id, metric_name), times, values))
+        self._pending += len(times)
+        self._wakeup.set()
+        return True
+
+    @property
+    def pending(self):
+        """Rows queued or being written by the running flush."""
+        return self._pending + self._inflight
+
+    async def _run(self):
+        while True:
+            # Sleep until rows arrive, then until the batch is full or the oldest row is due
+            while not self._pending and not self._closing:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            while self._pending < self.flush_size and not self._closing:
+                remaining = self._oldest + self.flush_interval - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            if self._pending:
+                try:
+                    await self.flush()
+                except Exception:
+                    logger.exception('Write buffer flush failed')
+                    if self._failures:
+                        await asyncio.sleep(self.retry_backoff * 2 ** (self._failures - 1))
+            elif self._closing:
+                return
+
+    async def flush(self):
+        """Write everything pending now; on failure the rows are queued again for a retry, or dropped."""
+        chunks, rows, oldest = self._chunks, self._pending, self._oldest
+        self._chunks, self._pending, self._oldest = [], 0, None
+        if not chunks:
+            return
+
+        times = chunks[0][1].append([chunk[1] for chunk in chunks[1:]])
+        values = np.concatenate([chunk[2] for chunk in chunks])
+
+        began = time.perf_counter()
+        self._inflight = rows
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._write, chunks, times, values)
+        except Exception:
+            self.stats['flush_errors'] += 1
+            self._failures += 1
+            if self._failures > self.max_retries:
+                self._failures = 0
+                self.stats['rows_dropped'] += rows
+                logger.error('Write buffer dropped %d rows after %d failed flushes', rows, self.max_retries + 1)
+            else:
+                # Back at the front of the queue, ahead of rows pushed during the write
+                self._chunks[:0] = chunks
+                self._pending += rows
+                self._oldest = oldest
+            raise
+        finally:
+            self._inflight = 0
+            elapsed = (time.perf_counter() - began) * 1000
+            self.stats['last_flush_ms'] = elapsed
+            self.stats['max_flush_ms'] = max(self.stats['max_flush_ms'] or 0.0, elapsed)
+        self._failures = 0
+        self.stats['flushes'] += 1
+        self.stats['rows_flushed'] += rows
+        self.stats['last_flush_rows'] = rows
+        self.stats['total_flush_ms'] += elapsed
+
+    def _write(self, chunks, times, values):
+        # Runs on the flush thread, which keeps its own database connection between flushes
+        close_old_connections()
+        streams = register_streams([key for key, _, _ in chunks], self._streams)
+        stream_ids = []
+        for stream_id, (_, chunk_times, _) in zip(streams, chunks):
+            stream_ids += [stream_id] * len(chunk_times)
+        write_readings(stream_ids, times, values)
+
+    async def close(self):
+        """Flush what is pending and stop; later pushes are refused."""
+        self._closing = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            await asyncio.get_running_loop().run_in_executor(self._executor, connections.close_all)
+        self._executor.shutdown()
+
+    def metrics(self):
+        stats = dict(self.stats)
+        total = stats.pop('total_flush_ms')
+        return {
+            'queue_depth': self.pending,
+            'in_flight': self._inflight,
+            'capacity': self.max_pending,
+            'flush_size': self.flush_size,
+            'flush_interval_ms': self.flush_interval * 1000,
+            'failed_attempts': self._failures,
+            'avg_flush_ms': total / stats['flushes'] if stats['flushes'] else None,
+            **stats,
+        }
+
+
+_buffers = {}
+
+
+def get_buffer():
+    """The write buffer of the running event loop."""
+    loop = asyncio.get_running_loop()
+    for closed in [other for other in _buffers if other.is_closed()]:
+        del _buffers[closed]
+    if loop not in _buffers:
+        _buffers[loop] = WriteBuffer()
+    return _buffers[loop]
+
+
+async def close_buffers():
+    for buffer in list(_buffers.values()):
+        await buffer.close()
+    _buffers.clear()
+
+
+async def lifespan(receive, send):
+    """ASGI lifespan protocol: flush the write buffer on shutdown."""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_buffers()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
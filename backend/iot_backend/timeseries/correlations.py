@@ -0,0 +1,132 @@
+import math
+
+import numpy as np
+from django.conf import settings
+
+from .models import TimeSeriesData
+
+# Materialized correlation columns of TimeSeriesData and the sensor pair behind each
+PAIRS = {
+    'correlation_s1_s2': ('sensor1', 'sensor2'),
+    'correlation_s2_s3': ('sensor2', 'sensor3'),
+    'correlation_s1_s3': ('sensor1', 'sensor3'),
+}
+SENSORS = ('sensor1', 'sensor2', 'sensor3')
+
+DEFAULT_WINDOW = 20
+
+# Windows whose variance from the running sums is below this fraction of the batch's total sum
+# of squares are too close to the rounding noise of the sums; they are recomputed directly
+RECHECK_RTOL = 1e-8
+
+
+def correlation_window():
+    """Rows per rolling correlation window (settings.TIMESERIES_CORRELATION_WINDOW); 0 disables them."""
+    return getattr(settings, 'TIMESERIES_CORRELATION_WINDOW', DEFAULT_WINDOW)
+
+
+def _window_sums(v, window):
+    c = np.concatenate([[0.0], np.cumsum(v)])
+    return c[window:] - c[:-window]
+
+
+def _window_pearson(x, y, starts, window):
+    """Direct two-pass correlation of the windows of x and y starting at `starts`, NaN where flat."""
+    offsets = np.arange(window)
+    wx = x[starts[:, None] + offsets]
+    wy = y[starts[:, None] + offsets]
+    dx = wx - wx.mean(axis=1, keepdims=True)
+    dy = wy - wy.mean(axis=1, keepdims=True)
+    vx = (dx * dx).sum(axis=1)
+    vy = (dy * dy).sum(axis=1)
+
+    # Spread left over from rounding the mean of a constant window is treated as zero
+    eps = np.finfo(np.float64).eps
+    flat = (vx <= window * (8 * eps * np.abs(wx).max(axis=1)) ** 2) | \
+        (vy <= window * (8 * eps * np.abs(wy).max(axis=1)) ** 2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        corr = np.clip((dx * dy).sum(axis=1) / np.sqrt(vx * vy), -1.0, 1.0)
+    return np.where(flat, np.nan, corr)
+
+
+def rolling_correlations(columns, window):
+    """
+    Pearson correlation of each sensor pair over the trailing `window` rows, for every row.
+
+    Parameters:
+    - columns: {sensor: values} in time order.
+    - window: Rows per window.
+
+    Returns:
+    - {correlation field: array}, NaN for the first window - 1 rows and for flat windows.
+    """
+    n = len(columns[SENSORS[0]])
+    out = {field: np.full(n, np.nan) for field in PAIRS}
+    if window < 2 or n < window:
+        return out
+
+    # Centering first keeps the differences of the running sums accurate
+    values = {}
+    for sensor in SENSORS:
+        v = np.asarray(columns[sensor], dtype=np.float64)
+        values[sensor] = v - v.mean()
+    sums = {sensor: _window_sums(v, window) for sensor, v in values.items()}
+    squares = {sensor: _window_sums(v * v, window) for sensor, v in values.items()}
+    spread = {sensor: squares[sensor] - sums[sensor] ** 2 / window for sensor in SENSORS}
+    recheck = {sensor: spread[sensor] <= RECHECK_RTOL * np.dot(v, v) for sensor, v in values.items()}
+
+    for field, (a, b) in PAIRS.items():
+        cross = _window_sums(values[a] * values[b], window) - sums[a] * sums[b] / window
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = np.clip(cross / np.sqrt(spread[a] * spread[b]), -1.0, 1.0)
+        starts = np.flatnonzero(recheck[a] | recheck[b])
+        corr[starts] = _window_pearson(values[a], values[b], starts, window)
+        out[field][window - 1:] = corr
+    return out
+
+
+def _rows(queryset):
+    return list(queryset.values_list('id', *SENSORS))
+
+
+def _to_column(values):
+    return [None if math.isnan(value) else float(value) for value in values]
+
+
+def append_correlations(start, columns, window):
+    """
+    Correlations for new rows, in time order, that all come after the stored rows, using the
+    window - 1 stored rows before `start` (the first new timestamp) as context.
+
+    Returns:
+    - {correlation field: [values]} aligned with `columns`, None where undefined.
+    """
+    before = _rows(TimeSeriesData.objects.filter(timestamp__lt=start).order_by('-timestamp', '-id')[:window - 1])[::-1]
+    context = {sensor: [row[1 + i] for row in before] + list(columns[sensor]) for i, sensor in enumerate(SENSORS)}
+    corr = rolling_correlations(context, window)
+    return {field: _to_column(values[len(before):]) for field, values in corr.items()}
+
+
+def refresh_correlations(start, end, window=None):
+    """
+    Recompute the stored correlations of the rows in [start, end] and of the window - 1 rows
+    after it, the only rows whose windows can include a row inserted, changed or deleted in
+    that range. Rows further away are not read.
+    """
+    window = correlation_window() if window is None else window
+    if window < 2:
+        return
+    ordered = TimeSeriesData.objects.order_by('timestamp', 'id')
+    before = _rows(TimeSeriesData.objects.filter(timestamp__lt=start).order_by('-timestamp', '-id')[:window - 1])[::-1]
+    rows = before + _rows(ordered.filter(timestamp__gte=start, timestamp__lte=end)) + \
+        _rows(ordered.filter(timestamp__gt=end)[:window - 1])
+    if len(rows) == len(before):
+        return
+
+    ids, *values = zip(*rows)
+    corr = rolling_correlations(dict(zip(SENSORS, values)), window)
+    columns = {field: _to_column(values[len(before):]) for field, values in corr.items()}
+    TimeSeriesData.objects.bulk_update(
+        [TimeSeriesData(id=row_id, **{field: columns[field][i] for field in PAIRS})
+         for i, row_id in enumerate(ids[len(before):])],
+        list(PAIRS), batch_size=1000)
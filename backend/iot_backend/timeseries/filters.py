@@ -0,0 +1,42 @@
+import django_filters
+
+from .models import TimeSeriesData, ProcessedSensorData, SensorStream, SensorReading
+
+
+class TimeSeriesDataFilter(django_filters.FilterSet):
+    start = django_filters.IsoDateTimeFilter(field_name='timestamp', lookup_expr='gte')
+    end = django_filters.IsoDateTimeFilter(field_name='timestamp', lookup_expr='lte')
+
+    class Meta:
+        model = TimeSeriesData
+        fields = ['start', 'end']
+
+
+class ProcessedSensorDataFilter(django_filters.FilterSet):
+    start = django_filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='gte')
+    end = django_filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='lte')
+
+    class Meta:
+        model = ProcessedSensorData
+        fields = ['start', 'end']
+
+
+class SensorStreamFilter(django_filters.FilterSet):
+    device = django_filters.UUIDFilter(field_name='device_id')
+    metric = django_filters.CharFilter(field_name='metric_name')
+
+    class Meta:
+        model = SensorStream
+        fields = ['device', 'metric']
+
+
+class SensorReadingFilter(django_filters.FilterSet):
+    start = django_filters.IsoDateTimeFilter(field_name='timestamp', lookup_expr='gte')
+    end = django_filters.IsoDateTimeFilter(field_name='timestamp', lookup_expr='lte')
+    stream = django_filters.UUIDFilter(field_name='stream_id')
+    device = django_filters.UUIDFilter(field_name='stream__device_id')
+    metric = django_filters.CharFilter(field_name='stream__metric_name')
+
+    class Meta:
+        model = SensorReading
+        fields = ['start', 'end', 'stream', 'device', 'metric']
@@ -0,0 +1,183 @@
+import json
+import os
+
+_WHITESPACE = ' \t\r\n'
+
+
+def iter_json_records(f, chunk_size=1 << 20):
+    """
+    Yield the records of a JSON array, or of NDJSON (one JSON value per line), from a text file.
+
+    The file is read `chunk_size` characters at a time and each record is decoded as soon as
+    it is complete, so memory stays bounded by the largest record instead of the file size.
+    """
+    decoder = json.JSONDecoder()
+    buf, pos, eof = '', 0, False
+    in_array = None
+
+    def fill():
+        nonlocal buf, pos, eof
+        more = f.read(chunk_size)
+        buf, pos = buf[pos:] + more, 0
+        eof = not more
+
+    while True:
+        # Skip whitespace and, inside an array, the separating commas
+        while True:
+            while pos < len(buf) and (buf[pos] in _WHITESPACE or (in_array and buf[pos] == ',')):
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            fill()
+
+        if pos >= len(buf):
+            if in_array:
+                raise ValueError("Unexpected end of file: unterminated JSON array")
+            return
+
+        if in_array is None:
+            in_array = buf[pos] == '['
+            if in_array:
+                pos += 1
+                continue
+
+        if in_array and buf[pos] == ']':
+            return
+
+        try:
+            record, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()
+            continue
+
+        # A value ending exactly at the end of the buffer may continue in the next chunk
+        if end == len(buf) and not eof:
+            fill()
+            continue
+
+        pos = end
+        yield record
+
+
+def iter_ndjson_records(f):
+    """
+    Yield (record, offset) for every non-blank line of a binary NDJSON file, from its current
+    position; `offset` is the byte offset just past the record's line.
+    """
+    while True:
+        line = f.readline()
+        if not line:
+            return
+        if line.strip():
+            yield json.loads(line), f.tell()
+
+
+def record_before(f, offset, block=1 << 16):
+    """The NDJSON record on the last non-blank line ending at or before byte `offset`, or None."""
+    start = offset
+    while start > 0:
+        start = max(0, start - block)
+        f.seek(start)
+        lines = f.read(offset - start).rstrip().rsplit(b'\n', 1)
+        if len(lines) == 2 or start == 0:
+            try:
+                return json.loads(lines[-1])
+            except ValueError:
+                return None
+    return None
+
+
+def parse_entry_id(value):
+    """An entry_id as an int (from an int, an integral float or a numeric string), or None."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else None
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            return None
+    return None
+
+
+def parse_flag(value):
+    """A was_interpolated flag as a bool (from a bool, 0/1 or "true"/"false"), or None."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        return {'true': True, 'false': False}.get(value.strip().lower())
+    return None
+
+
+def is_json_array(f):
+    """True when a binary file holds a JSON array rather than NDJSON; the position is kept."""
+    start = f.tell()
+    while True:
+        char = f.read(1)
+        if not char or not char.isspace():
+            f.seek(start)
+            return char == b'['
+
+
+def seek_ndjson_after(f, entry_id, key='entry_id'):
+    """
+    Move a binary NDJSON file, ordered by `key`, to the first line whose key is above `entry_id`.
+
+    The line is found by binary search over byte offsets, so only O(log size) lines are read
+    and a refresh of an append-only feed reads just the new tail.
+    """
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+
+    def line_after(offset):
+        # Start and content of the first non-blank line starting at or after offset
+        f.seek(max(offset - 1, 0))
+        if offset > 0:
+            f.readline()
+        while True:
+            start = f.tell()
+            line = f.readline()
+            if not line or line.strip():
+                return start, line
+
+    lo, hi = 0, size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        _, line = line_after(mid)
+        if not line or (parse_entry_id(json.loads(line).get(key)) or 0) > entry_id:
+            hi = mid
+        else:
+            lo = mid + 1
+
+    start, _ = line_after(lo)
+    f.seek(start)
+
+
+def read_checkpoint(path):
+    """
+    (last_entry_id, offset) saved at `path`, or (None, None) when there is no checkpoint.
+
+    `offset` is the byte offset just past the last committed record of an NDJSON file, None
+    for JSON arrays and checkpoints written without one.
+    """
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        return None, None
+    return parse_entry_id(checkpoint['last_entry_id']), checkpoint.get('offset')
+
+
+def write_checkpoint(path, last_entry_id, offset=None):
+    """Atomically record the last committed entry_id and, for NDJSON, the byte offset past it."""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'last_entry_id': last_entry_id, 'offset': offset}, f)
+    os.replace(tmp_path, path)
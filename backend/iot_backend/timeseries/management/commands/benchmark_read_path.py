@@ -0,0 +1,58 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from timeseries.models import ProcessedSensorData
+from timeseries.renderers import ColumnarJSONRenderer, ColumnarCSVRenderer
+from timeseries.serializers import ProcessedSensorDataSerializer
+
+
+class Command(BaseCommand):
+    help = "Compare the ModelSerializer list path with the values_list columnar path"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100000, help="Rows per page to serialize (default: 100000)")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per path; the best is reported (default: 3)")
+
+    def handle(self, *args, **kwargs):
+        rows, repeat = kwargs["rows"], kwargs["repeat"]
+
+        # Synthetic rows are inserted in a transaction that is rolled back afterwards
+        with transaction.atomic():
+            start = datetime(2000, 1, 1, tzinfo=timezone.utc)
+            first_id = -10 ** 9
+            ProcessedSensorData.objects.bulk_create([
+                ProcessedSensorData(created_at=start + timedelta(seconds=30 * i), entry_id=first_id + i,
+                                    temperature=20 + i % 7, humidity=40.5, light_index=i % 3, atmosphere=1005.25,
+                                    voltage=12.5, was_interpolated=False)
+                for i in range(rows)
+            ], batch_size=5000)
+            queryset = ProcessedSensorData.objects.filter(
+                entry_id__gte=first_id, entry_id__lt=first_id + rows).order_by("created_at", "id")
+            fields = [field.attname for field in ProcessedSensorData._meta.concrete_fields]
+
+            def serializer_path():
+                return JSONRenderer().render(ProcessedSensorDataSerializer(queryset, many=True).data)
+
+            def columnar_path(renderer):
+                page = list(queryset.values_list(*fields))
+                return renderer.render(dict(zip(fields, map(list, zip(*page)))))
+
+            paths = [
+                ("ModelSerializer + JSONRenderer", serializer_path),
+                ("values_list + columnar JSON", lambda: columnar_path(ColumnarJSONRenderer())),
+                ("values_list + CSV", lambda: columnar_path(ColumnarCSVRenderer())),
+            ]
+            baseline = None
+            for name, path in paths:
+                best, size = float("inf"), 0
+                for _ in range(repeat):
+                    began = time.perf_counter()
+                    size = len(path())
+                    best = min(best, time.perf_counter() - began)
+                baseline = baseline or best
+                self.stdout.write(f"{name:32s} {best * 1000:9.1f} ms  {size / 1e6:7.2f} MB  x{baseline / best:.1f}")
+
+            transaction.set_rollback(True)
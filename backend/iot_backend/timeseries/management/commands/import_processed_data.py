@@ -1,34 +1,173 @@
-import json
+import io
+import os
+from datetime import timezone
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
 from timeseries.models import ProcessedSensorData
+from timeseries.ingest import (iter_json_records, iter_ndjson_records, is_json_array, seek_ndjson_after,
+                               record_before, parse_entry_id, parse_flag, read_checkpoint, write_checkpoint)
+from timeseries.rollups import add_to_rollups, rebuild_rollups
+from timeseries.readings import LEGACY_DEVICES, store_readings, sync_legacy_readings
 from django.utils.dateparse import parse_datetime
 
+FIELDS = {
+    "temperature": "Temperature",
+    "humidity": "RH Humidity",
+    "light_index": "Usable Light Index",
+    "atmosphere": "Atmosphere hPa",
+    "voltage": "Voltage Charge",
+}
+
+
+def build_record(entry):
+    created_at = parse_datetime(entry["created_at"])
+    if created_at is None:
+        raise ValueError(f"invalid created_at {entry['created_at']!r}")
+    values = {field: float(entry[key]) for field, key in FIELDS.items()}
+    entry_id = parse_entry_id(entry["entry_id"])
+    if entry_id is None:
+        raise ValueError(f"invalid entry_id {entry['entry_id']!r}")
+    was_interpolated = parse_flag(entry["was_interpolated"])
+    if was_interpolated is None:
+        raise ValueError(f"invalid was_interpolated {entry['was_interpolated']!r}")
+    return ProcessedSensorData(
+        created_at=created_at,
+        entry_id=entry_id,
+        was_interpolated=was_interpolated,
+        **values,
+    )
+
+
 class Command(BaseCommand):
-    help = "Import processed sensor data from JSON"
+    help = "Import processed sensor data from JSON or NDJSON"
 
     def add_arguments(self, parser):
         parser.add_argument("file_path", type=str)
+        parser.add_argument("--batch-size", type=int, default=5000,
+                            help="Number of records committed per transaction (default: 5000)")
+        parser.add_argument("--checkpoint", type=str, default=None,
+                            help="Checkpoint file (default: <file_path>.checkpoint)")
+        parser.add_argument("--restart", action="store_true",
+                            help="Ignore an existing checkpoint and import from the first record")
+        parser.add_argument("--update-existing", action="store_true",
+                            help="Overwrite records whose entry_id is already stored (default: skip them)")
+        parser.add_argument("--since-last", action="store_true",
+                            help="Only import entries newer than the highest stored entry_id; NDJSON files "
+                                 "ordered by entry_id are read from the first new line")
 
     def handle(self, *args, **kwargs):
         path = kwargs["file_path"]
-        with open(path) as f:
-            data = json.load(f)
-
-        count = 0
-        for entry in data:
-            try:
-                ProcessedSensorData.objects.create(
-                    created_at=parse_datetime(entry["created_at"]),
-                    entry_id=entry["entry_id"],
-                    temperature=entry["Temperature"],
-                    humidity=entry["RH Humidity"],
-                    light_index=entry["Usable Light Index"],
-                    atmosphere=entry["Atmosphere hPa"],
-                    voltage=entry["Voltage Charge"],
-                    was_interpolated=entry["was_interpolated"],
-                )
-                count += 1
-            except Exception as e:
-                self.stdout.write(self.style.WARNING(f"⚠️ Skipping entry: {e}"))
-
-        self.stdout.write(self.style.SUCCESS(f"Imported {count} records."))
+        batch_size = kwargs["batch_size"]
+        checkpoint = kwargs["checkpoint"] or f"{path}.checkpoint"
+
+        # Resume after the last entry committed by an interrupted run
+        resume_after, resume_offset = (None, None) if kwargs["restart"] else read_checkpoint(checkpoint)
+        if resume_after is not None:
+            self.stdout.write(f"Resuming after entry_id {resume_after}")
+
+        self.update_existing = kwargs["update_existing"]
+        since = None
+        if kwargs["since_last"]:
+            since = ProcessedSensorData.objects.aggregate(last=Max("entry_id"))["last"]
+            self.stdout.write(f"Importing entries after entry_id {since}")
+
+        created = existing = skipped = 0
+        batch = []
+        offset = None
+        with open(path, "rb") as raw:
+            ndjson = not is_json_array(raw)
+            if ndjson and resume_after is not None and resume_offset is not None \
+                    and resume_offset <= os.path.getsize(path):
+                # NDJSON resumes from the byte offset of the checkpoint when the committed entry is still there
+                last = record_before(raw, resume_offset)
+                if isinstance(last, dict) and parse_entry_id(last.get("entry_id")) == resume_after:
+                    resume_after = None
+                raw.seek(resume_offset if resume_after is None else 0)
+            elif ndjson and since is not None and resume_after is None:
+                seek_ndjson_after(raw, since)
+
+            if ndjson:
+                records = iter_ndjson_records(raw)
+            else:
+                records = ((entry, None) for entry in iter_json_records(io.TextIOWrapper(raw, encoding="utf-8")))
+            for entry, offset in records:
+                entry_id = parse_entry_id(entry.get("entry_id")) if isinstance(entry, dict) else None
+                if entry_id is not None and since is not None and entry_id <= since:
+                    continue
+                if resume_after is not None:
+                    if entry_id == resume_after:
+                        resume_after = None
+                    continue
+                if entry_id is None:
+                    skipped += 1
+                    self.stdout.write(self.style.WARNING(
+                        f"⚠️ Skipping entry without a numeric entry_id: {str(entry)[:200]}"))
+                    continue
+
+                try:
+                    batch.append(build_record(entry))
+                except Exception as e:
+                    skipped += 1
+                    self.stdout.write(self.style.WARNING(f"⚠️ Skipping entry: {e}"))
+                    continue
+
+                if len(batch) >= batch_size:
+                    new, stored = self.save_batch(batch, checkpoint, offset)
+                    created, existing = created + new, existing + stored
+                    batch = []
+
+        if batch:
+            new, stored = self.save_batch(batch, checkpoint, offset)
+            created, existing = created + new, existing + stored
+
+        if resume_after is not None:
+            self.stdout.write(self.style.WARNING(
+                f"Checkpoint entry_id {resume_after} not found in {path}; nothing imported. "
+                f"Use --restart to import from the beginning."))
+            return
+
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        action = "updated" if self.update_existing else "already stored"
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {created} new records ({existing} {action}, {skipped} skipped)."))
+
+    def save_batch(self, batch, checkpoint, offset=None):
+        # Within a batch the last copy of an entry_id wins
+        records = list({record.entry_id: record for record in batch}.values())
+        ids = [record.entry_id for record in records]
+
+        # The checkpoint only moves once the batch is committed
+        with transaction.atomic():
+            stored = dict(ProcessedSensorData.objects.filter(entry_id__in=ids).values_list("entry_id", "created_at"))
+            if self.update_existing:
+                ProcessedSensorData.objects.bulk_create(
+                    records, update_conflicts=True, unique_fields=["entry_id"],
+                    update_fields=["created_at", *FIELDS, "was_interpolated"])
+            else:
+                ProcessedSensorData.objects.bulk_create(records, ignore_conflicts=True)
+
+            # New rows are merged into the rollups; days with overwritten rows are recomputed
+            new_records = [record for record in records if record.entry_id not in stored]
+            add_to_rollups("processed", [record.created_at for record in new_records],
+                           {field: [getattr(record, field) for record in new_records] for field in FIELDS})
+            if self.update_existing and stored:
+                changed = [*stored.values(), *(record.created_at for record in records if record.entry_id in stored)]
+                days = {time.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+                        for time in changed}
+                for day in sorted(days):
+                    rebuild_rollups("processed", day, day)
+
+            # The narrow reading store takes the stored values; readings left at moved times are dropped
+            stored_records = records if self.update_existing else new_records
+            store_readings(LEGACY_DEVICES["processed"], [record.created_at for record in stored_records],
+                           {field: [getattr(record, field) for record in stored_records] for field in FIELDS},
+                           update=True)
+            if self.update_existing:
+                moved = set(stored.values()) - {record.created_at for record in records}
+                if moved:
+                    sync_legacy_readings("processed", times=moved)
+        write_checkpoint(checkpoint, batch[-1].entry_id, offset)
+        self.stdout.write(f"Committed {len(batch)} records (last entry_id {batch[-1].entry_id})")
+        return len(new_records), len(stored)
@@ -1,9 +1,80 @@
 from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils.timezone import get_current_timezone
 from timeseries.models import TimeSeriesData
-from django.utils.timezone import make_aware
+from timeseries.rollups import add_to_rollups
+from timeseries.readings import LEGACY_DEVICES, store_readings
+from timeseries.correlations import append_correlations, correlation_window, refresh_correlations
 
+from datetime import datetime
+
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+
+SENSOR_COLUMNS = {'sensor1': 'sensor 1', 'sensor2': 'sensor 2', 'sensor3': 'sensor 3'}
+CORRELATION_COLUMNS = {
+    'correlation_s1_s2': 'c(s1, s2)',
+    'correlation_s2_s3': 'c(s2, s3)',
+    'correlation_s1_s3': 'c(s1, s3)',
+}
+
+
+def parse_times(raw):
+    """
+    Parse the 'time' column for all rows at once.
+
+    Supported values, as in the workbooks: "HH:MM:SS" strings, minute offsets (int or float)
+    from 1900-01-01, and timestamps. Anything else becomes NaT. The result is made aware in
+    the current timezone.
+    """
+    base = pd.Timestamp(1900, 1, 1)
+    if pd.api.types.is_datetime64_any_dtype(raw):
+        times = pd.to_datetime(raw)
+    elif pd.api.types.is_numeric_dtype(raw):
+        times = base + pd.to_timedelta(raw.astype(float), unit='min')
+    else:
+        is_str = raw.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+        is_stamp = raw.map(lambda v: isinstance(v, datetime)).to_numpy(dtype=bool)
+        numbers = pd.to_numeric(raw.where(~is_str & ~is_stamp), errors='coerce')
+
+        times = pd.Series(pd.NaT, index=raw.index, dtype='datetime64[ns]')
+        times[is_str] = pd.to_datetime(raw[is_str].str.strip(), format="%H:%M:%S", errors='coerce')
+        times[is_stamp] = pd.to_datetime(raw[is_stamp].tolist())
+        has_number = numbers.notna().to_numpy()
+        times[has_number] = base + pd.to_timedelta(numbers[has_number], unit='min')
+
+    if times.dt.tz is None:
+        times = times.dt.tz_localize(get_current_timezone(), ambiguous=True, nonexistent='shift_forward')
+    return times
+
+
+def insert_rows(columns, batch_size):
+    """
+    Insert TimeSeriesData rows, given as {field: [values]} with aware datetimes for 'timestamp',
+    with multi-row INSERT statements of at most `batch_size` rows. Values go to the database as
+    plain parameters, without a model instance per row.
+    """
+    ops = connection.ops
+    fields = list(columns)
+    times = pd.DatetimeIndex(columns['timestamp'])
+    # Backends without time zone support store naive datetimes in the connection's time zone
+    if not connection.features.supports_timezones:
+        times = times.tz_convert(connection.timezone).tz_localize(None)
+    values = dict(columns, timestamp=[ops.adapt_datetimefield_value(time) for time in times.to_pydatetime()])
+
+    # Keep each statement under the backend's limit on query parameters
+    max_params = connection.features.max_query_params
+    if max_params:
+        batch_size = min(batch_size, max_params // len(fields))
+    names = ', '.join(ops.quote_name(TimeSeriesData._meta.get_field(field).column) for field in fields)
+    insert = f'INSERT INTO {ops.quote_name(TimeSeriesData._meta.db_table)} ({names}) VALUES '
+    row_sql = f"({', '.join(['%s'] * len(fields))})"
+
+    rows = list(zip(*(values[field] for field in fields)))
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            cursor.execute(insert + ', '.join([row_sql] * len(batch)), [value for row in batch for value in row])
 
 
 class Command(BaseCommand):
@@ -11,9 +82,16 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('file_path', type=str, help='Path to the Excel file')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Number of rows inserted per INSERT statement (default: 5000)')
+        parser.add_argument('--window', type=int, default=None,
+                            help='Rows per rolling correlation window (default: settings.TIMESERIES_CORRELATION_WINDOW); '
+                                 '0 keeps the correlation columns of the sheet instead')
 
     def handle(self, *args, **kwargs):
         file_path = kwargs['file_path']
+        batch_size = kwargs['batch_size']
+        window = correlation_window() if kwargs['window'] is None else kwargs['window']
 
         # Try loading the Excel sheet
         try:
@@ -22,43 +100,50 @@ class Command(BaseCommand):
             self.stderr.write(self.style.ERROR(f"Failed to load Excel: {e}"))
             return
 
-        # Helper to safely parse float
-        def safe_float(value):
-            try:
-                return float(value)
-            except (ValueError, TypeError):
-                return None
-
-        # Looping through each row
-        for index, row in df.iterrows():
-            try:
-                # Parse time column
-                raw_time = row['time']
-
-                if isinstance(raw_time, str):
-                    timestamp = datetime.strptime(raw_time.strip(), "%H:%M:%S")
-                elif isinstance(raw_time, (int, float)):
-                    timestamp = datetime(1900, 1, 1) + timedelta(minutes=raw_time)
-                elif isinstance(raw_time, pd.Timestamp):
-                    timestamp = raw_time.to_pydatetime()
-                else:
-                    raise ValueError("Unsupported time format")
-
-                # Make timezone-aware
-                timestamp = make_aware(timestamp)
-
-                # Save row to DB
-                TimeSeriesData.objects.create(
-                    timestamp=timestamp,
-                    sensor1=row['sensor 1'],
-                    sensor2=row['sensor 2'],
-                    sensor3=row['sensor 3'],
-                    correlation_s1_s2=safe_float(row.get('c(s1, s2)', None)),
-                    correlation_s2_s3=safe_float(row.get('c(s2, s3)', None)),
-                    correlation_s1_s3=safe_float(row.get('c(s1, s3)', None)),
-                )
-
-            except Exception as row_error:
-                self.stdout.write(self.style.WARNING(f"Skipping row {index}: {row_error}"))
+        missing = [column for column in ['time', *SENSOR_COLUMNS.values()] if column not in df.columns]
+        if missing:
+            self.stderr.write(self.style.ERROR(f"Missing columns: {', '.join(missing)}"))
+            return
+
+        # Parse every column at once; optional correlation columns fall back to NULL
+        timestamps = parse_times(df['time'])
+        sensors = {field: pd.to_numeric(df[column], errors='coerce') for field, column in SENSOR_COLUMNS.items()}
+        correlations = {field: pd.to_numeric(df[column], errors='coerce') if column in df.columns
+                        else pd.Series(np.nan, index=df.index)
+                        for field, column in CORRELATION_COLUMNS.items()}
+
+        valid = timestamps.notna()
+        for values in sensors.values():
+            valid &= values.notna()
+        for index in df.index[~valid.to_numpy()]:
+            self.stdout.write(self.style.WARNING(f"Skipping row {index}: unsupported time format or missing sensor value"))
+
+        # Rows go in in time order, so each batch covers one contiguous time range
+        index = timestamps[valid].sort_values(kind='stable').index
+        columns = {'timestamp': [timestamp.to_pydatetime() for timestamp in timestamps[index]]}
+        columns.update({field: values[index].tolist() for field, values in sensors.items()})
+        columns.update({field: values[index].astype(object).where(values[index].notna(), None).tolist()
+                        for field, values in correlations.items()})
+
+        # One transaction for the whole file, inserted in batches
+        total = len(columns['timestamp'])
+        with transaction.atomic():
+            for start in range(0, total, batch_size):
+                batch = {field: values[start:start + batch_size] for field, values in columns.items()}
+                times = batch['timestamp']
+                values = {field: batch[field] for field in SENSOR_COLUMNS}
+
+                # Rolling correlations are computed over the batch; a batch landing before stored rows
+                # is inserted first and then recomputed together with the rows it shifts
+                late = window >= 2 and TimeSeriesData.objects.filter(timestamp__gte=times[0]).exists()
+                if window >= 2 and not late:
+                    batch.update(append_correlations(times[0], values, window))
+                insert_rows(batch, batch_size)
+                if late:
+                    refresh_correlations(times[0], times[-1], window)
+
+                add_to_rollups('timeseries', times, values)
+                store_readings(LEGACY_DEVICES['timeseries'], times, values, update=True)
+                self.stdout.write(f"Imported {start + len(times)}/{total} rows")
 
         self.stdout.write(self.style.SUCCESS(" Data import complete."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+from timeseries.rollups import SOURCES, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the minute/hour/day rollups from the raw sensor tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", choices=list(SOURCES), action="append",
+                            help="Table to rebuild (default: all)")
+        parser.add_argument("--start", type=parse_datetime, default=None, help="ISO 8601 start (default: beginning)")
+        parser.add_argument("--end", type=parse_datetime, default=None, help="ISO 8601 end (default: latest row)")
+
+    def handle(self, *args, **kwargs):
+        for source in kwargs["source"] or list(SOURCES):
+            with transaction.atomic():
+                rebuild_rollups(source, kwargs["start"], kwargs["end"])
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {source} rollups."))
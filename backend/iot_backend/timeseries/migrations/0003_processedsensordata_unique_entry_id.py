@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:29
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_entries(apps, schema_editor):
+    # Earlier imports could load the same entry_id several times; keep the first copy
+    ProcessedSensorData = apps.get_model('timeseries', 'ProcessedSensorData')
+    keep = ProcessedSensorData.objects.values('entry_id').annotate(first_id=Min('id')).values('first_id')
+    ProcessedSensorData.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timeseries', '0002_processedsensordata'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_entries, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='processedsensordata',
+            name='entry_id',
+            field=models.IntegerField(unique=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timeseries', '0003_processedsensordata_unique_entry_id'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='processedsensordata',
+            name='created_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='timeseriesdata',
+            name='timestamp',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
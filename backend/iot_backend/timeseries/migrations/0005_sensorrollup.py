@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:31
+
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from django.db import migrations, models
+
+# The backfill is frozen here as it was when the rollups were introduced, so later changes to
+# timeseries.rollups cannot change what this migration does
+RESOLUTIONS = (60, 3600, 86400)
+SOURCES = {
+    'processed': ('ProcessedSensorData', 'created_at', ('temperature', 'humidity', 'light_index', 'atmosphere', 'voltage')),
+    'timeseries': ('TimeSeriesData', 'timestamp', ('sensor1', 'sensor2', 'sensor3')),
+}
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+CHUNK_SIZE = 50000
+
+
+def create_rollups(SensorRollup, source, fields, rows):
+    # Rollups of time-ordered rows that cover whole days, so none of their buckets continues elsewhere
+    epochs = np.array([(row[0] - EPOCH) / timedelta(seconds=1) for row in rows])
+    columns = {field: np.array([row[i] for row in rows], dtype=np.float64) for i, field in enumerate(fields, 1)}
+    rollups = []
+    for resolution in RESOLUTIONS:
+        keys, starts = np.unique(np.floor(epochs / resolution) * resolution, return_index=True)
+        counts = np.diff(np.r_[starts, len(rows)])
+        buckets = [EPOCH + timedelta(seconds=int(key)) for key in keys]
+        for field, v in columns.items():
+            stats = zip(counts.tolist(), np.add.reduceat(v, starts).tolist(), np.add.reduceat(v * v, starts).tolist(),
+                        np.minimum.reduceat(v, starts).tolist(), np.maximum.reduceat(v, starts).tolist())
+            rollups.extend(SensorRollup(source=source, field=field, resolution=resolution, bucket=bucket, count=count,
+                                        sum=total, sum_sq=total_sq, min=low, max=high)
+                           for bucket, (count, total, total_sq, low, high) in zip(buckets, stats))
+    SensorRollup.objects.bulk_create(rollups, batch_size=1000)
+
+
+def backfill_rollups(apps, schema_editor):
+    SensorRollup = apps.get_model('timeseries', 'SensorRollup')
+    for source, (model_name, time_field, fields) in SOURCES.items():
+        Model = apps.get_model('timeseries', model_name)
+        chunk, day = [], None
+        for row in Model.objects.order_by(time_field).values_list(time_field, *fields).iterator(chunk_size=CHUNK_SIZE):
+            row_day = row[0].astimezone(timezone.utc).date()
+            if len(chunk) >= CHUNK_SIZE and row_day != day:
+                create_rollups(SensorRollup, source, fields, chunk)
+                chunk = []
+            chunk.append(row)
+            day = row_day
+        if chunk:
+            create_rollups(SensorRollup, source, fields, chunk)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timeseries', '0004_time_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SensorRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=32)),
+                ('field', models.CharField(max_length=64)),
+                ('resolution', models.IntegerField()),
+                ('bucket', models.DateTimeField()),
+                ('count', models.IntegerField()),
+                ('sum', models.FloatField()),
+                ('sum_sq', models.FloatField()),
+                ('min', models.FloatField()),
+                ('max', models.FloatField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('source', 'resolution', 'field', 'bucket'), name='unique_rollup_bucket')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
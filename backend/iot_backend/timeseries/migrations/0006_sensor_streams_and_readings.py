@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:41
+
+import django.db.models.deletion
+import django.utils.timezone
+import math
+import uuid
+from django.db import migrations, models
+
+# The backfill is frozen here as it was when the narrow store was introduced, so later changes to
+# timeseries.readings cannot change what this migration does
+SOURCES = {
+    'processed': ('ProcessedSensorData', 'created_at', ('temperature', 'humidity', 'light_index', 'atmosphere', 'voltage')),
+    'timeseries': ('TimeSeriesData', 'timestamp', ('sensor1', 'sensor2', 'sensor3')),
+}
+CHUNK_SIZE = 50000
+
+
+def backfill_readings(apps, schema_editor):
+    SensorStream = apps.get_model('timeseries', 'SensorStream')
+    SensorReading = apps.get_model('timeseries', 'SensorReading')
+    for source, (model_name, time_field, fields) in SOURCES.items():
+        # One device per table, with one stream per field
+        device_id = uuid.uuid5(uuid.NAMESPACE_URL, f'iot-backend:{source}')
+        streams = {field: SensorStream.objects.create(device_id=device_id, metric_name=field).stream_id
+                   for field in fields}
+
+        # Rows sharing a timestamp collapse into one reading per stream; the last row by id wins.
+        # Chunks end between timestamps, so a timestamp is never split across two inserts.
+        Model = apps.get_model('timeseries', model_name)
+        readings, last_time = {}, None
+        for time, *values in (Model.objects.order_by(time_field, 'id').values_list(time_field, *fields)
+                              .iterator(chunk_size=CHUNK_SIZE)):
+            if len(readings) >= CHUNK_SIZE and time != last_time:
+                SensorReading.objects.bulk_create(readings.values(), batch_size=1000)
+                readings = {}
+            for field, value in zip(fields, values):
+                if value is not None and not math.isnan(value):
+                    readings[field, time] = SensorReading(stream_id=streams[field], timestamp=time, value=value)
+            last_time = time
+        SensorReading.objects.bulk_create(readings.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timeseries', '0005_sensorrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SensorStream',
+            fields=[
+                ('stream_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('device_id', models.UUIDField()),
+                ('metric_name', models.CharField(max_length=64)),
+                ('sampling_rate', models.IntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('device_id', 'metric_name'), name='unique_device_metric')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SensorReading',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(db_index=True)),
+                ('value', models.FloatField()),
+                ('normalized_value', models.FloatField(blank=True, null=True)),
+                ('stream', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='readings', to='timeseries.sensorstream')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('stream', 'timestamp'), name='unique_stream_reading')],
+            },
+        ),
+        migrations.RunPython(backfill_readings, migrations.RunPython.noop),
+    ]
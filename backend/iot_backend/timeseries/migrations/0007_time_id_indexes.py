@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timeseries', '0006_sensor_streams_and_readings'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='processedsensordata',
+            name='created_at',
+            field=models.DateTimeField(),
+        ),
+        migrations.AlterField(
+            model_name='timeseriesdata',
+            name='timestamp',
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name='processedsensordata',
+            index=models.Index(fields=['created_at', 'id'], name='processed_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeseriesdata',
+            index=models.Index(fields=['timestamp', 'id'], name='timeseries_time_id_idx'),
+        ),
+    ]
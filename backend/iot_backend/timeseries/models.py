@@ -1,4 +1,7 @@
+import uuid
+
 from django.db import models
+from django.utils import timezone
 
 class TimeSeriesData(models.Model):
     timestamp = models.DateTimeField()
@@ -9,12 +12,18 @@ class TimeSeriesData(models.Model):
     correlation_s2_s3 = models.FloatField(null=True, blank=True)
     correlation_s1_s3 = models.FloatField(null=True, blank=True)
 
+    class Meta:
+        # Matches the (timestamp, id) ordering of the cursor pagination and the correlation window
+        indexes = [
+            models.Index(fields=['timestamp', 'id'], name='timeseries_time_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.timestamp} | s1: {self.sensor1}, s2: {self.sensor2}, s3: {self.sensor3}"
 
 class ProcessedSensorData(models.Model):
     created_at = models.DateTimeField()
-    entry_id = models.IntegerField()
+    entry_id = models.IntegerField(unique=True)
     temperature = models.FloatField()
     humidity = models.FloatField()
     light_index = models.FloatField()
@@ -22,5 +31,75 @@ class ProcessedSensorData(models.Model):
     voltage = models.FloatField()
     was_interpolated = models.BooleanField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='processed_created_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.created_at} | Temp: {self.temperature}"
+
+class SensorStream(models.Model):
+    """
+    Catalog entry for one metric of one device, as described by SensorStreamDTO.
+
+    Adding a channel is a new row here, not a schema change.
+    """
+    stream_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    device_id = models.UUIDField()
+    metric_name = models.CharField(max_length=64)
+    sampling_rate = models.IntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['device_id', 'metric_name'], name='unique_device_metric'),
+        ]
+
+    def __str__(self):
+        return f"{self.device_id} | {self.metric_name}"
+
+class SensorReading(models.Model):
+    """
+    One value of one stream at one time: the narrow store for any number of channels.
+
+    Readings are keyed by (stream, timestamp), and the stream determines the device; the
+    composite key is the index used to read a stream over a time range.
+    """
+    stream = models.ForeignKey(SensorStream, on_delete=models.CASCADE, related_name='readings', db_index=False)
+    timestamp = models.DateTimeField(db_index=True)
+    value = models.FloatField()
+    normalized_value = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['stream', 'timestamp'], name='unique_stream_reading'),
+        ]
+
+    def __str__(self):
+        return f"{self.stream_id} @ {self.timestamp} | {self.value}"
+
+class SensorRollup(models.Model):
+    """
+    Pre-aggregated statistics of one field of a sensor table over one time bucket.
+
+    `source` names the raw table ('processed' or 'timeseries') and `resolution` is the bucket
+    width in seconds (minute, hour or day). Rollups are kept up to date by the import paths.
+    """
+    source = models.CharField(max_length=32)
+    field = models.CharField(max_length=64)
+    resolution = models.IntegerField()
+    bucket = models.DateTimeField()
+    count = models.IntegerField()
+    sum = models.FloatField()
+    sum_sq = models.FloatField()
+    min = models.FloatField()
+    max = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'resolution', 'field', 'bucket'], name='unique_rollup_bucket'),
+        ]
+
     def __str__(self):
-        return f"{self.created_at} | Temp: {self.temperature}"
\ No newline at end of file
+        return f"{self.source}.{self.field} @ {self.bucket} ({self.resolution}s) | n={self.count}"
@@ -0,0 +1,59 @@
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class TimeCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the time column: every page is an indexed range scan starting
+    after the last row of the previous page, so deep pages cost the same as the first.
+    """
+    page_size = 1000
+    page_size_query_param = 'page_size'
+    max_page_size = 10000
+
+
+class TimeSeriesDataPagination(TimeCursorPagination):
+    ordering = ('timestamp', 'id')
+
+
+class ProcessedSensorDataPagination(TimeCursorPagination):
+    ordering = ('created_at', 'id')
+
+
+class SensorReadingPagination(TimeCursorPagination):
+    ordering = ('timestamp', 'id')
+
+
+class ColumnarCursorPaginationMixin:
+    """
+    Cursor pagination over values_list() querysets, returning columns instead of rows.
+
+    The page is a column dictionary ({field: [values]}); the next/previous links go in the
+    Link header so the body stays a plain table in every output format.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.field_names = list(queryset._fields)
+        return super().paginate_queryset(queryset, request, view)
+
+    def _get_position_from_instance(self, instance, ordering):
+        if isinstance(instance, tuple):
+            return str(instance[self.field_names.index(ordering[0].lstrip('-'))])
+        return super()._get_position_from_instance(instance, ordering)
+
+    def get_paginated_response(self, data):
+        links = [f'<{url}>; rel="{rel}"' for url, rel in
+                 ((self.get_next_link(), 'next'), (self.get_previous_link(), 'previous')) if url]
+        return Response(data, headers={'Link': ', '.join(links)} if links else None)
+
+
+class TimeSeriesDataColumnarPagination(ColumnarCursorPaginationMixin, TimeSeriesDataPagination):
+    pass
+
+
+class ProcessedSensorDataColumnarPagination(ColumnarCursorPaginationMixin, ProcessedSensorDataPagination):
+    pass
+
+
+class SensorReadingColumnarPagination(ColumnarCursorPaginationMixin, SensorReadingPagination):
+    pass
@@ -0,0 +1,188 @@
+import uuid
+
+import numpy as np
+import pandas as pd
+from django.apps import apps
+from django.db import connection
+from django.db.models.constants import OnConflict
+
+from .models import SensorReading, SensorStream
+from .rollups import SOURCES
+
+# Each fixed-column table is mirrored into the narrow store as one device with one stream per field
+LEGACY_DEVICES = {source: uuid.uuid5(uuid.NAMESPACE_URL, f'iot-backend:{source}') for source in SOURCES}
+
+
+# Columns written by insert_readings, in the order of the SQL parameters
+READING_FIELDS = ('stream', 'timestamp', 'value')
+
+# Timestamps per IN (...) lookup when readings are synced at a list of times
+SYNC_TIMES_CHUNK = 500
+
+
+def ensure_streams(device_id, metrics, sampling_rate=None):
+    """Stream ids of a device's metrics, {metric: stream_id}, registering the missing ones."""
+    streams = dict(SensorStream.objects.filter(device_id=device_id, metric_name__in=metrics)
+                   .values_list('metric_name', 'stream_id'))
+    missing = [metric for metric in metrics if metric not in streams]
+    if missing:
+        SensorStream.objects.bulk_create(
+            [SensorStream(device_id=device_id, metric_name=metric, sampling_rate=sampling_rate) for metric in missing],
+            ignore_conflicts=True)
+        streams.update(SensorStream.objects.filter(device_id=device_id, metric_name__in=missing)
+                       .values_list('metric_name', 'stream_id'))
+    return streams
+
+
+def store_readings(device_id, times, columns, update=False, sampling_rate=None):
+    """
+    Write the readings of one device, one row per metric and time, through insert_readings.
+
+    Parameters:
+    - device_id: UUID of the device; streams are registered on first use.
+    - times: Aware datetimes.
+    - columns: {metric: values} aligned with `times`; None and NaN values are left out.
+    - update: Overwrite stored readings at the same (stream, timestamp) instead of keeping them.
+
+    Returns:
+    - Number of readings inserted or, with update=True, overwritten.
+    """
+    if not len(times):
+        return 0
+    streams = ensure_streams(device_id, list(columns), sampling_rate)
+    times = pd.DatetimeIndex(pd.to_datetime(list(times), utc=True))
+
+    # One reading per (stream, timestamp); a later value in the input wins
+    frames = []
+    for metric, values in columns.items():
+        values = pd.to_numeric(pd.Series(list(values), dtype=object), errors='coerce').to_numpy(dtype=np.float64)
+        present = ~np.isnan(values)
+        frames.append(pd.DataFrame({'stream': streams[metric], 'timestamp': times[present], 'value': values[present]}))
+    readings = pd.concat(frames, ignore_index=True).drop_duplicates(['stream', 'timestamp'], keep='last')
+
+    return insert_readings(readings['stream'].tolist(), pd.DatetimeIndex(readings['timestamp']),
+                           readings['value'].to_numpy(), update=update)
+
+
+def parse_readings(readings):
+    """
+    Validate BulkDataUploadDTO readings ([{timestamp: value}, ...]) column by column.
+
+    Timestamps are ISO 8601 (naive ones are taken as UTC) and values finite numbers.
+
+    Returns:
+    - (UTC DatetimeIndex, float array, {index: error}) with only the valid readings kept, in input order.
+    """
+    raw_times, raw_values, errors = [], [], {}
+    for i, reading in enumerate(readings):
+        if isinstance(reading, dict) and len(reading) == 1:
+            (time, value), = reading.items()
+        else:
+            time = value = None
+            errors[i] = 'Expected an object with a single {timestamp: value} pair.'
+        raw_times.append(time)
+        raw_values.append(value)
+
+    times = pd.to_datetime(pd.Series(raw_times, dtype=object), utc=True, format='ISO8601', errors='coerce')
+    is_number = np.array([isinstance(v, (int, float)) and not isinstance(v, bool) for v in raw_values], dtype=bool)
+    values = np.where(is_number, pd.to_numeric(pd.Series(raw_values).where(is_number), errors='coerce'), np.nan)
+
+    bad_times = times.isna().to_numpy()
+    bad_values = ~np.isfinite(values)
+    for i in np.flatnonzero(bad_times | bad_values):
+        errors.setdefault(int(i), 'Invalid timestamp.' if bad_times[i] else 'Value must be a finite number.')
+
+    valid = ~(bad_times | bad_values)
+    return pd.DatetimeIndex(times[valid]), values[valid], dict(sorted(errors.items()))
+
+
+def insert_readings(stream_ids, times, values, batch_size=3000, update=False):
+    """
+    Insert readings with multi-row INSERT statements, skipping (stream, timestamp) pairs already
+    stored, or overwriting their value with update=True. Rows go to the database as plain
+    parameters, without model instances, which is where bulk_create spends most of its time at
+    this volume. With update=True a (stream, timestamp) pair must appear only once.
+
+    Parameters:
+    - stream_ids: Stream of each reading.
+    - times: Aware timestamps (a DatetimeIndex or datetimes).
+    - values: Float values.
+
+    Returns:
+    - Number of readings inserted (and, with update=True, overwritten).
+    """
+    ops = connection.ops
+    fields = [SensorReading._meta.get_field(name) for name in READING_FIELDS]
+    streams = {stream_id: fields[0].get_db_prep_value(stream_id, connection) for stream_id in set(stream_ids)}
+
+    # Backends without time zone support store naive datetimes in the connection's time zone;
+    # converting them all at once saves a conversion per row in adapt_datetimefield_value
+    times = pd.DatetimeIndex(times)
+    if not connection.features.supports_timezones:
+        times = times.tz_convert(connection.timezone).tz_localize(None)
+    rows = [(streams[stream_id], ops.adapt_datetimefield_value(time), value)
+            for stream_id, time, value in zip(stream_ids, times.to_pydatetime(),
+                                              np.asarray(values, dtype=np.float64).tolist())]
+
+    # Keep each statement under the backend's limit on query parameters
+    max_params = connection.features.max_query_params
+    if max_params:
+        batch_size = min(batch_size, max_params // len(fields))
+    columns = ', '.join(ops.quote_name(field.column) for field in fields)
+    on_conflict = OnConflict.UPDATE if update else OnConflict.IGNORE
+    insert = (f'{ops.insert_statement(on_conflict=on_conflict)} {ops.quote_name(SensorReading._meta.db_table)} '
+              f'({columns}) VALUES ')
+    suffix = ops.on_conflict_suffix_sql(fields, on_conflict, [fields[2].column], [f.column for f in fields[:2]])
+
+    inserted = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            placeholders = ', '.join(['(%s, %s, %s)'] * len(batch))
+            cursor.execute(f'{insert}{placeholders} {suffix}', [param for row in batch for param in row])
+            inserted += cursor.rowcount
+    return inserted
+
+
+def sync_legacy_readings(source, start=None, end=None, times=None, chunk_size=50000):
+    """
+    Copy the rows of a fixed-column table (a key of SOURCES) with time in [start, end], all by
+    default, or at exactly the given `times`, into the narrow store, replacing the readings
+    stored there at those times. Used after rows are changed or deleted.
+    """
+    if times is not None:
+        times = sorted(set(times))
+        for i in range(0, len(times), SYNC_TIMES_CHUNK):
+            _sync_rows(source, {'__in': times[i:i + SYNC_TIMES_CHUNK]}, chunk_size)
+        return
+    lookups = {}
+    if start is not None:
+        lookups['__gte'] = start
+    if end is not None:
+        lookups['__lte'] = end
+    _sync_rows(source, lookups, chunk_size)
+
+
+def _sync_rows(source, lookups, chunk_size):
+    model_name, time_field, fields = SOURCES[source]
+    Model = apps.get_model('timeseries', model_name)
+    device_id = LEGACY_DEVICES[source]
+
+    SensorReading.objects.filter(stream__device_id=device_id,
+                                 **{f'timestamp{lookup}': value for lookup, value in lookups.items()}).delete()
+    rows = Model.objects.filter(**{f'{time_field}{lookup}': value for lookup, value in lookups.items()})
+
+    # Rows sharing a timestamp collapse into one reading per stream; the last row by id wins
+    chunk = []
+    for row in rows.order_by(time_field, 'id').values_list(time_field, *fields).iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            _store_rows(device_id, chunk, fields)
+            chunk = []
+    _store_rows(device_id, chunk, fields)
+
+
+def _store_rows(device_id, rows, fields):
+    if rows:
+        columns = list(zip(*rows))
+        store_readings(device_id, columns[0], dict(zip(fields, columns[1:])), update=True)
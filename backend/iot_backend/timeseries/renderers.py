@@ -0,0 +1,175 @@
+import abc
+import csv
+import io
+import json
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - Arrow output needs pyarrow
+    pa = None
+
+
+class ColumnarJSONRenderer(BaseRenderer):
+    """
+    JSON for column dictionaries ({name: [values]}), encoded with orjson when it is installed.
+    """
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is not None:
+            return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY)
+        return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+
+
+class ColumnarCSVRenderer(BaseRenderer):
+    """CSV with one header row and one line per row of a column dictionary."""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(data.keys())
+        writer.writerows(zip(*data.values()))
+        return out.getvalue().encode(self.charset)
+
+
+class ArrowRenderer(BaseRenderer):
+    """Arrow IPC stream of a column dictionary (requires pyarrow)."""
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        table = pa.table(data)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+
+# Renderers offered by the columnar read path; Arrow only when pyarrow is installed
+COLUMNAR_RENDERERS = [ColumnarJSONRenderer, ColumnarCSVRenderer] + ([ArrowRenderer] if pa is not None else [])
+
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+class StreamingRenderer(abc.ABC, BaseRenderer):
+    """
+    Base for export formats written incrementally: `stream` turns an iterator of row tuples
+    into an iterator of byte chunks, one per `batch_size` rows, for a StreamingHttpResponse.
+    """
+    charset = None
+    batch_size = 2000
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Errors raised before streaming starts (404, validation) are rendered as JSON text
+        if orjson is not None:
+            return orjson.dumps(data)
+        return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+    @abc.abstractmethod
+    def stream(self, fields, rows):
+        """Byte chunks of the rows, given as tuples in the order of the model `fields`."""
+
+
+class CSVStreamRenderer(StreamingRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, fields, rows):
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow([field.attname for field in fields])
+        yield out.getvalue().encode()
+        for batch in _batches(rows, self.batch_size):
+            out.seek(0)
+            out.truncate()
+            writer.writerows(batch)
+            yield out.getvalue().encode()
+
+
+class NDJSONStreamRenderer(StreamingRenderer):
+    """One JSON object per line."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def stream(self, fields, rows):
+        names = [field.attname for field in fields]
+        for batch in _batches(rows, self.batch_size):
+            if orjson is not None:
+                yield b''.join(orjson.dumps(dict(zip(names, row))) + b'\n' for row in batch)
+            else:
+                yield ''.join(json.dumps(dict(zip(names, row)), cls=DjangoJSONEncoder) + '\n'
+                              for row in batch).encode()
+
+
+class ArrowStreamRenderer(StreamingRenderer):
+    """Arrow IPC stream with one record batch per `batch_size` rows (requires pyarrow)."""
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
+
+    @staticmethod
+    def _column_field(field):
+        # A foreign key holds the value of the primary key it points to
+        return field.target_field if field.is_relation else field
+
+    def arrow_type(self, field):
+        internal_type = self._column_field(field).get_internal_type()
+        if internal_type == 'DateTimeField':
+            return pa.timestamp('us', tz='UTC')
+        if internal_type == 'FloatField':
+            return pa.float64()
+        if internal_type == 'BooleanField':
+            return pa.bool_()
+        if internal_type.endswith(('IntegerField', 'AutoField')):
+            return pa.int64()
+        return pa.string()
+
+    def stream(self, fields, rows):
+        # The schema comes from the model, so batches with only nulls in a column still match
+        schema = pa.schema([pa.field(field.attname, self.arrow_type(field), field.null) for field in fields])
+        # UUIDs (UUID primary keys and foreign keys to them) are written as their string form
+        uuids = [self._column_field(field).get_internal_type() == 'UUIDField' for field in fields]
+        out = io.BytesIO()
+
+        def flush():
+            chunk = out.getvalue()
+            out.seek(0)
+            out.truncate()
+            return chunk
+
+        with pa.ipc.new_stream(out, schema) as writer:
+            yield flush()
+            for batch in _batches(rows, self.batch_size):
+                columns = [[None if value is None else str(value) for value in column] if is_uuid else list(column)
+                           for column, is_uuid in zip(zip(*batch), uuids)]
+                writer.write_batch(pa.record_batch(columns, schema=schema))
+                yield flush()
+        yield flush()
+
+
+# Formats offered by the streaming export; Arrow only when pyarrow is installed
+EXPORT_RENDERERS = [CSVStreamRenderer, NDJSONStreamRenderer] + ([ArrowStreamRenderer] if pa is not None else [])
@@ -0,0 +1,218 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from django.apps import apps
+from django.db import connection
+from django.db.models import Count, F, Max, Min, Sum
+
+from .aggregation import EpochBucket
+from .models import SensorRollup
+
+# Rollup bucket widths in seconds: minute, hour and day
+RESOLUTIONS = (60, 3600, 86400)
+
+# Raw tables with rollups: model name, time field and numeric fields
+SOURCES = {
+    'processed': ('ProcessedSensorData', 'created_at', ('temperature', 'humidity', 'light_index', 'atmosphere', 'voltage')),
+    'timeseries': ('TimeSeriesData', 'timestamp', ('sensor1', 'sensor2', 'sensor3')),
+}
+
+STATS = ('count', 'sum', 'sum_sq', 'min', 'max')
+
+
+def _to_datetime(epoch):
+    return datetime.fromtimestamp(0, timezone.utc) + timedelta(seconds=int(epoch))
+
+
+def _to_epoch(value):
+    return (value - datetime.fromtimestamp(0, timezone.utc)) / timedelta(seconds=1)
+
+
+def _merge_statement(rows):
+    # Multi-row upsert that adds counts and sums to the stored bucket and widens its min and max,
+    # so concurrent writers merge into the same row instead of overwriting each other
+    ops = connection.ops
+    table = ops.quote_name(SensorRollup._meta.db_table)
+    names = ('source', 'field', 'resolution', 'bucket', *STATS)
+    column = {name: ops.quote_name(SensorRollup._meta.get_field(name).column) for name in names}
+
+    if connection.vendor == 'mysql':
+        conflict = 'ON DUPLICATE KEY UPDATE'
+        stored, new = (lambda name: column[name]), (lambda name: f'VALUES({column[name]})')
+    else:
+        conflict = f"ON CONFLICT ({', '.join(column[name] for name in names[:4])}) DO UPDATE SET"
+        stored, new = (lambda name: f'{table}.{column[name]}'), (lambda name: f'EXCLUDED.{column[name]}')
+    smaller, larger = ('MIN', 'MAX') if connection.vendor == 'sqlite' else ('LEAST', 'GREATEST')
+
+    updates = [f'{column[name]} = {stored(name)} + {new(name)}' for name in ('count', 'sum', 'sum_sq')]
+    updates += [f"{column['min']} = {smaller}({stored('min')}, {new('min')})",
+                f"{column['max']} = {larger}({stored('max')}, {new('max')})"]
+    placeholders = ', '.join(['(' + ', '.join(['%s'] * len(names)) + ')'] * rows)
+    return (f"INSERT INTO {table} ({', '.join(column.values())}) VALUES {placeholders} "
+            f"{conflict} {', '.join(updates)}")
+
+
+def add_to_rollups(source, times, columns, batch_size=500):
+    """
+    Merge newly stored rows into the minute, hour and day rollups of a source.
+
+    Every bucket is merged with one upsert (insert, or add to the stored statistics), so
+    concurrent writers to the same bucket neither lose updates nor collide on the unique key.
+
+    Parameters:
+    - source: Key of SOURCES.
+    - times: Aware datetimes of the rows.
+    - columns: {field: values} for the fields of the source, aligned with `times`.
+    """
+    if not len(times):
+        return
+    epochs = np.array([_to_epoch(t) for t in times])
+    values = {field: np.asarray(columns[field], dtype=np.float64) for field in SOURCES[source][2]}
+
+    rows = []
+    for resolution in RESOLUTIONS:
+        buckets = np.floor(epochs / resolution) * resolution
+        order = np.argsort(buckets, kind='stable')
+        keys, starts = np.unique(buckets[order], return_index=True)
+        counts = np.diff(np.r_[starts, len(order)])
+        partial = {}
+        for field, v in values.items():
+            v = v[order]
+            partial[field] = (counts, np.add.reduceat(v, starts), np.add.reduceat(v * v, starts),
+                              np.minimum.reduceat(v, starts), np.maximum.reduceat(v, starts))
+
+        bucket_field = SensorRollup._meta.get_field('bucket')
+        buckets = [bucket_field.get_db_prep_value(_to_datetime(key), connection) for key in keys]
+        for field, stats in partial.items():
+            rows.extend((source, field, resolution, bucket, *row)
+                        for bucket, row in zip(buckets, zip(*(stat.tolist() for stat in stats))))
+
+    max_params = connection.features.max_query_params
+    if max_params:
+        batch_size = min(batch_size, max_params // (4 + len(STATS)))
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            cursor.execute(_merge_statement(len(batch)), [param for row in batch for param in row])
+
+
+def rebuild_rollups(source, start=None, end=None, chunk_size=50000):
+    """
+    Recompute the rollups of a source from the raw rows, for every bucket touching [start, end]
+    (all of them by default). Used after rows are changed or deleted.
+    """
+    model_name, time_field, fields = SOURCES[source]
+    Model = apps.get_model('timeseries', model_name)
+
+    # Widen the range to whole days so every rollup bucket in it is recomputed completely
+    day = RESOLUTIONS[-1]
+    rollups = SensorRollup.objects.filter(source=source)
+    rows = Model.objects.all()
+    if start is not None:
+        start = _to_datetime(np.floor(_to_epoch(start) / day) * day)
+        rollups, rows = rollups.filter(bucket__gte=start), rows.filter(**{f'{time_field}__gte': start})
+    if end is not None:
+        end = _to_datetime((np.floor(_to_epoch(end) / day) + 1) * day)
+        rollups, rows = rollups.filter(bucket__lt=end), rows.filter(**{f'{time_field}__lt': end})
+    rollups.delete()
+
+    chunk = []
+    for row in rows.order_by(time_field).values_list(time_field, *fields).iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            _add_rows(source, chunk, fields)
+            chunk = []
+    _add_rows(source, chunk, fields)
+
+
+def _add_rows(source, rows, fields):
+    if rows:
+        columns = list(zip(*rows))
+        add_to_rollups(source, columns[0], dict(zip(fields, columns[1:])))
+
+
+def choose_resolution(seconds):
+    """Coarsest rollup resolution that divides the requested bucket width, or None."""
+    fitting = [resolution for resolution in RESOLUTIONS if seconds % resolution == 0]
+    return max(fitting) if fitting else None
+
+
+def _merge(stats, bucket, field, count, total, total_sq, low, high):
+    entry = stats.setdefault(bucket, {}).get(field)
+    if entry is None:
+        stats[bucket][field] = [count, total, total_sq, low, high]
+    else:
+        entry[0] += count
+        entry[1] += total
+        entry[2] += total_sq
+        entry[3] = min(entry[3], low)
+        entry[4] = max(entry[4], high)
+
+
+def bucket_statistics(source, queryset, fields, seconds, start=None, end=None):
+    """
+    Count, sum, sum of squares, min and max per field and bucket of `seconds`, over [start, end].
+
+    Whole rollup buckets inside the range are read from the coarsest fitting rollup; only the
+    raw rows at the edges of the range that do not fill a rollup bucket are scanned.
+
+    Returns:
+    - ({bucket epoch: {field: [count, sum, sum_sq, min, max]}}, rollup resolution or None)
+    """
+    time_field = SOURCES[source][1]
+    resolution = choose_resolution(seconds)
+    stats = {}
+
+    # Rollup buckets entirely inside [start, end] (end is inclusive, to the microsecond)
+    lo = hi = None
+    if resolution is not None:
+        lo = None if start is None else _to_datetime(np.ceil(_to_epoch(start) / resolution) * resolution)
+        hi = None if end is None else _to_datetime(
+            np.floor(_to_epoch(end + timedelta(microseconds=1)) / resolution) * resolution)
+        if lo is not None and hi is not None and lo >= hi:
+            resolution = None
+
+    # Raw rows are only read where no whole rollup bucket covers them: (from, to, lookup for to)
+    raw_ranges = [(start, end, 'lte')]
+    if resolution is not None:
+        rollups = SensorRollup.objects.filter(source=source, resolution=resolution, field__in=fields)
+        if lo is not None:
+            rollups = rollups.filter(bucket__gte=lo)
+        if hi is not None:
+            rollups = rollups.filter(bucket__lt=hi)
+        grouped = (rollups.annotate(out=EpochBucket('bucket', seconds))
+                   .values('out', 'field')
+                   .annotate(n=Sum('count'), s=Sum('sum'), ss=Sum('sum_sq'), low=Min('min'), high=Max('max'))
+                   .values_list('out', 'field', 'n', 's', 'ss', 'low', 'high'))
+        for bucket, field, *values in grouped:
+            _merge(stats, bucket, field, *values)
+
+        raw_ranges = []
+        if lo is not None and lo != start:
+            raw_ranges.append((start, lo, 'lt'))
+        if hi is not None:
+            raw_ranges.append((hi, end, 'lte'))
+
+    for raw_start, raw_end, end_lookup in raw_ranges:
+        rows = queryset.order_by()
+        if raw_start is not None:
+            rows = rows.filter(**{f'{time_field}__gte': raw_start})
+        if raw_end is not None:
+            rows = rows.filter(**{f'{time_field}__{end_lookup}': raw_end})
+        annotations = {}
+        for field in fields:
+            annotations.update({
+                f'{field}_n': Count(field),
+                f'{field}_s': Sum(field),
+                f'{field}_ss': Sum(F(field) * F(field)),
+                f'{field}_low': Min(field),
+                f'{field}_high': Max(field),
+            })
+        grouped = rows.annotate(out=EpochBucket(time_field, seconds)).values('out').annotate(**annotations)
+        for row in grouped:
+            for field in fields:
+                if row[f'{field}_n']:
+                    _merge(stats, row['out'], field, row[f'{field}_n'], row[f'{field}_s'], row[f'{field}_ss'],
+                           row[f'{field}_low'], row[f'{field}_high'])
+
+    return dict(sorted(stats.items())), resolution
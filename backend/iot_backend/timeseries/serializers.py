@@ -1,5 +1,7 @@
 from rest_framework import serializers
-from .models import TimeSeriesData, ProcessedSensorData
+from .models import TimeSeriesData, ProcessedSensorData, SensorStream, SensorReading
+
+MAX_BULK_READINGS = 100000
 
 class TimeSeriesDataSerializer(serializers.ModelSerializer):
     class Meta:
@@ -10,3 +12,29 @@ class ProcessedSensorDataSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProcessedSensorData
         fields = '__all__'
+
+class SensorStreamSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SensorStream
+        fields = '__all__'
+
+class SensorReadingSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SensorReading
+        fields = '__all__'
+
+class BulkDataUploadSerializer(serializers.Serializer):
+    """
+    Envelope of BulkDataUploadDTO; the readings themselves are validated column by column
+    (readings.parse_readings) rather than field by field here.
+    """
+    device_id = serializers.UUIDField()
+    metric_name = serializers.CharField(max_length=64)
+    readings = serializers.JSONField()
+
+    def validate_readings(self, value):
+        if not isinstance(value, list) or not value:
+            raise serializers.ValidationError('Expected a non-empty list of {timestamp: value} objects.')
+        if len(value) > MAX_BULK_READINGS:
+            raise serializers.ValidationError(f'At most {MAX_BULK_READINGS} readings per request.')
+        return value
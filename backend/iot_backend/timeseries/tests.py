@@ -1,3 +1,549 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import re
+import tempfile
+import threading
+import unittest
+import uuid
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from rest_framework.test import APITestCase
+
+from timeseries.aggregation import aggregate_buckets
+from timeseries.buffer import WriteBuffer, close_buffers
+from timeseries.correlations import rolling_correlations
+from timeseries.ingest import iter_json_records
+from timeseries.models import TimeSeriesData, ProcessedSensorData, SensorRollup, SensorReading, SensorStream
+from timeseries.readings import LEGACY_DEVICES, store_readings
+from timeseries.rollups import SOURCES, add_to_rollups, rebuild_rollups
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+PROCESSED_FIELDS = SOURCES['processed'][2]
+
+
+class ImportTimeseriesTests(TestCase):
+    def write_workbook(self, df):
+        fd, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        df.to_excel(path, sheet_name='Simple Data Relation', index=False)
+        return path
+
+    def test_imports_every_time_format_in_batches(self):
+        path = self.write_workbook(pd.DataFrame({
+            'time': [' 00:10:00', 30, 45.5, pd.Timestamp('2025-03-01 10:00'), 'bad'],
+            'sensor 1': [1.0, 2.0, 3.0, 4.0, 5.0],
+            'sensor 2': [1.0, 2.0, 3.0, 4.0, 5.0],
+            'sensor 3': [1.0, 2.0, 3.0, 4.0, 5.0],
+            'c(s1, s2)': [0.5, 'w=15', None, 1.0, 1.0],
+        }))
+        out = StringIO()
+        call_command('import_timeseries', path, '--batch-size', '2', '--window', '0', stdout=out)
+
+        rows = list(TimeSeriesData.objects.order_by('id'))
+        self.assertEqual([row.timestamp for row in rows], [
+            datetime(1900, 1, 1, 0, 10, tzinfo=timezone.utc),
+            datetime(1900, 1, 1, 0, 30, tzinfo=timezone.utc),
+            datetime(1900, 1, 1, 0, 45, 30, tzinfo=timezone.utc),
+            datetime(2025, 3, 1, 10, 0, tzinfo=timezone.utc),
+        ])
+        self.assertEqual([row.correlation_s1_s2 for row in rows], [0.5, None, None, 1.0])
+        self.assertIsNone(rows[0].correlation_s2_s3)
+        self.assertIn('Skipping row 4', out.getvalue())
+        self.assertIn('Imported 4/4 rows', out.getvalue())
+
+    def test_skips_rows_without_sensor_values(self):
+        path = self.write_workbook(pd.DataFrame({
+            'time': [0, 1],
+            'sensor 1': [1.0, None],
+            'sensor 2': [1.0, 2.0],
+            'sensor 3': [1.0, 2.0],
+        }))
+        call_command('import_timeseries', path, stdout=StringIO())
+        self.assertEqual(TimeSeriesData.objects.count(), 1)
+
+    def test_materializes_rolling_correlations_and_updates_them_for_late_rows(self):
+        minutes = np.arange(40.0)
+        rng = np.random.default_rng(1)
+        df = pd.DataFrame({'time': minutes, 'sensor 1': rng.normal(size=40), 'sensor 2': rng.normal(size=40),
+                           'sensor 3': rng.normal(size=40)})
+        expected = df['sensor 1'].rolling(5).corr(df['sensor 2'])
+
+        # Even minutes first, then the odd ones arriving late in between
+        call_command('import_timeseries', self.write_workbook(df[::2]), '--window', '5', stdout=StringIO())
+        call_command('import_timeseries', self.write_workbook(df[1::2]), '--window', '5', '--batch-size', '7',
+                     stdout=StringIO())
+        stored = TimeSeriesData.objects.order_by('timestamp').values_list('correlation_s1_s2', flat=True)
+        np.testing.assert_allclose(np.array(stored, dtype=float), expected.to_numpy())
+
+        with self.settings(TIMESERIES_CORRELATION_WINDOW=5):
+            row = TimeSeriesData.objects.order_by('timestamp')[20]
+            self.client.patch(f'/api/data/{row.id}/', {'sensor1': 100.0}, content_type='application/json')
+        df.loc[20, 'sensor 1'] = 100.0
+        expected = df['sensor 1'].rolling(5).corr(df['sensor 2'])
+        stored = TimeSeriesData.objects.order_by('timestamp').values_list('correlation_s1_s2', flat=True)
+        np.testing.assert_allclose(np.array(stored, dtype=float), expected.to_numpy())
+
+
+class RollingCorrelationTests(SimpleTestCase):
+    def test_quiet_windows_in_a_loud_batch_are_recomputed_exactly(self):
+        rng = np.random.default_rng(3)
+        n, window = 200, 10
+        columns = {'sensor1': rng.normal(size=n) * 1e6, 'sensor2': rng.normal(size=n) * 1e6,
+                   'sensor3': rng.normal(size=n)}
+        quiet = rng.normal(size=20) * 1e-3
+        columns['sensor1'][100:120] = 5e6 + quiet
+        columns['sensor2'][100:120] = -3e6 + 2 * quiet + rng.normal(size=20) * 1e-3
+        columns['sensor3'][150:170] = 7.0
+
+        out = rolling_correlations(columns, window)
+        expected = [np.corrcoef(columns['sensor1'][i:i + window], columns['sensor2'][i:i + window])[0, 1]
+                    for i in range(100, 111)]
+        np.testing.assert_allclose(out['correlation_s1_s2'][window + 99:window + 110], expected, atol=1e-6)
+        self.assertTrue(np.isnan(out['correlation_s1_s3'][159:170]).all())
+        self.assertFalse(np.isnan(out['correlation_s1_s3'][window - 1:159]).any())
+
+
+def processed_entry(entry_id, **overrides):
+    entry = {
+        "created_at": f"2025-03-19T15:{entry_id % 60:02d}:00.000Z",
+        "entry_id": entry_id,
+        "Temperature": 22,
+        "RH Humidity": 40,
+        "Usable Light Index": 0,
+        "Atmosphere hPa": 1005,
+        "Voltage Charge": 12.5,
+        "was_interpolated": False,
+    }
+    entry.update(overrides)
+    return entry
+
+
+class ImportProcessedDataTests(TestCase):
+    def write_file(self, text, suffix='.json'):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_iter_json_records_reads_arrays_and_ndjson_in_small_chunks(self):
+        entries = [processed_entry(i) for i in range(5)]
+        for text in (json.dumps(entries, indent=2), '\n'.join(json.dumps(e) for e in entries) + '\n'):
+            with open(self.write_file(text)) as f:
+                self.assertEqual(list(iter_json_records(f, chunk_size=7)), entries)
+
+    def test_imports_in_batches_and_skips_invalid_entries(self):
+        entries = [processed_entry(i) for i in range(1, 6)]
+        entries[2]["Temperature"] = None
+        entries[0]["was_interpolated"], entries[1]["was_interpolated"] = "false", "True"
+        entries[3]["was_interpolated"], entries[4]["was_interpolated"] = 1, "no"
+        path = self.write_file(json.dumps(entries))
+        out = StringIO()
+        call_command('import_processed_data', path, '--batch-size', '2', stdout=out)
+
+        stored = ProcessedSensorData.objects.order_by('entry_id').values_list('entry_id', 'was_interpolated')
+        self.assertEqual(list(stored), [(1, False), (2, True), (4, True)])
+        self.assertIn("invalid was_interpolated 'no'", out.getvalue())
+        self.assertIn('Imported 3 new records (0 already stored, 2 skipped)', out.getvalue())
+        self.assertFalse(os.path.exists(f'{path}.checkpoint'))
+
+    def test_resumes_after_checkpoint(self):
+        path = self.write_file('\n'.join(json.dumps(processed_entry(i)) for i in range(1, 6)), suffix='.ndjson')
+        with open(f'{path}.checkpoint', 'w') as f:
+            json.dump({'last_entry_id': 3}, f)
+        self.addCleanup(lambda: os.path.exists(f'{path}.checkpoint') and os.remove(f'{path}.checkpoint'))
+
+        call_command('import_processed_data', path, stdout=StringIO())
+        self.assertEqual(list(ProcessedSensorData.objects.order_by('entry_id').values_list('entry_id', flat=True)),
+                         [4, 5])
+
+    def test_ndjson_resumes_from_the_checkpoint_offset(self):
+        lines = [json.dumps(processed_entry(i)) for i in range(1, 7)]
+        lines[1] = '{not json'  # before the checkpoint, so it must not be parsed again
+        path = self.write_file('\n'.join(lines) + '\n', suffix='.ndjson')
+        offset = len('\n'.join(lines[:3])) + 1
+        with open(f'{path}.checkpoint', 'w') as f:
+            json.dump({'last_entry_id': '3', 'offset': offset}, f)
+        self.addCleanup(lambda: os.path.exists(f'{path}.checkpoint') and os.remove(f'{path}.checkpoint'))
+
+        call_command('import_processed_data', path, '--batch-size', '2', stdout=StringIO())
+        self.assertEqual(list(ProcessedSensorData.objects.order_by('entry_id').values_list('entry_id', flat=True)),
+                         [4, 5, 6])
+        self.assertFalse(os.path.exists(f'{path}.checkpoint'))
+
+    def test_string_entry_ids_are_normalized_and_others_skipped(self):
+        entries = [processed_entry(i) for i in range(1, 6)]
+        entries[1]["entry_id"] = "2"
+        entries[3]["entry_id"] = "four"
+        path = self.write_file('\n'.join(json.dumps(e) for e in entries), suffix='.ndjson')
+        with open(f'{path}.checkpoint', 'w') as f:
+            json.dump({'last_entry_id': 2}, f)
+        self.addCleanup(lambda: os.path.exists(f'{path}.checkpoint') and os.remove(f'{path}.checkpoint'))
+
+        out = StringIO()
+        call_command('import_processed_data', path, stdout=out)
+        self.assertEqual(list(ProcessedSensorData.objects.order_by('entry_id').values_list('entry_id', flat=True)),
+                         [3, 5])
+        self.assertIn('Imported 2 new records (0 already stored, 1 skipped)', out.getvalue())
+
+        out = StringIO()
+        call_command('import_processed_data', path, '--since-last', stdout=out)
+        self.assertIn('Imported 0 new records', out.getvalue())
+
+    def test_reimport_skips_or_updates_existing_entries(self):
+        path = self.write_file(json.dumps([processed_entry(i) for i in range(1, 4)]))
+        call_command('import_processed_data', path, stdout=StringIO())
+        out = StringIO()
+        call_command('import_processed_data', path, stdout=out)
+        self.assertEqual(ProcessedSensorData.objects.count(), 3)
+        self.assertIn('Imported 0 new records (3 already stored', out.getvalue())
+
+        path = self.write_file(json.dumps([processed_entry(2, Temperature=30), processed_entry(4)]))
+        call_command('import_processed_data', path, '--update-existing', stdout=StringIO())
+        self.assertEqual(ProcessedSensorData.objects.count(), 4)
+        self.assertEqual(ProcessedSensorData.objects.get(entry_id=2).temperature, 30)
+
+    def test_since_last_reads_only_new_ndjson_lines(self):
+        call_command('import_processed_data', self.write_file(json.dumps([processed_entry(i) for i in range(1, 51)])),
+                     stdout=StringIO())
+        lines = [json.dumps(processed_entry(i)) for i in range(1, 61)]
+        lines[10] = '{not json'  # an old, unreadable line must not be reached
+        path = self.write_file('\n'.join(lines) + '\n', suffix='.ndjson')
+
+        out = StringIO()
+        call_command('import_processed_data', path, '--since-last', stdout=out)
+        self.assertIn('Imported 10 new records (0 already stored, 0 skipped)', out.getvalue())
+        self.assertEqual(ProcessedSensorData.objects.count(), 60)
+
+
+class ProcessedSensorDataApiTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        start = datetime(2025, 3, 19, tzinfo=timezone.utc)
+        ProcessedSensorData.objects.bulk_create([
+            ProcessedSensorData(created_at=start + timedelta(minutes=i), entry_id=i, temperature=i, humidity=0,
+                                light_index=0, atmosphere=0, voltage=0, was_interpolated=False)
+            for i in range(25)
+        ])
+        rebuild_rollups('processed')
+
+    def test_pages_follow_the_cursor_in_time_order(self):
+        url, seen = '/api/processed/?page_size=10', []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [row['entry_id'] for row in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(seen, list(range(25)))
+
+    def test_filters_by_start_and_end(self):
+        response = self.client.get('/api/processed/', {'start': '2025-03-19T00:05:00Z', 'end': '2025-03-19T00:07:00Z'})
+        self.assertEqual([row['entry_id'] for row in response.data['results']], [5, 6, 7])
+        self.assertEqual(self.client.get('/api/processed/', {'start': 'yesterday'}).status_code, 400)
+
+    def test_aggregates_buckets_as_columns(self):
+        response = self.client.get('/api/processed/aggregate/', {
+            'bucket': '10m', 'agg': 'mean,min,max,std', 'fields': 'temperature', 'end': '2025-03-19T00:24:00Z'})
+        self.assertEqual(response.status_code, 200)
+        start = int(datetime(2025, 3, 19, tzinfo=timezone.utc).timestamp())
+        self.assertEqual(response.data['time'], [start, start + 600, start + 1200])
+        self.assertEqual(response.data['count'], [10, 10, 5])
+        self.assertEqual(response.data['temperature']['mean'], [4.5, 14.5, 22.0])
+        self.assertEqual(response.data['temperature']['min'], [0, 10, 20])
+        self.assertEqual(response.data['temperature']['max'], [9, 19, 24])
+        self.assertAlmostEqual(response.data['temperature']['std'][2], 1.5811388, places=6)
+        self.assertNotIn('humidity', response.data)
+
+    def test_aggregate_rejects_unknown_parameters(self):
+        for params in ({'bucket': '5x'}, {'agg': 'median'}, {'fields': 'entry_id'}):
+            self.assertEqual(self.client.get('/api/processed/aggregate/', params).status_code, 400)
+
+    def test_aggregate_from_rollups_matches_raw_rows(self):
+        start, end = datetime(2025, 3, 19, 0, 2, 30, tzinfo=timezone.utc), datetime(2025, 3, 19, 0, 21, tzinfo=timezone.utc)
+        response = self.client.get('/api/processed/aggregate/', {
+            'bucket': '5m', 'agg': 'mean,min,max,sum,std', 'fields': 'temperature',
+            'start': start.isoformat(), 'end': end.isoformat()})
+        self.assertEqual(response.data['rollup'], 60)
+
+        raw = aggregate_buckets(ProcessedSensorData.objects.filter(created_at__gte=start, created_at__lte=end),
+                                'created_at', ['temperature'], ['mean', 'min', 'max', 'sum', 'std'], 300)
+        self.assertEqual(response.data['time'], raw['time'])
+        self.assertEqual(response.data['count'], raw['count'])
+        for agg, values in raw['temperature'].items():
+            for value, expected in zip(response.data['temperature'][agg], values):
+                self.assertAlmostEqual(value, expected, places=9)
+
+    def test_rollup_merges_add_to_the_stored_buckets(self):
+        fields = ('field', 'resolution', 'bucket', 'count', 'sum', 'sum_sq', 'min', 'max')
+        expected = sorted(SensorRollup.objects.filter(source='processed').values_list(*fields))
+        SensorRollup.objects.all().delete()
+
+        # Interleaved halves land in the same buckets, so the second pass merges into the first
+        rows = list(ProcessedSensorData.objects.order_by('created_at').values_list('created_at', *PROCESSED_FIELDS))
+        for part in (rows[::2], rows[1::2]):
+            columns = list(zip(*part))
+            add_to_rollups('processed', columns[0], dict(zip(PROCESSED_FIELDS, columns[1:])))
+
+        self.assertEqual(sorted(SensorRollup.objects.values_list(*fields)), expected)
+
+    def test_columns_follow_the_cursor_and_negotiate_the_format(self):
+        url, seen = '/api/processed/columns/?page_size=10&end=2025-03-19T00:20:00Z', []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response['Content-Type'], 'application/json')
+            body = json.loads(response.content)
+            self.assertEqual(set(body), {f.attname for f in ProcessedSensorData._meta.concrete_fields})
+            seen += body['entry_id']
+            next_link = re.search(r'<([^>]*)>; rel="next"', response.get('Link', ''))
+            url = next_link and next_link.group(1)
+        self.assertEqual(seen, list(range(21)))
+
+        response = self.client.get('/api/processed/columns/', {'end': '2025-03-19T00:01:00Z'}, HTTP_ACCEPT='text/csv')
+        lines = response.content.decode().splitlines()
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        self.assertEqual(len(lines), 3)
+        self.assertIn('temperature', lines[0].split(','))
+
+    @unittest.skipUnless(pa, 'requires pyarrow')
+    def test_columns_render_as_arrow(self):
+        response = self.client.get('/api/processed/columns/', {'format': 'arrow', 'end': '2025-03-19T00:01:00Z'})
+        self.assertEqual(response['Content-Type'], 'application/vnd.apache.arrow.stream')
+        table = pa.ipc.open_stream(response.content).read_all()
+        self.assertEqual(table.column('entry_id').to_pylist(), [0, 1])
+        self.assertEqual(table.column_names, [f.attname for f in ProcessedSensorData._meta.concrete_fields])
+
+    def test_export_streams_csv_and_ndjson(self):
+        response = self.client.get('/api/processed/export/', {'start': '2025-03-19T00:10:00Z'}, HTTP_ACCEPT='text/csv')
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'created_at', 'entry_id'])
+        self.assertEqual(len(lines), 1 + ProcessedSensorData.objects.filter(entry_id__gte=10).count())
+
+        response = self.client.get('/api/processed/export/?format=ndjson&end=2025-03-19T00:01:00Z')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([record['entry_id'] for record in records], [0, 1])
+
+    @unittest.skipUnless(pa, 'requires pyarrow')
+    def test_export_streams_arrow_batches(self):
+        response = self.client.get('/api/processed/export/', {'format': 'arrow', 'end': '2025-03-19T00:20:00Z'})
+        self.assertEqual(response['Content-Type'], 'application/vnd.apache.arrow.stream')
+        table = pa.ipc.open_stream(b''.join(response.streaming_content)).read_all()
+        self.assertEqual(table.column('entry_id').to_pylist(), list(range(21)))
+        self.assertEqual(table.schema.field('created_at').type, pa.timestamp('us', tz='UTC'))
+        self.assertEqual(table.schema.field('was_interpolated').type, pa.bool_())
+
+    @unittest.skipUnless(pa, 'requires pyarrow')
+    def test_export_streams_readings_with_uuid_streams_as_arrow(self):
+        device = uuid.uuid4()
+        start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        store_readings(device, [start + timedelta(seconds=i) for i in range(3)], {'a': [1.0, 2.0, 3.0]})
+        stream_id = SensorStream.objects.get(device_id=device).stream_id
+
+        response = self.client.get('/api/readings/export/', {'format': 'arrow', 'device': device})
+        table = pa.ipc.open_stream(b''.join(response.streaming_content)).read_all()
+        self.assertEqual(table.schema.field('stream_id').type, pa.string())
+        self.assertEqual(table.column('stream_id').to_pylist(), [str(stream_id)] * 3)
+        self.assertEqual(table.column('value').to_pylist(), [1.0, 2.0, 3.0])
+
+class RollupMaintenanceTests(APITestCase):
+    def test_imports_and_api_writes_update_rollups(self):
+        fd, path = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump([processed_entry(i, Temperature=i) for i in range(1, 5)], f)
+        self.addCleanup(os.remove, path)
+        call_command('import_processed_data', path, '--batch-size', '3', stdout=StringIO())
+        hour = SensorRollup.objects.get(source='processed', field='temperature', resolution=3600)
+        self.assertEqual((hour.count, hour.sum, hour.sum_sq, hour.min, hour.max), (4, 10, 30, 1, 4))
+
+        with open(path, 'w') as f:
+            json.dump([processed_entry(4, Temperature=10)], f)
+        call_command('import_processed_data', path, '--update-existing', stdout=StringIO())
+        hour = SensorRollup.objects.get(source='processed', field='temperature', resolution=3600)
+        self.assertEqual((hour.count, hour.sum, hour.max), (4, 16, 10))
+
+        row = {'timestamp': '2025-01-01T00:00:30Z', 'sensor1': 1.0, 'sensor2': 2.0, 'sensor3': 3.0}
+        created = self.client.post('/api/data/', row, format='json').data
+        self.client.post('/api/data/', {**row, 'sensor1': 5.0}, format='json')
+        minute = SensorRollup.objects.get(source='timeseries', field='sensor1', resolution=60)
+        self.assertEqual((minute.count, minute.sum), (2, 6.0))
+
+        self.client.delete(f"/api/data/{created['id']}/")
+        minute = SensorRollup.objects.get(source='timeseries', field='sensor1', resolution=60)
+        self.assertEqual((minute.count, minute.sum), (1, 5.0))
+
+class SensorReadingStoreTests(APITestCase):
+    def test_any_number_of_streams_pivot_back_to_columns(self):
+        device = uuid.uuid4()
+        start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        times = [start + timedelta(seconds=i) for i in range(5)]
+        columns = {f'channel{i:03d}': [float(i + t) for t in range(5)] for i in range(200)}
+        columns['channel000'][2] = None
+        self.assertEqual(store_readings(device, times, columns), 999)
+        self.assertEqual(SensorStream.objects.filter(device_id=device).count(), 200)
+
+        response = self.client.get('/api/readings/', {'device': device, 'metric': 'channel007'})
+        self.assertEqual([reading['value'] for reading in response.data['results']], [7.0, 8.0, 9.0, 10.0, 11.0])
+
+        url = f'/api/readings/wide/?device={device}&metrics=channel000,channel199&page_size=3'
+        response = self.client.get(url)
+        self.assertEqual(response.data['channel000'], [0.0, 1.0, None])
+        self.assertEqual(response.data['channel199'], [199.0, 200.0, 201.0])
+        next_url = re.search(r'<([^>]*)>; rel="next"', response['Link']).group(1)
+        self.assertEqual(self.client.get(next_url).data['channel199'], [202.0, 203.0])
+        response = self.client.get('/api/readings/wide/', {'device': device, 'metrics': 'channel000,unknown'})
+        self.assertEqual(response.status_code, 400)
+
+        self.assertEqual(store_readings(device, times[:2], {'channel007': [70.0, 71.0]}), 0)
+        self.assertEqual(store_readings(device, times[:2], {'channel007': [None, 80.0]}, update=True), 1)
+        response = self.client.get('/api/readings/', {'device': device, 'metric': 'channel007'})
+        self.assertEqual([reading['value'] for reading in response.data['results']], [7.0, 80.0, 9.0, 10.0, 11.0])
+
+    def test_fixed_column_tables_are_mirrored(self):
+        row = {'timestamp': '2025-01-01T00:00:30Z', 'sensor1': 1.0, 'sensor2': 2.0, 'sensor3': 3.0}
+        created = self.client.post('/api/data/', row, format='json').data
+        device = LEGACY_DEVICES['timeseries']
+        response = self.client.get('/api/readings/wide/', {'device': device})
+        self.assertEqual((response.data['sensor1'], response.data['sensor3']), ([1.0], [3.0]))
+
+        self.client.patch(f"/api/data/{created['id']}/", {'sensor1': 4.0}, format='json')
+        self.assertEqual(self.client.get('/api/readings/wide/', {'device': device}).data['sensor1'], [4.0])
+        self.client.delete(f"/api/data/{created['id']}/")
+        self.assertFalse(SensorReading.objects.filter(stream__device_id=device).exists())
+
+        fd, path = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump([processed_entry(i, Temperature=i) for i in range(1, 4)], f)
+        self.addCleanup(os.remove, path)
+        call_command('import_processed_data', path, stdout=StringIO())
+        response = self.client.get('/api/readings/wide/', {'device': LEGACY_DEVICES['processed'], 'metrics': 'temperature'})
+        self.assertEqual(response.data['temperature'], [1.0, 2.0, 3.0])
+
+    def test_bulk_upload_validates_columnwise_and_skips_stored_readings(self):
+        device = str(uuid.uuid4())
+        readings = [{f'2025-01-01T00:00:{i:02d}Z': i * 1.5} for i in range(50)]
+        readings += [{'yesterday': 1.0}, {'2025-01-01T00:01:00Z': 'high'}, {'2025-01-01T00:01:00Z': 1, 'x': 2}]
+        response = self.client.post('/api/readings/bulk/', {'device_id': device, 'metric_name': 'temperature',
+                                                            'readings': readings}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual({key: response.data[key] for key in ('received', 'stored', 'duplicates', 'rejected')},
+                         {'received': 53, 'stored': 50, 'duplicates': 0, 'rejected': 3})
+        self.assertEqual(set(response.data['errors']), {'50', '51', '52'})
+        stream = SensorStream.objects.get(device_id=device, metric_name='temperature')
+        self.assertEqual(stream.readings.get(timestamp=datetime(2025, 1, 1, 0, 0, 3, tzinfo=timezone.utc)).value, 4.5)
+
+        again = readings[45:50] + [{'2025-01-01T01:00:00+01:00': 2.0}]
+        response = self.client.post('/api/readings/bulk/', {'device_id': device, 'metric_name': 'temperature',
+                                                            'readings': again}, format='json')
+        self.assertEqual((response.data['stored'], response.data['duplicates']), (0, 6))
+        self.assertEqual(stream.readings.count(), 50)
+
+        response = self.client.post('/api/readings/bulk/', {'device_id': LEGACY_DEVICES['timeseries'],
+                                                            'metric_name': 'sensor1', 'readings': readings},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class IngestBufferTests(TransactionTestCase):
+    async def test_buffer_flushes_in_bulk_and_refuses_when_full(self):
+        device = uuid.uuid4()
+        times = pd.date_range('2025-01-01', periods=180, freq='s', tz='UTC')
+        buffer = WriteBuffer(flush_size=100, flush_interval=0.05, max_pending=150)
+        self.assertTrue(buffer.offer(device, 'a', times[:60], np.arange(60.0)))
+        self.assertTrue(buffer.offer(device, 'b', times[60:120], np.arange(60.0)))
+        self.assertFalse(buffer.offer(device, 'a', times[120:], np.arange(60.0)))
+        self.assertEqual(buffer.pending, 120)
+
+        await buffer.close()
+        metrics = buffer.metrics()
+        self.assertEqual((metrics['queue_depth'], metrics['flushes'], metrics['rows_flushed']), (0, 1, 120))
+        self.assertEqual(metrics['rows_refused'], 60)
+        self.assertEqual(await SensorReading.objects.filter(stream__device_id=device).acount(), 120)
+
+    async def test_rows_being_written_count_against_the_capacity(self):
+        device = uuid.uuid4()
+        times = pd.date_range('2025-01-01', periods=40, freq='s', tz='UTC')
+        buffer = WriteBuffer(flush_size=1000, flush_interval=60, max_pending=30)
+        started, release = threading.Event(), threading.Event()
+
+        def blocked_write(*args):
+            started.set()
+            release.wait(5)
+
+        with mock.patch('timeseries.buffer.write_readings', side_effect=blocked_write):
+            buffer.offer(device, 'a', times[:20], np.arange(20.0))
+            flush = asyncio.ensure_future(buffer.flush())
+            await sync_to_async(started.wait)(5)
+            self.assertEqual((buffer.pending, buffer.metrics()['in_flight']), (20, 20))
+            self.assertFalse(buffer.offer(device, 'a', times[20:], np.arange(20.0, 40.0)))
+            self.assertTrue(buffer.offer(device, 'a', times[20:30], np.arange(20.0, 30.0)))
+            release.set()
+            await flush
+        self.assertEqual((buffer.pending, buffer.metrics()['rows_refused']), (10, 20))
+        await buffer.close()
+
+    async def test_failed_flushes_are_retried_before_the_batch_is_dropped(self):
+        device = uuid.uuid4()
+        times = pd.date_range('2025-01-01', periods=40, freq='s', tz='UTC')
+        buffer = WriteBuffer(flush_size=1000, flush_interval=60, max_pending=30, max_retries=1)
+        with mock.patch('timeseries.buffer.write_readings', side_effect=OperationalError('database is locked')):
+            buffer.offer(device, 'a', times[:20], np.arange(20.0))
+            with self.assertRaises(OperationalError):
+                await buffer.flush()
+            # The failed rows stay queued and still count against the capacity
+            self.assertEqual(buffer.pending, 20)
+            self.assertFalse(buffer.offer(device, 'a', times[20:], np.arange(20.0, 40.0)))
+            with self.assertRaises(OperationalError), self.assertLogs('timeseries.buffer', 'ERROR'):
+                await buffer.flush()
+        self.assertEqual((buffer.pending, buffer.metrics()['rows_dropped']), (0, 20))
+
+        buffer.offer(device, 'a', times[20:], np.arange(20.0, 40.0))
+        with mock.patch('timeseries.buffer.write_readings', side_effect=[OperationalError('database is locked'), None]):
+            with self.assertRaises(OperationalError):
+                await buffer.flush()
+            await buffer.flush()
+        metrics = buffer.metrics()
+        self.assertEqual((metrics['flush_errors'], metrics['rows_flushed'], metrics['failed_attempts']), (3, 20, 0))
+        await buffer.close()
+
+    async def test_ingest_endpoint_queues_pushes_and_answers_429_when_full(self):
+        device = str(uuid.uuid4())
+        push = {'device_id': device, 'metric_name': 'temperature',
+                'readings': [{f'2025-01-01T00:00:{i:02d}Z': float(i)} for i in range(10)] + [{'bad': 1}]}
+        with self.settings(INGEST_BUFFER={'FLUSH_SIZE': 1000, 'FLUSH_INTERVAL': 60, 'MAX_PENDING': 15}):
+            response = await self.async_client.post('/api/ingest/', push, content_type='application/json')
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual((response.json()['accepted'], response.json()['rejected']), (10, 1))
+
+            response = await self.async_client.post('/api/ingest/', push, content_type='application/json')
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response['Retry-After'], '1')
+            metrics = (await self.async_client.get('/api/ingest/metrics/')).json()
+            self.assertEqual((metrics['queue_depth'], metrics['pushes_refused']), (10, 1))
+
+            large = {**push, 'readings': [{f'2025-01-01T00:01:{i:02d}Z': float(i)} for i in range(20)]}
+            response = await self.async_client.post('/api/ingest/', large, content_type='application/json')
+            self.assertEqual(response.status_code, 413)
+
+            legacy = {**push, 'device_id': str(LEGACY_DEVICES['processed'])}
+            response = await self.async_client.post('/api/ingest/', legacy, content_type='application/json')
+            self.assertEqual((response.status_code, list(response.json())), (400, ['device_id']))
+
+            await close_buffers()
+        readings = SensorReading.objects.filter(stream__device_id=device)
+        self.assertEqual(await readings.acount(), 10)
@@ -1,11 +1,16 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TimeSeriesDataViewSet , ProcessedSensorDataViewSet
+from .views import (TimeSeriesDataViewSet , ProcessedSensorDataViewSet, SensorStreamViewSet, SensorReadingViewSet,
+                    ingest, ingest_metrics)
 
 router = DefaultRouter()
 router.register(r'data', TimeSeriesDataViewSet, basename='timeseries')
 router.register(r'processed', ProcessedSensorDataViewSet)
+router.register(r'streams', SensorStreamViewSet)
+router.register(r'readings', SensorReadingViewSet)
 
 urlpatterns = [
+    path('ingest/', ingest, name='ingest'),
+    path('ingest/metrics/', ingest_metrics, name='ingest-metrics'),
     path('', include(router.urls)),
 ]
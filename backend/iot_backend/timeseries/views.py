@@ -1,11 +1,293 @@
-from rest_framework import viewsets
-from .models import TimeSeriesData, ProcessedSensorData
-from .serializers import TimeSeriesDataSerializer, ProcessedSensorDataSerializer
+import json
 
-class TimeSeriesDataViewSet(viewsets.ModelViewSet):
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from .models import TimeSeriesData, ProcessedSensorData, SensorStream, SensorReading
+from .serializers import (TimeSeriesDataSerializer, ProcessedSensorDataSerializer, SensorStreamSerializer,
+                          SensorReadingSerializer, BulkDataUploadSerializer)
+from .filters import TimeSeriesDataFilter, ProcessedSensorDataFilter, SensorStreamFilter, SensorReadingFilter
+from .pagination import (TimeSeriesDataPagination, ProcessedSensorDataPagination, SensorReadingPagination,
+                         TimeSeriesDataColumnarPagination, ProcessedSensorDataColumnarPagination,
+                         SensorReadingColumnarPagination)
+from .renderers import COLUMNAR_RENDERERS, EXPORT_RENDERERS
+from .aggregation import AGGREGATES, aggregate_buckets, columns_from_statistics, parse_bucket, parse_list
+from .rollups import SOURCES, add_to_rollups, bucket_statistics, choose_resolution, rebuild_rollups
+from .readings import (LEGACY_DEVICES, ensure_streams, insert_readings, parse_readings, store_readings,
+                       sync_legacy_readings)
+from .correlations import refresh_correlations
+from .buffer import get_buffer, write_readings
+
+class BucketAggregateMixin:
+    """
+    Adds GET <list>/aggregate/: bucketed aggregates computed in the database, returned as columns.
+
+    ?bucket=5m&agg=mean,min,max&fields=...&start=&end=. Bucket widths that are whole minutes,
+    hours or days are answered from the matching rollups; other widths group the raw rows.
+    """
+    rollup_source = None
+
+    @action(detail=False)
+    def aggregate(self, request):
+        _, time_field, numeric_fields = SOURCES[self.rollup_source]
+        seconds = parse_bucket(request.query_params.get('bucket', '5m'))
+        aggs = parse_list(request.query_params.get('agg'), list(AGGREGATES), 'agg', ['mean'])
+        fields = parse_list(request.query_params.get('fields'), numeric_fields, 'fields', numeric_fields)
+        queryset = self.filter_queryset(self.get_queryset())
+
+        if choose_resolution(seconds) is None:
+            return Response(aggregate_buckets(queryset, time_field, fields, aggs, seconds))
+
+        bounds = self.filterset_class(request.query_params, queryset=queryset).form
+        bounds.is_valid()
+        stats, resolution = bucket_statistics(self.rollup_source, queryset, fields, seconds,
+                                              bounds.cleaned_data.get('start'), bounds.cleaned_data.get('end'))
+        return Response(columns_from_statistics(stats, fields, aggs, seconds, resolution))
+
+class ColumnarReadMixin:
+    """
+    Adds GET <list>/columns/: the list as columns ({field: [values]}) read with values_list,
+    skipping model instances and serializers. JSON (orjson), CSV and Arrow IPC are chosen by
+    the Accept header or ?format=json|csv|arrow; start/end and cursor pagination work as on
+    the list, with the page links in the Link header.
+    """
+    columnar_pagination_class = None
+
+    @action(detail=False, renderer_classes=COLUMNAR_RENDERERS)
+    def columns(self, request):
+        fields = [field.attname for field in self.get_queryset().model._meta.concrete_fields]
+        queryset = self.filter_queryset(self.get_queryset()).values_list(*fields)
+        paginator = self.columnar_pagination_class()
+        rows = paginator.paginate_queryset(queryset, request, view=self)
+        columns = dict(zip(fields, map(list, zip(*rows)))) or {field: [] for field in fields}
+        return paginator.get_paginated_response(columns)
+
+class StreamingExportMixin:
+    """
+    Adds GET <list>/export/: every row in [start, end], streamed as CSV, NDJSON or Arrow IPC
+    (Accept header or ?format=csv|ndjson|arrow).
+
+    Rows are read with iterator(), a server-side cursor on PostgreSQL and chunked fetches
+    elsewhere, and written out batch by batch, so memory does not grow with the range and
+    the header goes out before the first row is fetched.
+    """
+    export_chunk_size = 2000
+
+    @action(detail=False, renderer_classes=EXPORT_RENDERERS)
+    def export(self, request):
+        model = self.get_queryset().model
+        fields = model._meta.concrete_fields
+        queryset = self.filter_queryset(self.get_queryset()).values_list(*[field.attname for field in fields])
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(fields, queryset.iterator(chunk_size=self.export_chunk_size)),
+            content_type=renderer.media_type)
+        response['Content-Disposition'] = f'attachment; filename="{model._meta.model_name}.{renderer.format}"'
+        return response
+
+class TimeSeriesDataViewSet(BucketAggregateMixin, ColumnarReadMixin, StreamingExportMixin, viewsets.ModelViewSet):
     queryset = TimeSeriesData.objects.all().order_by('timestamp')  # sort by time
     serializer_class = TimeSeriesDataSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = TimeSeriesDataFilter  # ?start=&end= (ISO 8601, inclusive)
+    pagination_class = TimeSeriesDataPagination
+    columnar_pagination_class = TimeSeriesDataColumnarPagination
+    rollup_source = 'timeseries'
+
+    # Writes through the API keep the rolling correlations, the rollups and the narrow reading store
+    # in step with the raw rows
+    @transaction.atomic
+    def perform_create(self, serializer):
+        instance = serializer.save()
+        refresh_correlations(instance.timestamp, instance.timestamp)
+        columns = {field: [getattr(instance, field)] for field in SOURCES['timeseries'][2]}
+        add_to_rollups('timeseries', [instance.timestamp], columns)
+        store_readings(LEGACY_DEVICES['timeseries'], [instance.timestamp], columns, update=True)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        old_timestamp = serializer.instance.timestamp
+        instance = serializer.save()
+        refresh_correlations(old_timestamp, old_timestamp)
+        if instance.timestamp != old_timestamp:
+            refresh_correlations(instance.timestamp, instance.timestamp)
+        rebuild_rollups('timeseries', old_timestamp, old_timestamp)
+        if instance.timestamp.date() != old_timestamp.date():
+            rebuild_rollups('timeseries', instance.timestamp, instance.timestamp)
+        sync_legacy_readings('timeseries', old_timestamp, old_timestamp)
+        if instance.timestamp != old_timestamp:
+            sync_legacy_readings('timeseries', instance.timestamp, instance.timestamp)
 
-class ProcessedSensorDataViewSet(viewsets.ReadOnlyModelViewSet):
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        timestamp = instance.timestamp
+        instance.delete()
+        refresh_correlations(timestamp, timestamp)
+        rebuild_rollups('timeseries', timestamp, timestamp)
+        sync_legacy_readings('timeseries', timestamp, timestamp)
+
+class ProcessedSensorDataViewSet(BucketAggregateMixin, ColumnarReadMixin, StreamingExportMixin,
+                                 viewsets.ReadOnlyModelViewSet):
     queryset = ProcessedSensorData.objects.all().order_by('created_at')
     serializer_class = ProcessedSensorDataSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ProcessedSensorDataFilter
+    pagination_class = ProcessedSensorDataPagination
+    columnar_pagination_class = ProcessedSensorDataColumnarPagination
+    rollup_source = 'processed'
+
+class SensorStreamViewSet(viewsets.ModelViewSet):
+    queryset = SensorStream.objects.all().order_by('device_id', 'metric_name')
+    serializer_class = SensorStreamSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = SensorStreamFilter  # ?device=&metric=
+
+class SensorReadingViewSet(ColumnarReadMixin, StreamingExportMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Readings of the narrow store, filtered by ?stream=, ?device=, ?metric=, ?start= and ?end=.
+
+    The fixed-column tables behind /data/ and /processed/ are mirrored here as one device each
+    (LEGACY_DEVICES), so wide/ serves them in their usual shape next to any other device.
+    """
+    queryset = SensorReading.objects.all().order_by('timestamp')
+    serializer_class = SensorReadingSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = SensorReadingFilter
+    pagination_class = SensorReadingPagination
+    columnar_pagination_class = SensorReadingColumnarPagination
+
+    @action(detail=False, renderer_classes=COLUMNAR_RENDERERS)
+    def wide(self, request):
+        """
+        GET readings/wide/?device=&metrics=a,b&start=&end=: the readings of one device pivoted to
+        one column per metric ({'timestamp': [...], metric: [...]}), None where a stream has no
+        reading. Pages hold page_size timestamps; the next page is linked in the Link header.
+        """
+        if not request.query_params.get('device'):
+            raise ValidationError({'device': 'This query parameter is required.'})
+        readings = self.filter_queryset(self.get_queryset())
+        streams = dict(SensorStream.objects.filter(device_id=request.query_params['device'])
+                       .order_by('metric_name').values_list('metric_name', 'stream_id'))
+        metrics = parse_list(request.query_params.get('metrics'), list(streams), 'metrics', list(streams))
+        readings = readings.filter(stream_id__in=[streams[metric] for metric in metrics])
+
+        page_size = self.pagination_class().get_page_size(request)
+        times = list(readings.order_by('timestamp').values_list('timestamp', flat=True).distinct()[:page_size + 1])
+        next_time = times.pop() if len(times) > page_size else None
+
+        columns = {metric: [None] * len(times) for metric in metrics}
+        if times:
+            position = {time: i for i, time in enumerate(times)}
+            names = {stream_id: metric for metric, stream_id in streams.items()}
+            for time, stream_id, value in (readings.filter(timestamp__gte=times[0], timestamp__lte=times[-1])
+                                           .order_by().values_list('timestamp', 'stream_id', 'value')):
+                columns[names[stream_id]][position[time]] = value
+
+        headers = None
+        if next_time is not None:
+            url = replace_query_param(request.build_absolute_uri(), 'start', next_time.isoformat())
+            headers = {'Link': f'<{url}>; rel="next"'}
+        return Response({'timestamp': times, **columns}, headers=headers)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        POST readings/bulk/ with a BulkDataUploadDTO body: {"device_id", "metric_name",
+        "readings": [{timestamp: value}, ...]}. Valid readings are written in one transaction
+        with multi-row INSERTs; invalid ones are reported and readings the stream already
+        has are left as stored. Answers 202 with the counts.
+        """
+        device_id, metric_name, times, values, report = parse_upload(request.data)
+        with transaction.atomic():
+            stream_id = ensure_streams(device_id, [metric_name])[metric_name]
+            stored = insert_readings([stream_id] * len(times), times, values)
+
+        return Response({
+            'stream_id': stream_id,
+            'received': report['received'],
+            'stored': stored,
+            'duplicates': len(times) - stored,
+            'rejected': report['rejected'],
+            'errors': report['errors'],
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+def parse_upload(data):
+    """
+    Validate a BulkDataUploadDTO body, as posted to readings/bulk/ and ingest/.
+
+    Returns:
+    - (device_id, metric_name, times, values, report) with only the valid readings kept, where
+      report holds the 'received' and 'rejected' counts and the first 'errors' by index.
+
+    Raises:
+    - ValidationError for a malformed envelope, a device that mirrors a fixed-column table, or
+      a body without a single valid reading.
+    """
+    upload = BulkDataUploadSerializer(data=data)
+    upload.is_valid(raise_exception=True)
+    device_id, metric_name = upload.validated_data['device_id'], upload.validated_data['metric_name']
+    if device_id in LEGACY_DEVICES.values():
+        raise ValidationError({'device_id': ['This device mirrors a fixed-column table; '
+                                             'write to that table instead.']})
+
+    readings = upload.validated_data['readings']
+    times, values, errors = parse_readings(readings)
+    report = {'received': len(readings), 'rejected': len(errors),
+              'errors': {str(i): error for i, error in list(errors.items())[:10]}}
+    if not len(times):
+        raise ValidationError({'readings': report['errors']})
+    return device_id, metric_name, times, values, report
+
+
+@csrf_exempt
+@require_POST
+async def ingest(request):
+    """
+    POST /api/ingest/: a BulkDataUploadDTO body, as for readings/bulk/, from high-frequency device
+    pushes. Under the ASGI app the readings are queued in the write buffer and written by its next
+    bulk flush; the answer is 202 once queued, 429 with Retry-After while the buffer is full, or
+    413 for a push larger than the whole buffer. Under WSGI, where no event loop outlives the
+    request, they are written right away.
+    """
+    try:
+        body = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'detail': 'Invalid JSON body.'}, status=400)
+    try:
+        device_id, metric_name, times, values, report = parse_upload(body)
+    except ValidationError as exc:
+        return JsonResponse(exc.detail, status=400)
+    counts = {'received': report['received'], 'accepted': len(times), 'rejected': report['rejected'],
+              'errors': report['errors']}
+
+    if not hasattr(request, 'scope'):
+        stream_id = (await sync_to_async(ensure_streams)(device_id, [metric_name]))[metric_name]
+        await sync_to_async(write_readings)([stream_id] * len(times), times, values)
+        return JsonResponse(counts, status=202)
+
+    buffer = get_buffer()
+    if len(times) > buffer.max_pending:
+        # Would never fit, however long the client waits
+        return JsonResponse({'detail': f'At most {buffer.max_pending} readings per push; split it into '
+                                       'smaller pushes or use readings/bulk/.'}, status=413)
+    if not buffer.offer(device_id, metric_name, times, values):
+        response = JsonResponse({'detail': 'Ingest buffer is full; retry shortly.',
+                                 'queue_depth': buffer.pending}, status=429)
+        response['Retry-After'] = '1'
+        return response
+    return JsonResponse({**counts, 'queue_depth': buffer.pending}, status=202)
+
+
+@require_GET
+async def ingest_metrics(request):
+    """GET /api/ingest/metrics/: queue depth, flush counts and flush latency of the write buffer."""
+    return JsonResponse(get_buffer().metrics())
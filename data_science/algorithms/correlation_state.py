@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+
+from data_science.algorithms.rolling_correlation import window_pearson
+
+
+class RollingCorrelationState:
+    """
+    Sliding-window Pearson correlation between all pairs of streams, updated sample by sample.
+
+    The state keeps the last `window_size` rows in a ring buffer together with running sums,
+    sums of squares and pairwise cross products, so each new row costs O(1) per stream pair
+    instead of a full recomputation. The running sums are rebuilt from the buffer every
+    `resync_every` rows to keep rounding drift bounded.
+
+    Rows with a NaN or infinite value are skipped (and counted in `skipped`): one of them in
+    the running sums would poison every window until the next resync.
+    """
+
+    def __init__(self, streams, window_size, resync_every=None):
+        if window_size < 2:
+            raise ValueError("window_size must be at least 2.")
+
+        self.streams = list(streams)
+        self.window_size = int(window_size)
+        self.resync_every = int(resync_every or max(1000, window_size))
+
+        k = len(self.streams)
+        self.buffer = np.zeros((self.window_size, k))
+        self.pos = 0
+        self.count = 0
+        self.skipped = 0
+        # Rows are shifted by the first row seen, which keeps the running sums small
+        self.offset = None
+        self.s = np.zeros(k)
+        self.sxy = np.zeros((k, k))
+
+    def update(self, row):
+        """
+        Add one row (a sequence in `streams` order or a mapping keyed by stream).
+
+        Returns:
+        - The correlation matrix of the current window, or None until the window is full or
+          when the row is skipped.
+        """
+        if isinstance(row, (dict, pd.Series)):
+            row = [row[stream] for stream in self.streams]
+        row = np.asarray(row, dtype=np.float64)
+        if not np.isfinite(row).all():
+            self.skipped += 1
+            return None
+        if self.offset is None:
+            self.offset = row.copy()
+        row = row - self.offset
+
+        if self.count >= self.window_size:
+            old = self.buffer[self.pos]
+            self.s -= old
+            self.sxy -= np.outer(old, old)
+        self.buffer[self.pos] = row
+        self.s += row
+        self.sxy += np.outer(row, row)
+
+        self.pos = (self.pos + 1) % self.window_size
+        self.count += 1
+        if self.count % self.resync_every == 0:
+            self._resync()
+
+        return self.correlation_matrix() if self.is_ready else None
+
+    def extend(self, rows):
+        """
+        Add several rows (a DataFrame with the stream columns or a 2D array).
+
+        Returns:
+        - A dictionary keyed by (stream1, stream2) with the correlation of every window completed
+          by these rows, in the same layout as rolling_correlations.
+        """
+        if isinstance(rows, pd.DataFrame):
+            rows = rows[self.streams].to_numpy(dtype=np.float64)
+
+        matrices = [m for m in (self.update(row) for row in rows) if m is not None]
+        k = len(self.streams)
+        stacked = np.array(matrices).reshape(len(matrices), k, k)
+        return {(self.streams[i], self.streams[j]): stacked[:, i, j]
+                for i in range(k) for j in range(i + 1, k)}
+
+    @property
+    def is_ready(self):
+        return self.count >= self.window_size
+
+    def window(self):
+        """The rows of the current window, oldest first (shifted by the offset)."""
+        if not self.is_ready:
+            return self.buffer[:self.count]
+        return np.roll(self.buffer, -self.pos, axis=0)
+
+    def correlation_matrix(self):
+        """Correlation matrix of the current window; NaN for streams that are constant in it."""
+        w = self.window_size
+        cov = self.sxy - np.outer(self.s, self.s) / w
+        var = np.diag(cov).copy()
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            r = cov / np.sqrt(np.outer(var, var))
+
+        # Variances this close to the rounding noise are recomputed from the buffered window
+        noisy = np.flatnonzero(var <= 1e-8 * np.diag(self.sxy))
+        if len(noisy):
+            window = self.window()
+            start = np.zeros(1, dtype=np.intp)
+            for i in noisy:
+                for j in range(len(self.streams)):
+                    r[i, j] = r[j, i] = window_pearson(window[:, i], window[:, j], start, w)[0]
+
+        return np.clip(r, -1.0, 1.0)
+
+    def correlations(self):
+        """Correlation of every stream pair over the current window, keyed by (stream1, stream2)."""
+        if not self.is_ready:
+            return {}
+        r = self.correlation_matrix()
+        k = len(self.streams)
+        return {(self.streams[i], self.streams[j]): r[i, j] for i in range(k) for j in range(i + 1, k)}
+
+    def _resync(self):
+        window = self.window()
+        self.s = window.sum(axis=0)
+        self.sxy = window.T @ window
+
+    def save(self, path):
+        """Write the state to an .npz file so that it can be resumed with load()."""
+        np.savez(
+            path,
+            streams=np.array(self.streams, dtype=str),
+            window_size=self.window_size,
+            resync_every=self.resync_every,
+            buffer=self.buffer,
+            pos=self.pos,
+            count=self.count,
+            skipped=self.skipped,
+            offset=self.offset if self.offset is not None else np.array([]),
+            s=self.s,
+            sxy=self.sxy,
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Restore a state written by save()."""
+        with np.load(path) as data:
+            state = cls(data["streams"].tolist(), int(data["window_size"]), int(data["resync_every"]))
+            state.buffer = data["buffer"]
+            state.pos = int(data["pos"])
+            state.count = int(data["count"])
+            state.skipped = int(data["skipped"]) if "skipped" in data else 0
+            state.offset = data["offset"] if data["offset"].size else None
+            state.s = data["s"]
+            state.sxy = data["sxy"]
+        return state
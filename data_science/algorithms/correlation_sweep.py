@@ -0,0 +1,94 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from data_science.algorithms.rolling_correlation import prefix_sums, pair_prefix, pair_correlation
+
+# Number of datasets whose prefix sums and results are kept by get_sweep
+MAX_CACHED_DATASETS = 8
+
+# Bytes of correlation results kept per dataset (32 MB); the least recently used sizes go first
+MAX_RESULT_BYTES = 32 * 1024 * 1024
+
+_SWEEPS = OrderedDict()
+
+
+def dataset_key(df, time_col='data_point'):
+    """Content digest of the stream columns of a DataFrame, used to recognise the same dataset."""
+    stream_cols = pd.Index(df.columns).drop(time_col, errors='ignore')
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update("\x1f".join(map(str, stream_cols)).encode())
+    digest.update(np.ascontiguousarray(df[stream_cols].to_numpy(dtype=np.float64)).tobytes())
+    return digest.hexdigest()
+
+
+class CorrelationSweep:
+    """
+    Rolling correlations of one dataset for many window sizes.
+
+    The prefix sums of every stream and stream pair are built once; each window size is then
+    only a difference of those sums. Results are cached per window size, so returning to a
+    size that was already computed is a dictionary lookup; the cache holds at most
+    `max_result_bytes` and drops the least recently used sizes beyond that.
+    """
+
+    def __init__(self, df, time_col='data_point', max_result_bytes=MAX_RESULT_BYTES):
+        self.stream_cols = pd.Index(df.columns).drop(time_col, errors='ignore')
+        self.sums = prefix_sums(df[self.stream_cols].to_numpy(dtype=np.float64))
+        self.pairs = [(i, j) for i in range(len(self.stream_cols)) for j in range(i + 1, len(self.stream_cols))]
+        self.pair_sums = {pair: pair_prefix(self.sums, *pair) for pair in self.pairs}
+        self.max_result_bytes = max_result_bytes
+        self._results = OrderedDict()
+        self._result_bytes = {}
+
+    def correlations(self, window_size):
+        """
+        Rolling correlations for one window size, in the layout of rolling_correlations.
+        """
+        window_size = int(window_size)
+        if window_size in self._results:
+            self._results.move_to_end(window_size)
+            return self._results[window_size]
+
+        result = {
+            (self.stream_cols[i], self.stream_cols[j]):
+                pair_correlation(self.sums, i, j, window_size, self.pair_sums[(i, j)])
+            for i, j in self.pairs
+        }
+        self._results[window_size] = result
+        self._result_bytes[window_size] = sum(values.nbytes for values in result.values())
+        # The newest result stays even when it alone is over the budget
+        while len(self._results) > 1 and self.result_bytes > self.max_result_bytes:
+            evicted, _ = self._results.popitem(last=False)
+            del self._result_bytes[evicted]
+        return result
+
+    @property
+    def result_bytes(self):
+        """Bytes of the cached correlation results."""
+        return sum(self._result_bytes.values())
+
+    def sweep(self, window_sizes):
+        """
+        Rolling correlations for every window size of a list or range.
+
+        Returns:
+        - A dictionary keyed by window size with the correlations() result of each size.
+        """
+        return {int(w): self.correlations(w) for w in window_sizes}
+
+
+def get_sweep(df, time_col='data_point'):
+    """
+    Return the CorrelationSweep of a dataset, reusing the one built for identical data.
+    """
+    key = dataset_key(df, time_col)
+    if key in _SWEEPS:
+        _SWEEPS.move_to_end(key)
+    else:
+        _SWEEPS[key] = CorrelationSweep(df, time_col)
+        while len(_SWEEPS) > MAX_CACHED_DATASETS:
+            _SWEEPS.popitem(last=False)
+    return _SWEEPS[key]
@@ -0,0 +1,154 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_science.algorithms.process_pool import get_pool
+from data_science.algorithms.rolling_correlation import RECHECK_RTOL, window_pearson
+
+
+def upper_pairs(n_streams):
+    """
+    Stream index pairs (i, j), i < j, in the column order of the upper-triangle tensor.
+    """
+    return np.triu_indices(n_streams, k=1)
+
+
+def rolling_correlation_tensor(values, window_size, out_path=None, upper=False, block_size=32,
+                               chunk_size=4096, max_workers=None, dtype=np.float64):
+    """
+    Rolling Pearson correlation between all pairs of streams, written to a memory-mapped .npy file.
+
+    The streams are split into blocks of `block_size` columns. Every pair of blocks is computed
+    with batched outer products over `chunk_size` windows at a time, either in the current
+    process or spread across the shared process pool. Only one chunk per worker is ever held
+    in memory besides the output.
+
+    Parameters:
+    - values: DataFrame or 2D array (rows x streams) without missing values.
+    - window_size: Number of rows per window.
+    - out_path: Path of the .npy file the tensor is written to, or None to return an in-memory
+      array (computed in the current process).
+    - upper: If True, store only the upper triangle: shape (n_windows, k * (k - 1) / 2) with the
+      pair order of upper_pairs(k). Otherwise store the full (n_windows, k, k) tensor.
+    - block_size: Number of streams per block.
+    - chunk_size: Number of windows computed at once per block pair.
+    - max_workers: Number of worker processes. None or 1 computes every block in the current
+      process.
+    - dtype: dtype of the stored correlations.
+
+    Returns:
+    - The tensor as a read-only numpy memmap, or as an array when out_path is None.
+    """
+    if isinstance(values, pd.DataFrame):
+        values = values.to_numpy(dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    n, k = values.shape
+    if window_size < 1 or window_size > n:
+        raise ValueError("window_size must be between 1 and the number of rows.")
+
+    n_windows = n - window_size + 1
+    shape = (n_windows, k * (k - 1) // 2) if upper else (n_windows, k, k)
+    blocks = [(start, min(start + block_size, k)) for start in range(0, k, block_size)]
+    block_pairs = [(blocks[a], blocks[b]) for a in range(len(blocks)) for b in range(a, len(blocks))]
+    centered = values - values.mean(axis=0)
+
+    if out_path is None or (max_workers or 1) == 1:
+        # In the current process the blocks are written straight into the output
+        if out_path is None:
+            out = np.empty(shape, dtype=dtype)
+        else:
+            out = np.lib.format.open_memmap(out_path, mode='w+', dtype=dtype, shape=shape)
+        for block_i, block_j in block_pairs:
+            _fill_block(centered, out, window_size, block_i, block_j, upper, chunk_size)
+        if out_path is None:
+            return out
+        out.flush()
+        del out
+        return np.load(out_path, mmap_mode='r')
+
+    out = np.lib.format.open_memmap(out_path, mode='w+', dtype=dtype, shape=shape)
+    del out
+
+    # Workers read the centered input from a memory-mapped copy instead of receiving it pickled
+    input_path = f"{out_path}.input.npy"
+    np.save(input_path, centered)
+    tasks = [(input_path, out_path, window_size, block_i, block_j, upper, chunk_size)
+             for block_i, block_j in block_pairs]
+    try:
+        list(get_pool(max_workers).map(_fill_mapped_block, tasks))
+    finally:
+        os.remove(input_path)
+
+    return np.load(out_path, mmap_mode='r')
+
+
+def _fill_mapped_block(task):
+    input_path, out_path, window_size, block_i, block_j, upper, chunk_size = task
+    out = np.load(out_path, mmap_mode='r+')
+    _fill_block(np.load(input_path, mmap_mode='r'), out, window_size, block_i, block_j, upper, chunk_size)
+    out.flush()
+
+
+def _fill_block(values, out, window_size, block_i, block_j, upper, chunk_size):
+    (i0, i1), (j0, j1) = block_i, block_j
+    n, k = values.shape
+    n_windows = n - window_size + 1
+
+    if upper:
+        ii, jj = np.meshgrid(np.arange(i0, i1), np.arange(j0, j1), indexing='ij')
+        keep = ii < jj
+        columns = ii[keep] * k - ii[keep] * (ii[keep] + 1) // 2 + (jj[keep] - ii[keep] - 1)
+
+    for s0 in range(0, n_windows, chunk_size):
+        s1 = min(s0 + chunk_size, n_windows)
+        rows = np.asarray(values[s0:s1 + window_size - 1])
+        r = _block_correlation(rows[:, i0:i1], rows[:, j0:j1], window_size)
+
+        if upper:
+            out[s0:s1, columns] = r[:, keep]
+        else:
+            out[s0:s1, i0:i1, j0:j1] = r
+            out[s0:s1, j0:j1, i0:i1] = r.transpose(0, 2, 1)
+
+
+def _block_correlation(xi, xj, window_size):
+    # Chunk-local prefix sums keep the rounding error proportional to the chunk, not the file
+    def prefix(a):
+        c = np.zeros((a.shape[0] + 1,) + a.shape[1:])
+        np.cumsum(a, axis=0, out=c[1:])
+        return c
+
+    def window_sum(c):
+        return c[window_size:] - c[:-window_size]
+
+    ci, cii = prefix(xi), prefix(xi * xi)
+    cj, cjj = prefix(xj), prefix(xj * xj)
+    si, sj = window_sum(ci), window_sum(cj)
+    vi = window_sum(cii) - si * si / window_size
+    vj = window_sum(cjj) - sj * sj / window_size
+
+    # The (rows x block x block) outer products are the bulk of the work, so they are built in place
+    cxy = np.zeros((xi.shape[0] + 1, xi.shape[1], xj.shape[1]))
+    np.multiply(xi[:, :, None], xj[:, None, :], out=cxy[1:])
+    np.cumsum(cxy[1:], axis=0, out=cxy[1:])
+    r = window_sum(cxy)
+    del cxy
+    r -= si[:, :, None] * (sj[:, None, :] / window_size)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r /= np.sqrt(vi[:, :, None] * vj[:, None, :])
+
+    # Windows too close to the rounding noise of the sums are recomputed directly
+    recheck_i = vi <= RECHECK_RTOL * cii[-1]
+    recheck_j = vj <= RECHECK_RTOL * cjj[-1]
+    for a in np.flatnonzero(recheck_i.any(axis=0)):
+        starts = np.flatnonzero(recheck_i[:, a])
+        for b in range(xj.shape[1]):
+            r[starts, a, b] = window_pearson(xi[:, a], xj[:, b], starts, window_size)
+    for b in np.flatnonzero(recheck_j.any(axis=0)):
+        starts = np.flatnonzero(recheck_j[:, b])
+        for a in range(xi.shape[1]):
+            r[starts, a, b] = window_pearson(xi[:, a], xj[:, b], starts, window_size)
+
+    return np.clip(r, -1.0, 1.0, out=r)
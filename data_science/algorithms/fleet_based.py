@@ -0,0 +1,145 @@
+import pandas as pd
+import numpy as np
+
+from data_science.algorithms.multi_based import moments_from_sums, detector_metric
+from data_science.algorithms.process_pool import get_pool
+
+# Approximate number of float64 moment terms built at a time (32 MB)
+CHUNK_VALUES = 4 * 1024 * 1024
+
+
+def _segment_sums(task):
+    """
+    Sums of the pairwise moment terms of each device segment.
+
+    `z` and `m` are the shifted values and presence mask of consecutive device segments
+    starting at rows `starts`. Rows are processed in chunks; np.add.reduceat sums every
+    (segment, chunk) piece and the pieces are added into their segment.
+    """
+    z, m, starts = task
+    n, k = z.shape
+    out = np.zeros((len(starts), 4, k, k))
+    chunk_rows = max(1, CHUNK_VALUES // (4 * k * k))
+
+    for r0 in range(0, n, chunk_rows):
+        r1 = min(n, r0 + chunk_rows)
+        zc, mc = z[r0:r1], m[r0:r1]
+        terms = np.empty((r1 - r0, 4, k, k))
+        np.multiply(mc[:, :, None], mc[:, None, :], out=terms[:, 0])
+        np.multiply(zc[:, :, None], mc[:, None, :], out=terms[:, 1])
+        np.multiply((zc * zc)[:, :, None], mc[:, None, :], out=terms[:, 2])
+        np.multiply(zc[:, :, None], zc[:, None, :], out=terms[:, 3])
+
+        pieces = np.union1d([r0], starts[(starts >= r0) & (starts < r1)])
+        segments = np.searchsorted(starts, pieces, side='right') - 1
+        out[segments] += np.add.reduceat(terms, pieces - r0, axis=0)
+
+    return out
+
+
+def _bound(value, tz):
+    # Align a naive/aware bound with the timezone of the time column
+    ts = pd.Timestamp(value)
+    if tz is not None and ts.tzinfo is None:
+        return ts.tz_localize(tz)
+    if tz is None and ts.tzinfo is not None:
+        return ts.tz_convert(None)
+    return ts
+
+
+def fleet_based(df, streams, device_col='device', start_date=None, end_date=None, time_col='created_at',
+                types=('correlation', 'mean', 'volatility'), threshold=None, max_workers=1):
+    """
+    Run outlier detectors for every device of a fleet in one call.
+
+    The data is long-format: one row per reading with a device column and one column per
+    stream (e.g. field1..field8). Rows are grouped by device with one sort, and the per-device
+    sums behind the mean, volatility and correlation detectors are segment reductions over
+    the sorted rows, so there is no Python loop over devices. Each device gets the same
+    result as the single detectors on its own rows: streams are compared within the device
+    and flagged when below the threshold (by default mean - std of the metric across them).
+
+    Parameters:
+    - df: Long-format DataFrame with `device_col`, the streams and the time as `time_col`
+      column or as index.
+    - streams: List of column names (streams) to analyze (at least 3 streams).
+    - device_col: Name of the device column. Rows with a missing device id are ignored.
+    - start_date: Start time (str or datetime), or None for no lower bound. A bound without a
+      timezone is read in the timezone of the time column.
+    - end_date: End time (str or datetime), or None for no upper bound.
+    - time_col: Name of the time column.
+    - types: One detector ('correlation', 'mean' or 'volatility') or a list of detectors.
+    - threshold: Fixed threshold, or a dict keyed by detector type.
+    - max_workers: Number of processes the devices are split across. 1 computes everything
+      in the current process; more uses the shared process pool of get_pool.
+
+    Returns:
+    - For each detector, a dictionary with 'metric' and 'is_outlier' DataFrames of shape
+      (devices x streams), indexed by device. A single detector type returns that dictionary
+      directly.
+    """
+    if len(streams) < 3:
+        raise ValueError("At least 3 streams are required for analysis.")
+
+    single = isinstance(types, str)
+    detectors = [types] if single else list(types)
+    unknown = [t for t in detectors if t not in ('correlation', 'mean', 'volatility')]
+    if unknown:
+        raise ValueError(f'Not a valid choice: {unknown}')
+
+    if start_date is not None or end_date is not None:
+        times = pd.to_datetime(df[time_col] if time_col in df.columns else df.index)
+        tz = getattr(times.dtype, 'tz', None)
+        in_range = np.ones(len(df), dtype=bool)
+        if start_date is not None:
+            in_range &= np.asarray(times >= _bound(start_date, tz))
+        if end_date is not None:
+            in_range &= np.asarray(times <= _bound(end_date, tz))
+        df = df[in_range]
+
+    # Group the rows by device with one stable sort; each device becomes a contiguous segment.
+    # Rows without a device id (code -1) belong to no device and are left out.
+    codes, devices = pd.factorize(df[device_col], sort=True)
+    order = np.flatnonzero(codes >= 0)
+    order = order[np.argsort(codes[order], kind='stable')]
+    codes = codes[order]
+    values = df[streams].to_numpy(dtype=np.float64)[order]
+    if not len(values):
+        raise ValueError("No readings in the selected range.")
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+
+    # Shift every device's streams by their first valid reading, as stream_moments does
+    valid = ~np.isnan(values)
+    rows = np.where(valid, np.arange(len(values))[:, None], len(values))
+    first = np.minimum.reduceat(rows, starts, axis=0)
+    shift = np.where(first < len(values), values[np.minimum(first, len(values) - 1), np.arange(len(streams))], 0.0)
+    z = np.where(valid, values - np.repeat(shift, np.diff(np.r_[starts, len(values)]), axis=0), 0.0)
+    m = valid.astype(np.float64)
+
+    # Split the devices into blocks of about equal row counts, one task per worker
+    workers = max(1, int(max_workers or 1))
+    cuts = np.unique(np.searchsorted(starts, np.linspace(0, len(values), workers + 1)[1:-1]))
+    bounds = np.r_[0, cuts[(cuts > 0) & (cuts < len(starts))], len(starts)]
+    row_bounds = np.r_[starts, len(values)][bounds]
+    tasks = [(z[row_bounds[b]:row_bounds[b + 1]], m[row_bounds[b]:row_bounds[b + 1]],
+              starts[bounds[b]:bounds[b + 1]] - row_bounds[b]) for b in range(len(bounds) - 1)]
+
+    if len(tasks) == 1:
+        sums = _segment_sums(tasks[0])
+    else:
+        sums = np.concatenate(list(get_pool(workers).map(_segment_sums, tasks)))
+
+    moments = moments_from_sums(sums[:, 0], sums[:, 1], sums[:, 2], sums[:, 3], shift)
+
+    index = pd.Index(devices, name=device_col)
+    thresholds = threshold if isinstance(threshold, dict) else {t: threshold for t in detectors}
+
+    results = {}
+    for detector in detectors:
+        metric = pd.DataFrame(detector_metric(moments, detector), index=index, columns=streams)
+        limit = thresholds.get(detector)
+        if limit is None:
+            limit = metric.mean(axis=1) - metric.std(axis=1)
+        results[detector] = {'metric': metric, 'is_outlier': metric.lt(limit, axis=0)}
+
+    return results[detectors[0]] if single else results
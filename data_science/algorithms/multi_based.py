@@ -0,0 +1,133 @@
+import pandas as pd
+import numpy as np
+
+
+def stream_moments(df_period):
+    """
+    Compute counts, means, standard deviations and the correlation matrix of the streams
+    from one set of first- and second-moment sums.
+
+    Missing values are handled like pandas: means and standard deviations skip them, and each
+    correlation uses the rows where both streams are present.
+
+    Parameters:
+    - df_period: DataFrame with one numeric column per stream.
+
+    Returns:
+    - A dictionary with 'count', 'mean', 'std' (Series, ddof=1) and 'corr' (DataFrame).
+    """
+    streams = df_period.columns
+    values = df_period.to_numpy(dtype=np.float64)
+    valid = ~np.isnan(values)
+
+    # Shift each stream by its first valid value so the sums stay small and accurate
+    first = np.argmax(valid, axis=0)
+    shift = np.where(valid.any(axis=0), values[first, np.arange(values.shape[1])], 0.0)
+    z = np.where(valid, values - shift, 0.0)
+    m = valid.astype(np.float64)
+
+    # [i, j] entries are taken over the rows where both stream i and stream j are present
+    moments = moments_from_sums(m.T @ m, z.T @ m, (z * z).T @ m, z.T @ z, shift)
+    return {
+        'count': pd.Series(moments['count'], index=streams),
+        'mean': pd.Series(moments['mean'], index=streams),
+        'std': pd.Series(moments['std'], index=streams),
+        'corr': pd.DataFrame(moments['corr'], index=streams, columns=streams),
+    }
+
+
+def moments_from_sums(n, s, q, p, shift):
+    """
+    Turn pairwise moment sums into counts, means, standard deviations and correlations.
+
+    All arrays may carry leading batch dimensions (e.g. one set of sums per window); the
+    last two dimensions are (streams x streams) with [i, j] summed over rows where both
+    streams are present: n = counts, s = sums of stream i, q = sums of squares of stream i,
+    p = cross products. `shift` is the value subtracted from each stream before summing.
+    """
+    count = np.diagonal(n, axis1=-2, axis2=-1)
+    s_t = np.swapaxes(s, -1, -2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sum_sq = np.diagonal(q, axis1=-2, axis2=-1) - np.diagonal(s, axis1=-2, axis2=-1) ** 2 / count
+        var_i = q - s * s / n
+        mean = shift + np.diagonal(s, axis1=-2, axis2=-1) / count
+        var = sum_sq / (count - 1)
+        cov = p - s * s_t / n
+        var_pair = var_i * np.swapaxes(var_i, -1, -2)
+        corr = np.where(var_pair > 0, cov / np.sqrt(var_pair), np.nan)
+
+    return {
+        'count': count,
+        'mean': np.where(count > 0, mean, np.nan),
+        'std': np.sqrt(np.where(count > 1, np.maximum(var, 0.0), np.nan)),
+        'corr': np.where(n > 1, np.clip(corr, -1.0, 1.0), np.nan),
+    }
+
+
+def detector_metric(moments, detector):
+    """
+    Per-stream metric of a detector from moments_from_sums() output: the average correlation
+    with the other streams, the mean, or the negative standard deviation.
+    """
+    if detector == 'correlation':
+        corr = moments['corr'].copy()
+        k = corr.shape[-1]
+        corr[..., np.arange(k), np.arange(k)] = np.nan
+        present = ~np.isnan(corr)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(present, corr, 0.0).sum(axis=-1) / present.sum(axis=-1)
+    if detector == 'mean':
+        return moments['mean']
+    if detector == 'volatility':
+        return -moments['std']
+    raise ValueError(f'Not a valid choice: {detector}')
+
+
+def _flag(metric, threshold):
+    # Same rule as the single detectors: below the threshold, which defaults to mean - std
+    if threshold is None:
+        threshold = metric.mean() - metric.std()
+    return {stream: {"avg_corr": metric[stream], "is_outlier": metric[stream] < threshold}
+            for stream in metric.index}
+
+
+def multi_based(df, streams, start_date, end_date, types=('correlation', 'mean', 'volatility'), threshold=None):
+    """
+    Run several outlier detectors over the same period in a single pass over the data.
+
+    The correlation, mean and volatility detectors all derive from the same sums, so they are
+    computed together instead of slicing and scanning the data once per detector. The results
+    equal those of correlation_based, mean_based and volatility_based.
+
+    Parameters:
+    - df: DataFrame containing data with 'created_at' as index.
+    - streams: List of column names (streams) to analyze (at least 3 streams).
+    - start_date: Start time (str or datetime).
+    - end_date: End time (str or datetime).
+    - types: Detectors to run, among 'correlation', 'mean' and 'volatility'.
+    - threshold: Threshold shared by all detectors, or a dict keyed by detector type. Detectors
+      without a threshold use (mean - std) of their metric.
+
+    Returns:
+    - A dictionary keyed by detector type, each value in the format of the single detector.
+    """
+    if len(streams) < 3:
+        raise ValueError("At least 3 streams are required for analysis.")
+
+    unknown = [t for t in types if t not in ('correlation', 'mean', 'volatility')]
+    if unknown:
+        raise ValueError(f'Not a valid choice: {unknown}')
+
+    thresholds = threshold if isinstance(threshold, dict) else {t: threshold for t in types}
+
+    # Filter the data for the given time period once for every detector
+    df_period = df.loc[start_date:end_date, streams]
+    moments = stream_moments(df_period)
+    moments_arrays = {key: value.to_numpy() for key, value in moments.items()}
+
+    results = {}
+    for detector in types:
+        metric = pd.Series(detector_metric(moments_arrays, detector), index=df_period.columns)
+        results[detector] = _flag(metric, thresholds.get(detector))
+
+    return results
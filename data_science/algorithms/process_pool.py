@@ -0,0 +1,28 @@
+import atexit
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+_pool = None
+_lock = threading.Lock()
+
+
+def get_pool(max_workers):
+    """
+    Process pool shared by the algorithms that split their work across processes.
+
+    The pool is created on first use and kept for later calls, so a call does not pay for
+    starting the worker processes again; asking for a different size replaces it.
+    """
+    global _pool
+    with _lock:
+        if _pool is None or _pool._max_workers != max_workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=max_workers)
+        return _pool
+
+
+@atexit.register
+def _shutdown():
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,54 @@
+import pandas as pd
+import numpy as np
+
+from data_science.algorithms.multi_based import detector_metric, _flag
+from data_science.algorithms.windowed_based import range_moments
+
+
+def ranges_based(df, streams, ranges, types='correlation', threshold=None):
+    """
+    Run outlier detectors over many time ranges of one time-indexed DataFrame.
+
+    The frame is scanned once to build prefix sums of the moment terms; each range is then
+    located by binary search on the sorted index and its moments are the difference of two
+    prefix rows, so a range costs O(streams^2) instead of O(rows). Ranges may overlap. Ranges
+    too quiet for the difference to be accurate are recomputed from their rows.
+
+    Parameters:
+    - df: DataFrame containing data with 'created_at' as index.
+    - streams: List of column names (streams) to analyze (at least 3 streams).
+    - ranges: List of (start_date, end_date) pairs, both inclusive; None leaves a side open.
+    - types: One detector ('correlation', 'mean' or 'volatility') or a list of detectors.
+    - threshold: Fixed threshold, or a dict keyed by detector type.
+
+    Returns:
+    - One result per range, in order, in the format of the single detector (or of
+      multi_based for a list of detectors).
+    """
+    if len(streams) < 3:
+        raise ValueError("At least 3 streams are required for analysis.")
+
+    single = isinstance(types, str)
+    detectors = [types] if single else list(types)
+    unknown = [t for t in detectors if t not in ('correlation', 'mean', 'volatility')]
+    if unknown:
+        raise ValueError(f'Not a valid choice: {unknown}')
+
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index(kind='stable')
+
+    # slice_locs binary-searches the sorted index with the same bound rules as df.loc[start:end]
+    bounds = np.array([df.index.slice_locs(start or None, end or None) for start, end in ranges],
+                      dtype=np.int64).reshape(-1, 2)
+    bounds[:, 1] = np.maximum(bounds[:, 0], bounds[:, 1])
+
+    moments = range_moments(df[streams].to_numpy(dtype=np.float64), bounds)
+    metrics = {detector: detector_metric(moments, detector) for detector in detectors}
+    thresholds = threshold if isinstance(threshold, dict) else {t: threshold for t in detectors}
+
+    results = []
+    for r in range(len(bounds)):
+        result = {detector: _flag(pd.Series(metrics[detector][r], index=streams), thresholds.get(detector))
+                  for detector in detectors}
+        results.append(result[detectors[0]] if single else result)
+    return results
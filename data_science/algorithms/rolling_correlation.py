@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+
+
+# Windows whose variance from the prefix sums is below this fraction of the column's total
+# sum of squares are too close to the rounding noise of the sums; they are recomputed directly.
+RECHECK_RTOL = 1e-8
+
+
+def prefix_sums(values):
+    """
+    Build the zero-padded cumulative sums used by the rolling engines.
+
+    Parameters:
+    - values: 2D array (rows x streams) without missing values.
+
+    Returns:
+    - A dictionary with:
+      - values: the column-centered values (centering keeps the sums small and accurate).
+      - s: cumulative sums of each column, shape (rows + 1, streams).
+      - ss: cumulative sums of squares of each column, shape (rows + 1, streams).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[:, None]
+    if len(values):
+        values = values - values.mean(axis=0)
+
+    return {
+        "values": values,
+        "s": _cumsum(values),
+        "ss": _cumsum(values * values),
+    }
+
+
+def _cumsum(a):
+    out = np.zeros((a.shape[0] + 1,) + a.shape[1:], dtype=np.float64)
+    np.cumsum(a, axis=0, out=out[1:])
+    return out
+
+
+def _window_sum(c, window_size):
+    return c[window_size:] - c[:-window_size]
+
+
+def window_pearson(x, y, starts, window_size):
+    """
+    Direct two-pass Pearson correlation of the windows of x and y starting at `starts`.
+
+    Used for the few windows whose prefix-sum variance is too close to rounding noise.
+    """
+    offsets = np.arange(window_size)
+    wx = x[starts[:, None] + offsets]
+    wy = y[starts[:, None] + offsets]
+    dx = wx - wx.mean(axis=1, keepdims=True)
+    dy = wy - wy.mean(axis=1, keepdims=True)
+    vx = (dx * dx).sum(axis=1)
+    vy = (dy * dy).sum(axis=1)
+
+    # Spread left over from rounding the mean of a constant window is treated as zero
+    eps = np.finfo(np.float64).eps
+    flat_x = vx <= window_size * (8 * eps * np.abs(wx).max(axis=1)) ** 2
+    flat_y = vy <= window_size * (8 * eps * np.abs(wy).max(axis=1)) ** 2
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r = (dx * dy).sum(axis=1) / np.sqrt(vx * vy)
+    r[flat_x | flat_y] = np.nan
+    return r
+
+
+def pair_prefix(sums, i, j):
+    """Cumulative sums of the cross product of columns i and j of a prefix_sums() result."""
+    values = sums["values"]
+    return _cumsum(values[:, i] * values[:, j])
+
+
+def pair_correlation(sums, i, j, window_size, cxy=None):
+    """
+    Rolling Pearson correlation of columns i and j of a prefix_sums() result.
+
+    `cxy` may hold pair_prefix(sums, i, j) when it is reused across several window sizes.
+
+    Returns:
+    - A float array with one value per window (rows - window_size + 1 values), NaN where a
+      window is constant in either stream.
+    """
+    values = sums["values"]
+    n = values.shape[0]
+    if window_size < 1 or window_size > n:
+        return np.empty(0, dtype=np.float64)
+
+    x, y = values[:, i], values[:, j]
+    if cxy is None:
+        cxy = _cumsum(x * y)
+    sxy = _window_sum(cxy, window_size)
+    sx = _window_sum(sums["s"][:, i], window_size)
+    sy = _window_sum(sums["s"][:, j], window_size)
+    vx = _window_sum(sums["ss"][:, i], window_size) - sx * sx / window_size
+    vy = _window_sum(sums["ss"][:, j], window_size) - sy * sy / window_size
+    cov = sxy - sx * sy / window_size
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r = cov / np.sqrt(vx * vy)
+
+    recheck = (vx <= RECHECK_RTOL * sums["ss"][-1, i]) | (vy <= RECHECK_RTOL * sums["ss"][-1, j])
+    starts = np.flatnonzero(recheck)
+    if len(starts):
+        r[starts] = window_pearson(x, y, starts, window_size)
+
+    return np.clip(r, -1.0, 1.0)
+
+
+def rolling_correlation(x, y, window_size):
+    """
+    Rolling Pearson correlation between two streams in O(n) using cumulative sums.
+
+    Equivalent to calling Series.corr on every window of `window_size` consecutive rows.
+
+    Parameters:
+    - x, y: 1D arrays (or Series) of equal length without missing values.
+    - window_size: Number of rows per window.
+
+    Returns:
+    - A float array with len(x) - window_size + 1 values, one per window start.
+    """
+    sums = prefix_sums(np.column_stack([np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)]))
+    return pair_correlation(sums, 0, 1, window_size)
+
+
+def rolling_correlations(df, window_size, time_col='data_point'):
+    """
+    Rolling Pearson correlation for every pair of stream columns of a DataFrame.
+
+    Parameters:
+    - df: DataFrame with a time column and numeric stream columns without missing values
+      (as produced by normalize_data).
+    - window_size: Number of rows per window.
+    - time_col: Name of the time column, excluded from the streams.
+
+    Returns:
+    - A dictionary keyed by (stream1, stream2) with a float array per pair, one value per
+      window start (len(df) - window_size + 1 values).
+    """
+    stream_cols = pd.Index(df.columns).drop(time_col, errors='ignore')
+    sums = prefix_sums(df[stream_cols].to_numpy(dtype=np.float64))
+
+    correlations = {}
+    for i in range(len(stream_cols)):
+        for j in range(i + 1, len(stream_cols)):
+            correlations[(stream_cols[i], stream_cols[j])] = pair_correlation(sums, i, j, window_size)
+    return correlations
+
+
+def pad_correlations(values, length):
+    """
+    Left-pad a rolling correlation array with NaN so that each value lines up with the last
+    row of its window.
+    """
+    padded = np.full(length, np.nan)
+    if len(values):
+        padded[length - len(values):] = values
+    return padded
@@ -0,0 +1,179 @@
+import pandas as pd
+import numpy as np
+
+from data_science.algorithms.multi_based import moments_from_sums, detector_metric
+from data_science.algorithms.rolling_correlation import RECHECK_RTOL
+
+# Approximate number of float64 prefix-sum values built at a time (32 MB)
+CHUNK_VALUES = 4 * 1024 * 1024
+
+
+def _prefix_at(z, m, positions):
+    """
+    Prefix sums of the pairwise moment terms at the given row positions.
+
+    Row r of the result holds the sums over the first positions[r] rows of the counts
+    m_i m_j, the sums z_i m_j, the squares z_i^2 m_j and the cross products z_i z_j, so the
+    sums of any window are the difference of two rows. The rows are accumulated chunk by
+    chunk and only the requested positions are kept.
+    """
+    n, k = z.shape
+    out = np.zeros((len(positions), 4, k, k))
+    carry = np.zeros((4, k, k))
+    chunk_rows = max(1, CHUNK_VALUES // (4 * k * k))
+
+    for r0 in range(0, n, chunk_rows):
+        r1 = min(n, r0 + chunk_rows)
+        zc, mc = z[r0:r1], m[r0:r1]
+        terms = np.empty((r1 - r0, 4, k, k))
+        np.multiply(mc[:, :, None], mc[:, None, :], out=terms[:, 0])
+        np.multiply(zc[:, :, None], mc[:, None, :], out=terms[:, 1])
+        np.multiply((zc * zc)[:, :, None], mc[:, None, :], out=terms[:, 2])
+        np.multiply(zc[:, :, None], zc[:, None, :], out=terms[:, 3])
+        np.cumsum(terms, axis=0, out=terms)
+        terms += carry
+
+        lo, hi = np.searchsorted(positions, [r0 + 1, r1 + 1])
+        out[lo:hi] = terms[positions[lo:hi] - r0 - 1]
+        carry = terms[-1].copy()
+
+    return out
+
+
+def moment_prefix(values, positions):
+    """
+    Prefix sums of the pairwise moment terms of `values` (rows x streams) at sorted row positions.
+
+    Missing values are skipped pairwise, as in stream_moments. The sums over rows [a, b) are
+    prefix[index of b] - prefix[index of a], ready for moments_from_sums.
+
+    Returns:
+    - (prefix, shift): the (len(positions) x 4 x streams x streams) prefix sums and the
+      per-stream shift subtracted from the values.
+    """
+    valid = ~np.isnan(values)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        shift = np.nan_to_num(np.where(valid, values, 0.0).sum(axis=0) / valid.sum(axis=0))
+    z = np.where(valid, values - shift, 0.0)
+    m = valid.astype(np.float64)
+    return _prefix_at(z, m, np.asarray(positions)), shift
+
+
+def _recompute_moments(values, bounds, moments, rows):
+    """
+    Overwrite the moments of the ranges `rows` (indices into `bounds`) with moments computed
+    from the rows of each range, shifted by the range's own mean. Ranges of equal length are
+    gathered and summed together, a chunk at a time.
+    """
+    k = values.shape[1]
+    lengths = bounds[rows, 1] - bounds[rows, 0]
+    for length in np.unique(lengths):
+        members = rows[lengths == length]
+        chunk = max(1, CHUNK_VALUES // max(1, length * k))
+        for c0 in range(0, len(members), chunk):
+            batch = members[c0:c0 + chunk]
+            w = values[bounds[batch, 0][:, None] + np.arange(length)]
+            valid = ~np.isnan(w)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                shift = np.nan_to_num(np.where(valid, w, 0.0).sum(axis=1) / valid.sum(axis=1))
+            z = np.where(valid, w - shift[:, None, :], 0.0)
+            m = valid.astype(np.float64)
+            exact = moments_from_sums(np.einsum('rti,rtj->rij', m, m), np.einsum('rti,rtj->rij', z, m),
+                                      np.einsum('rti,rtj->rij', z * z, m), np.einsum('rti,rtj->rij', z, z), shift)
+            for key, value in exact.items():
+                moments[key][batch] = value
+
+
+def range_moments(values, bounds):
+    """
+    Moments (as moments_from_sums returns them) of many row ranges [a, b) of `values`.
+
+    Every range is the difference of two prefix rows. The difference loses precision in
+    proportion to the prefix sums it is taken from, so a range whose variance is small next
+    to the sum of squares accumulated up to its end (a quiet stretch after a loud one, or a
+    flat range) is recomputed from its own rows instead.
+
+    Parameters:
+    - values: 2D array (rows x streams), NaN for missing values.
+    - bounds: Integer array (ranges x 2) of [start, end) row positions.
+
+    Returns:
+    - Dictionary of 'count', 'mean', 'std' and 'corr' arrays with one leading entry per range.
+    """
+    bounds = np.asarray(bounds, dtype=np.int64).reshape(-1, 2)
+    positions, inverse = np.unique(bounds.ravel(), return_inverse=True)
+    prefix, shift = moment_prefix(values, positions)
+    inverse = inverse.reshape(-1, 2)
+    end = prefix[inverse[:, 1]]
+    sums = end - prefix[inverse[:, 0]]
+    moments = {key: np.array(value) for key, value in
+               moments_from_sums(sums[:, 0], sums[:, 1], sums[:, 2], sums[:, 3], shift).items()}
+
+    # [i, j] variance of stream i over the rows shared with j, against its accumulated squares
+    n, s, q = sums[:, 0], sums[:, 1], sums[:, 2]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        var_i = q - s * s / n
+    recheck = np.flatnonzero(((n > 1) & (var_i <= RECHECK_RTOL * end[:, 2])).any(axis=(-2, -1)))
+    if len(recheck):
+        _recompute_moments(values, bounds, moments, recheck)
+    return moments
+
+
+def windowed_based(df, streams, window, stride=1, start_date=None, end_date=None,
+                   types=('correlation', 'mean', 'volatility'), threshold=None):
+    """
+    Run outlier detectors over sliding windows of the whole series in one vectorized pass.
+
+    Each window of `window` rows, starting every `stride` rows, gets the same metric and rule
+    as the single detectors (flagged when below the threshold, which defaults to mean - std
+    of the metric across streams in that window). The window sums are differences of prefix
+    sums built once, so the cost does not grow with the window size.
+
+    Parameters:
+    - df: DataFrame containing data with 'created_at' as index.
+    - streams: List of column names (streams) to analyze (at least 3 streams).
+    - window: Number of rows per window.
+    - stride: Number of rows between the starts of consecutive windows.
+    - start_date: Start time (str or datetime), or None for the first row.
+    - end_date: End time (str or datetime), or None for the last row.
+    - types: One detector ('correlation', 'mean' or 'volatility') or a list of detectors.
+    - threshold: Fixed threshold, or a dict keyed by detector type.
+
+    Returns:
+    - For each detector, a dictionary with 'metric' and 'is_outlier' DataFrames of shape
+      (n_windows x streams), indexed by the time of the last row of each window. A single
+      detector type returns that dictionary directly.
+    """
+    if len(streams) < 3:
+        raise ValueError("At least 3 streams are required for analysis.")
+
+    single = isinstance(types, str)
+    detectors = [types] if single else list(types)
+    unknown = [t for t in detectors if t not in ('correlation', 'mean', 'volatility')]
+    if unknown:
+        raise ValueError(f'Not a valid choice: {unknown}')
+
+    window, stride = int(window), int(stride)
+    if window < 2 or stride < 1:
+        raise ValueError("window must be at least 2 and stride at least 1.")
+
+    df_period = df.loc[start_date:end_date, streams]
+    values = df_period.to_numpy(dtype=np.float64)
+    if window > len(values):
+        raise ValueError(f"window ({window}) is longer than the selected data ({len(values)} rows).")
+
+    starts = np.arange(0, len(values) - window + 1, stride)
+    moments = range_moments(values, np.column_stack([starts, starts + window]))
+
+    index = pd.Index(df_period.index[starts + window - 1], name='window_end')
+    thresholds = threshold if isinstance(threshold, dict) else {t: threshold for t in detectors}
+
+    results = {}
+    for detector in detectors:
+        metric = pd.DataFrame(detector_metric(moments, detector), index=index, columns=df_period.columns)
+        limit = thresholds.get(detector)
+        if limit is None:
+            limit = metric.mean(axis=1) - metric.std(axis=1)
+        results[detector] = {'metric': metric, 'is_outlier': metric.lt(limit, axis=0)}
+
+    return results[detectors[0]] if single else results
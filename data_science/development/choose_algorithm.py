@@ -8,9 +8,36 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from data_science.algorithms.mean_based import mean_based
 from data_science.algorithms.volatility_based import volatility_based
 from data_science.algorithms.correlation_based import correlation_based
+from data_science.algorithms.multi_based import multi_based
+from data_science.algorithms.windowed_based import windowed_based
+from data_science.algorithms.fleet_based import fleet_based
+from data_science.algorithms.ranges_based import ranges_based
+from data_science.development.dataset_store import load_analysis_frame, open_dataset
 
-def choose_algorithm(df, streams, start_date, end_date, threshold=None, type='correlation'):
-    if type == 'correlation':
+def choose_algorithm(df, streams, start_date, end_date, threshold=None, type='correlation', window=None, stride=1,
+                     device_col=None, ranges=None):
+    # Long-format fleet data: every device is analyzed separately, all in one call
+    if device_col:
+        if isinstance(df, str):
+            df = open_dataset(df).frame([device_col] + streams, start_date, end_date, index_time=True)
+        return fleet_based(df, streams, device_col, start_date, end_date, types=type, threshold=threshold)
+
+    # A stored dataset ID resolves to memory-mapped columns shared by every worker process
+    if isinstance(df, str):
+        df = load_analysis_frame(df, streams, start_date, end_date)
+
+    # A list of (start, end) pairs is evaluated against the one loaded frame
+    if ranges is not None:
+        return ranges_based(df, streams, ranges, type, threshold)
+
+    # With a window (in rows), the detectors run over every sliding window of the range
+    if window:
+        return windowed_based(df, streams, window, stride, start_date, end_date, type, threshold)
+
+    # Several detectors at once share one pass over the data
+    if isinstance(type, (list, tuple)):
+        return multi_based(df, streams, start_date, end_date, type, threshold)
+    elif type == 'correlation':
         return correlation_based(df, streams, start_date, end_date, threshold)
     elif type == 'mean':
         return mean_based(df, streams, start_date, end_date, threshold)
@@ -6,8 +6,14 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from data_science.visualizations.grouped_bar_chart import grouped_bar_chart
+from data_science.development.dataset_store import open_dataset
 
 def choose_visualization(df, streams, start_date, end_date, type='grouped_bar_chart'):
+    # A stored dataset ID resolves to a zero-copy view of its memory-mapped columns
+    if isinstance(df, str):
+        dataset = open_dataset(df)
+        df = dataset.frame([dataset.time_col] + list(streams), start_date, end_date)
+
     if type == 'grouped_bar_chart':
         return grouped_bar_chart(df, streams, start_date, end_date)
     elif type == 'autocorrelation_plot':
@@ -0,0 +1,127 @@
+import pandas as pd
+
+
+def _bound(value, tz):
+    # Align a naive/aware bound with the timezone of the parsed time column
+    if value is None or value == '':
+        return None
+    ts = pd.Timestamp(value)
+    if tz is not None and ts.tzinfo is None:
+        return ts.tz_localize(tz)
+    if tz is None and ts.tzinfo is not None:
+        return ts.tz_convert(None)
+    return ts
+
+
+def read_csv_range(source, streams, start_date=None, end_date=None, time_col='created_at', chunksize=100_000,
+                   assume_sorted=False):
+    """
+    Read only the time column and the requested streams of a CSV, keeping only the rows in a date range.
+
+    The CSV is parsed in chunks straight from `source` (a path or a file-like object such as
+    an upload stream), so memory grows with the selected slice instead of the whole file.
+    For every stream the nearest valid reading on each side of the range is kept as well, so
+    missing values at the edges of the slice are interpolated from their real neighbours. When
+    the rows turn out to be in time order, the slice is interpolated by row position and gives
+    the same values as interpolating the whole file. Otherwise the rows are ordered by time and
+    interpolated by their position within the slice, which can differ from interpolating the
+    whole file.
+
+    With `assume_sorted` the caller declares the file sorted by time, and reading stops once a
+    reading past `end_date` has been found for every stream while the rows read so far are in
+    order; rows after that point are never checked. Without it the whole file is read, since
+    rows inside the range may still follow.
+
+    Parameters:
+    - source: Path or file-like object with the CSV data.
+    - streams: List of stream columns to read.
+    - start_date: Start time (str or datetime), inclusive. None means from the first row.
+    - end_date: End time (str or datetime), inclusive. None means up to the last row.
+    - time_col: Name of the time column.
+    - chunksize: Number of rows parsed at a time.
+    - assume_sorted: True when the file is known to be sorted by time, which allows stopping early.
+
+    Returns:
+    - A DataFrame indexed by `time_col`, sorted and interpolated, with one float64 column per stream.
+    """
+    streams = [s for s in streams if s != time_col]
+    reader = pd.read_csv(
+        source,
+        usecols=[time_col] + streams,
+        dtype={stream: 'float64' for stream in streams},
+        parse_dates=[time_col],
+        chunksize=chunksize,
+    )
+
+    pieces = []
+    before = {}  # stream -> (time, row, value) of the last valid reading before the range
+    after = {}  # stream -> (time, row, value) of the first valid reading after the range
+    start = end = None
+    tz = None
+    offset = 0
+    last_time = None
+    is_sorted = True
+
+    for i, chunk in enumerate(reader):
+        chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+        offset += len(chunk)
+        times = chunk[time_col]
+
+        if i == 0:
+            tz = getattr(times.dtype, 'tz', None)
+            start, end = _bound(start_date, tz), _bound(end_date, tz)
+
+        if len(times):
+            if not times.is_monotonic_increasing or (last_time is not None and times.iloc[0] < last_time):
+                is_sorted = False
+            last_time = times.iloc[-1]
+
+        in_range = pd.Series(True, index=chunk.index)
+        if start is not None:
+            in_range &= times >= start
+            _track(chunk[times < start], streams, time_col, before, latest=True)
+        if end is not None:
+            in_range &= times <= end
+            _track(chunk[times > end], streams, time_col, after, latest=False)
+
+        pieces.append(chunk[in_range])
+
+        if assume_sorted and is_sorted and end is not None and len(after) == len(streams) and last_time > end:
+            break
+
+    df = pd.concat(pieces) if pieces else pd.DataFrame(columns=[time_col] + streams)
+    df = _interpolate(df, before, after, streams, time_col, is_sorted)
+    return df.set_index(time_col)
+
+
+def _track(rows, streams, time_col, found, latest):
+    # Remember, per stream, the valid reading closest to the range among `rows`
+    for stream in streams:
+        valid = rows.loc[rows[stream].notna(), [time_col, stream]]
+        if valid.empty:
+            continue
+        row = valid[time_col].idxmax() if latest else valid[time_col].idxmin()
+        candidate = (valid.at[row, time_col], row, valid.at[row, stream])
+        current = found.get(stream)
+        if current is None or (candidate[0] >= current[0] if latest else candidate[0] < current[0]):
+            found[stream] = candidate
+
+
+def _interpolate(df, before, after, streams, time_col, is_sorted):
+    boundary = {}
+    for found in (before, after):
+        for stream, (time, row, value) in found.items():
+            boundary.setdefault(row, {time_col: time})[stream] = value
+
+    frame = pd.concat([df, pd.DataFrame.from_dict(boundary, orient='index')]) if boundary else df
+    frame = frame[~frame.index.duplicated()]
+
+    if is_sorted:
+        # Row numbers stand in for the positions of the rows in the full file
+        frame = frame.sort_index()
+        frame[streams] = frame[streams].interpolate(method='index')
+    else:
+        frame = frame.sort_values(time_col, kind='stable')
+        frame[streams] = frame[streams].interpolate()
+
+    return frame.loc[frame.index.isin(df.index)].sort_values(time_col, kind='stable')
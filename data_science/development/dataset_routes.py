@@ -0,0 +1,34 @@
+from flask import Blueprint, request, jsonify
+
+from data_science.development.dataset_store import import_csv, dataset_info, catalog
+
+# /datasets endpoints, registered by both servers
+datasets = Blueprint('datasets', __name__)
+
+
+@datasets.route('/datasets', methods=['POST'])
+def upload_dataset():
+    uploaded_file = request.files.get('file')
+    if not uploaded_file:
+        return 'No files were sent', 400
+
+    time_col = request.form.get('time_col') or 'created_at'
+    try:
+        dataset_id = import_csv(uploaded_file.stream, time_col)
+    except Exception as e:
+        return f'Error in reading CSV: {e}', 400
+
+    return jsonify(dataset_info(dataset_id))
+
+
+@datasets.route('/datasets', methods=['GET'])
+def list_datasets():
+    return jsonify(catalog())
+
+
+@datasets.route('/datasets/<dataset_id>', methods=['GET'])
+def get_dataset_info(dataset_id):
+    try:
+        return jsonify(dataset_info(dataset_id))
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': str(e)}), 404
@@ -0,0 +1,326 @@
+import hashlib
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+DATASETS_DIR = os.path.abspath(os.path.join(BASE_DIR, '..', 'storage', 'datasets'))
+
+
+def _dataset_dir(dataset_id, datasets_dir):
+    if not dataset_id or not dataset_id.isalnum():
+        raise ValueError(f'Invalid dataset id: {dataset_id!r}')
+    return os.path.join(datasets_dir, dataset_id)
+
+
+def import_csv(source, time_col='created_at', datasets_dir=DATASETS_DIR):
+    """
+    Convert an uploaded CSV into per-column .npy files and return its dataset ID.
+
+    The ID is derived from the file content, so uploading the same file again returns the
+    existing dataset without parsing it. Rows are stored in file order, so a stored dataset
+    gives the same results as posting the CSV itself. When `time_col` is present, its bounds
+    are recorded in the dataset metadata, and a file that is not sorted by it also gets the
+    permutation that puts its rows in time order, used for time-range lookups. Missing text
+    values are stored as a mask next to the column and read back as None.
+
+    Parameters:
+    - source: bytes, a path, or a file-like object with the CSV data.
+    - time_col: Name of the time column.
+    - datasets_dir: Directory holding one sub-directory per dataset.
+
+    Returns:
+    - The dataset ID (str).
+    """
+    if isinstance(source, (bytes, bytearray)):
+        content = bytes(source)
+    elif hasattr(source, 'read'):
+        content = source.read()
+    else:
+        with open(source, 'rb') as f:
+            content = f.read()
+
+    dataset_id = hashlib.sha256(content).hexdigest()[:32]
+    target = _dataset_dir(dataset_id, datasets_dir)
+    if os.path.exists(os.path.join(target, 'meta.json')):
+        return dataset_id
+
+    df = pd.read_csv(io.BytesIO(content))
+    tz = None
+    if time_col in df.columns:
+        df[time_col] = pd.to_datetime(df[time_col])
+        tz = getattr(df[time_col].dtype, 'tz', None)
+        if tz is not None:
+            df[time_col] = df[time_col].dt.tz_convert('UTC').dt.tz_localize(None)
+
+    tmp = f'{target}.{os.getpid()}.tmp'
+    os.makedirs(tmp, exist_ok=True)
+    columns = []
+    for i, name in enumerate(df.columns):
+        column = df[name]
+        entry = {'name': name, 'file': f'col_{i:04d}.npy'}
+        if name == time_col:
+            values, entry['kind'] = column.to_numpy(dtype='datetime64[ns]'), 'time'
+        elif pd.api.types.is_numeric_dtype(column) or pd.api.types.is_bool_dtype(column):
+            values, entry['kind'] = column.to_numpy(), 'numeric'
+        else:
+            nulls = column.isna().to_numpy()
+            values, entry['kind'] = column.where(~nulls, '').astype(str).to_numpy(dtype=str), 'text'
+            if nulls.any():
+                entry['nulls'] = f'col_{i:04d}_nulls.npy'
+                np.save(os.path.join(tmp, entry['nulls']), nulls)
+        np.save(os.path.join(tmp, entry['file']), values)
+        entry['dtype'] = str(values.dtype)
+        columns.append(entry)
+
+    meta = {
+        'dataset_id': dataset_id,
+        'rows': len(df),
+        'columns': columns,
+        'time_col': time_col if time_col in df.columns else None,
+        'tz': str(tz) if tz is not None else None,
+        'order': None,
+    }
+    if meta['time_col'] and len(df):
+        meta['start'] = df[time_col].min().isoformat()
+        meta['end'] = df[time_col].max().isoformat()
+        if not df[time_col].is_monotonic_increasing:
+            meta['order'] = 'order.npy'
+            np.save(os.path.join(tmp, meta['order']), np.argsort(df[time_col].to_numpy(), kind='stable'))
+
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+    try:
+        os.replace(tmp, target)
+    except OSError:
+        # Another request stored the same content first
+        for name in os.listdir(tmp):
+            os.remove(os.path.join(tmp, name))
+        os.rmdir(tmp)
+
+    return dataset_id
+
+
+def dataset_info(dataset_id, datasets_dir=DATASETS_DIR):
+    """Metadata of a stored dataset: row count, columns, time column and time bounds."""
+    path = os.path.join(_dataset_dir(dataset_id, datasets_dir), 'meta.json')
+    if not os.path.exists(path):
+        raise KeyError(f'Unknown dataset id: {dataset_id}')
+    with open(path) as f:
+        return json.load(f)
+
+
+def _to_utc_naive(value, tz):
+    # Bounds without a timezone are read in the timezone of the upload, as pandas does for .loc
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is None:
+        if tz is None:
+            return ts
+        ts = ts.tz_localize(tz)
+    return ts.tz_convert('UTC').tz_localize(None)
+
+
+class MappedDataset:
+    """
+    Read-only, memory-mapped view of a stored dataset.
+
+    Every column file is mapped with np.load(mmap_mode='r'), so all worker processes that open
+    the same dataset share the operating system's page cache instead of each holding a pandas
+    copy, and opening a dataset costs no parsing. DataFrames returned by frame() wrap slices
+    of the mapped columns without copying them, unless the rows have to be reordered by time
+    or the columns hold missing text.
+    """
+
+    def __init__(self, dataset_id, datasets_dir=DATASETS_DIR):
+        self.meta = dataset_info(dataset_id, datasets_dir)
+        target = _dataset_dir(dataset_id, datasets_dir)
+        self.columns = {column['name']: np.load(os.path.join(target, column['file']), mmap_mode='r')
+                        for column in self.meta['columns']}
+        self.nulls = {column['name']: np.load(os.path.join(target, column['nulls']), mmap_mode='r')
+                      for column in self.meta['columns'] if column.get('nulls')}
+        self.time_col = self.meta['time_col']
+        self.tz = self.meta['tz']
+        # Row numbers in time order, for datasets whose file was not sorted by time
+        order = self.meta.get('order')
+        self.order = np.load(os.path.join(target, order), mmap_mode='r') if order else None
+        self._times = None
+
+    def __len__(self):
+        return self.meta['rows']
+
+    def locate(self, start=None, end=None):
+        """Row range [lo, hi) of the rows between start and end (inclusive), by binary search."""
+        if self.time_col is None:
+            return 0, len(self)
+        times = self._time_ordered(self.time_col)
+        lo = 0 if start in (None, '') else int(times.searchsorted(
+            np.datetime64(_to_utc_naive(start, self.tz), 'ns'), side='left'))
+        hi = len(self) if end in (None, '') else int(times.searchsorted(
+            np.datetime64(_to_utc_naive(end, self.tz), 'ns'), side='right'))
+        return lo, max(lo, hi)
+
+    def _time_ordered(self, name):
+        # A column in time order: the mapped file itself, or a copy reordered by self.order
+        if self.order is None:
+            return self.columns[name]
+        if name == self.time_col:
+            if self._times is None:
+                self._times = self.columns[name][self.order]
+            return self._times
+        return self.columns[name][self.order]
+
+    def _column(self, name, lo, hi, file_order=False):
+        # Rows [lo, hi) in time order, or in file order with file_order=True
+        rows = slice(lo, hi) if file_order or self.order is None else self.order[lo:hi]
+        values = self.columns[name][rows]
+        if name in self.nulls:
+            values = values.astype(object)
+            values[self.nulls[name][rows]] = None
+        if name == self.time_col and self.tz:
+            return pd.DatetimeIndex(values).tz_localize('UTC').tz_convert(self.tz)
+        return values
+
+    def frame(self, columns=None, start=None, end=None, index_time=False):
+        """
+        DataFrame of some columns over a time range, in time order, backed by the mapped files.
+
+        With index_time=True the time column becomes the index.
+        """
+        names = list(self.columns) if columns is None else list(columns)
+        missing = [name for name in names if name not in self.columns]
+        if missing:
+            raise KeyError(f'Columns not in dataset: {missing}')
+
+        lo, hi = self.locate(start, end)
+        if index_time:
+            names = [name for name in names if name != self.time_col]
+            return pd.DataFrame({name: self._column(name, lo, hi) for name in names},
+                                index=pd.Index(self._column(self.time_col, lo, hi), name=self.time_col),
+                                columns=names, copy=False)
+        return pd.DataFrame({name: self._column(name, lo, hi) for name in names}, columns=names, copy=False)
+
+    def file_frame(self, columns=None):
+        """DataFrame of some columns with every row in file order, backed by the mapped files."""
+        names = list(self.columns) if columns is None else list(columns)
+        missing = [name for name in names if name not in self.columns]
+        if missing:
+            raise KeyError(f'Columns not in dataset: {missing}')
+        return pd.DataFrame({name: self._column(name, 0, len(self), file_order=True) for name in names},
+                            columns=names, copy=False)
+
+    def analysis_frame(self, streams, start=None, end=None):
+        """
+        Time-indexed, interpolated streams over a time range, in the form expected by choose_algorithm.
+
+        The slice is widened to the nearest valid reading of each stream on both sides, so the
+        interpolated values equal those of interpolating the whole dataset.
+        """
+        if self.time_col is None:
+            raise ValueError('Dataset has no time column.')
+        streams = [s for s in streams if s != self.time_col]
+        lo, hi = self.locate(start, end)
+
+        wide_lo, wide_hi = lo, hi
+        for stream in streams:
+            if self.columns[stream].dtype.kind != 'f':
+                continue
+            values = self._time_ordered(stream)
+            before = _nearest_valid(values, lo - 1, -1)
+            after = _nearest_valid(values, hi, 1)
+            if before is not None:
+                wide_lo = min(wide_lo, before)
+            if after is not None:
+                wide_hi = max(wide_hi, after + 1)
+
+        names = [self.time_col] + streams
+        df = pd.DataFrame({name: self._column(name, wide_lo, wide_hi) for name in names}, columns=names)
+        df.set_index(self.time_col, inplace=True)
+        df = df.interpolate()
+        return df.iloc[lo - wide_lo:hi - wide_lo]
+
+
+def _nearest_valid(values, pos, step, block=4096):
+    # Index of the first non-NaN value from pos in direction step, scanning block by block
+    while 0 <= pos < len(values):
+        if step > 0:
+            chunk = values[pos:pos + block]
+            found = np.flatnonzero(~np.isnan(chunk))
+            if len(found):
+                return pos + int(found[0])
+            pos += block
+        else:
+            chunk = values[max(0, pos - block + 1):pos + 1]
+            found = np.flatnonzero(~np.isnan(chunk))
+            if len(found):
+                return pos - (len(chunk) - 1 - int(found[-1]))
+            pos -= block
+    return None
+
+
+# Mapped datasets opened by this process; the mappings themselves share memory across processes
+_MAPPED = {}
+
+
+def open_dataset(dataset_id, datasets_dir=DATASETS_DIR):
+    """Return the MappedDataset of a stored dataset, opening it once per process."""
+    key = (datasets_dir, dataset_id)
+    if key not in _MAPPED:
+        _MAPPED[key] = MappedDataset(dataset_id, datasets_dir)
+    return _MAPPED[key]
+
+
+_CATALOG = {}
+
+
+def catalog(datasets_dir=DATASETS_DIR):
+    """
+    Small catalog of the stored datasets: ID, row count, stream names and time bounds.
+
+    It is rebuilt from the meta.json files only when the datasets directory changes.
+    """
+    if not os.path.isdir(datasets_dir):
+        return []
+    mtime = os.stat(datasets_dir).st_mtime_ns
+    cached = _CATALOG.get(datasets_dir)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    entries = []
+    for entry in sorted(os.scandir(datasets_dir), key=lambda e: e.name):
+        meta_path = os.path.join(entry.path, 'meta.json')
+        if not entry.is_dir() or not os.path.exists(meta_path):
+            continue
+        with open(meta_path) as f:
+            meta = json.load(f)
+        entries.append({
+            'dataset_id': meta['dataset_id'],
+            'rows': meta['rows'],
+            'streams': [c['name'] for c in meta['columns'] if c['kind'] == 'numeric'],
+            'time_col': meta['time_col'],
+            'start': meta.get('start'),
+            'end': meta.get('end'),
+        })
+
+    _CATALOG[datasets_dir] = (mtime, entries)
+    return entries
+
+
+def load_dataset(dataset_id, columns=None, datasets_dir=DATASETS_DIR):
+    """
+    Load a stored dataset (or some of its columns) as a DataFrame backed by the mapped files.
+
+    Rows come back in the order of the uploaded file, and the time column as datetimes in the
+    timezone of the original upload.
+    """
+    return open_dataset(dataset_id, datasets_dir).file_frame(columns)
+
+
+def load_analysis_frame(dataset_id, streams, start_date=None, end_date=None, datasets_dir=DATASETS_DIR):
+    """
+    Load the time column and `streams` of a dataset over a date range, indexed by time and
+    interpolated, in the form expected by choose_algorithm.
+    """
+    return open_dataset(dataset_id, datasets_dir).analysis_frame(streams, start_date, end_date)
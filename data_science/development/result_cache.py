@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# File suffix of each stored format: raw bytes (CSV reports) or JSON (everything else)
+FORMATS = ('bin', 'json')
+
+
+def _to_native(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def encode(value):
+    """(format, bytes) of a result: bytes are kept as they are, anything else is written as JSON."""
+    if isinstance(value, (bytes, bytearray)):
+        return 'bin', bytes(value)
+    return 'json', json.dumps(value, default=_to_native).encode()
+
+
+def decode(fmt, blob):
+    return blob if fmt == 'bin' else json.loads(blob)
+
+
+class ResultCache:
+    """
+    Two-tier LRU cache for analysis results, keyed by upload content and request parameters.
+
+    Results are encoded once when stored, as raw bytes or JSON, so reading the cache never
+    runs code from the cache directory. The memory tier keeps the most recently used entries
+    up to `max_memory_bytes`; every entry is also written to `directory`, which is trimmed to
+    `max_disk_bytes` by least recent use. A memory miss that hits the disk promotes the entry
+    back into memory.
+
+    The directory is scanned once when the cache is created; after that the size of every file
+    is tracked as entries are written, read and removed.
+    """
+
+    def __init__(self, directory, max_memory_bytes=64 * 1024 * 1024, max_disk_bytes=1024 * 1024 * 1024):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self._scan_disk()
+
+    @staticmethod
+    def make_key(content, **params):
+        """Digest of the uploaded bytes plus the parameters that change the result."""
+        digest = hashlib.sha256(content)
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def _path(self, key, fmt):
+        return os.path.join(self.directory, f'{key}.{fmt}')
+
+    def _scan_disk(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            key, _, fmt = entry.name.partition('.')
+            if fmt in FORMATS:
+                stat = entry.stat()
+                entries.append((stat.st_mtime, key, fmt, stat.st_size))
+            elif fmt == 'pkl':
+                # Pickled entries of earlier versions are never loaded
+                os.remove(entry.path)
+        for _, key, fmt, size in sorted(entries):
+            self._disk[key] = (fmt, size)
+            self._disk_bytes += size
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                fmt, blob = self._memory[key]
+                return decode(fmt, blob)
+            fmt, _ = self._disk.get(key, (None, 0))
+
+        blob = None
+        if fmt is not None:
+            path = self._path(key, fmt)
+            try:
+                with open(path, 'rb') as f:
+                    blob = f.read()
+                os.utime(path)
+            except OSError:
+                with self._lock:
+                    self._forget_disk(key)
+
+        with self._lock:
+            if blob is None:
+                self.misses += 1
+                return None
+            self.hits_disk += 1
+            if key in self._disk:
+                self._disk.move_to_end(key)
+            self._remember(key, fmt, blob)
+        return decode(fmt, blob)
+
+    def put(self, key, value):
+        fmt, blob = encode(value)
+        with self._lock:
+            self._remember(key, fmt, blob)
+
+        tmp_path = f'{self._path(key, fmt)}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(blob)
+        os.replace(tmp_path, self._path(key, fmt))
+
+        with self._lock:
+            old_fmt, _ = self._disk.get(key, (fmt, 0))
+            self._forget_disk(key)
+            if old_fmt != fmt:
+                self._remove(self._path(key, old_fmt))
+            self._disk[key] = (fmt, len(blob))
+            self._disk_bytes += len(blob)
+            self._trim_disk()
+
+    def _remember(self, key, fmt, blob):
+        if len(blob) > self.max_memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key)[1])
+        self._memory[key] = (fmt, blob)
+        self._memory_bytes += len(blob)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, (_, old) = self._memory.popitem(last=False)
+            self._memory_bytes -= len(old)
+
+    def _forget_disk(self, key):
+        if key in self._disk:
+            _, size = self._disk.pop(key)
+            self._disk_bytes -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _trim_disk(self):
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            key, (fmt, size) = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self._remove(self._path(key, fmt))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits_memory + self.hits_disk + self.misses
+            return {
+                'hits_memory': self.hits_memory,
+                'hits_disk': self.hits_disk,
+                'misses': self.misses,
+                'hit_rate': (self.hits_memory + self.hits_disk) / lookups if lookups else None,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'max_memory_bytes': self.max_memory_bytes,
+                'disk_entries': len(self._disk),
+                'disk_bytes': self._disk_bytes,
+                'max_disk_bytes': self.max_disk_bytes,
+            }
@@ -5,16 +5,18 @@ from flask import Flask, request, jsonify
 import json
 import numpy as np
 
-UPLOAD_FOLDER = os.path.join('data_science', 'storage')
-
 # ensure the project root is on the import path
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 from data_science.development.choose_algorithm import choose_algorithm
+from data_science.development.csv_ingest import read_csv_range
+from data_science.development.dataset_store import load_analysis_frame
+from data_science.development.dataset_routes import datasets
 
 app = Flask(__name__)
+app.register_blueprint(datasets)
 
 @app.route('/')
 def home():
@@ -27,44 +29,96 @@ def analyze():
     end_date = request.form.get('end_date')
     threshold = float(request.form.get('threshold'))
     algo_type = request.form.get('algo_type')
-
+    # A JSON list of detectors runs them all on the same slice, e.g. ["correlation", "mean", "volatility"]
+    if request.form.get('algo_types'):
+        algo_type = json.loads(request.form.get('algo_types'))
+    # Sliding-window mode: one verdict per window of `window` rows, every `stride` rows
+    window = int(request.form.get('window')) if request.form.get('window') else None
+    stride = int(request.form.get('stride')) if request.form.get('stride') else 1
+    # A JSON list of [start_date, end_date] pairs is evaluated against one loaded frame
+    ranges = json.loads(request.form.get('ranges')) if request.form.get('ranges') else None
+    if ranges is not None:
+        try:
+            ranges = [(r.get('start_date'), r.get('end_date')) if isinstance(r, dict) else tuple(r) for r in ranges]
+            start_date, end_date = envelope(ranges)
+        except Exception as e:
+            return jsonify({'error': f'Invalid ranges: {e}'}), 400
+
+    dataset_id = request.form.get('dataset_id')
     uploaded_file = request.files.get('file')
-    if not uploaded_file:
+    if not uploaded_file and not dataset_id:
         return 'No files were sent', 400
 
-    if uploaded_file.filename == '':
+    if not dataset_id and uploaded_file.filename == '':
         return 'No files selected', 400
 
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-    save_path = os.path.join(UPLOAD_FOLDER, uploaded_file.filename)
-    uploaded_file.save(save_path)
-
     try:
-        # Read CSV directly from file path
-        df = pd.read_csv(save_path, parse_dates=['created_at'])
-        df.sort_values(by='created_at', inplace=True)
-        df.set_index('created_at', inplace=True)
-        df = df.interpolate()
+        if dataset_id:
+            # Memory-mapped columns of a previously uploaded dataset, sliced to the date range
+            df = load_analysis_frame(dataset_id, streams, start_date, end_date)
+        else:
+            # Parse only created_at and the requested streams, within the date range, from the upload stream
+            df = read_csv_range(uploaded_file.stream, streams, start_date, end_date,
+                                assume_sorted=request.form.get('assume_sorted', '').lower() in ('1', 'true'))
 
     except Exception as e:
         return f'Error in reading CSV: {e}', 400
 
     # run analysis
     try:
-        result = choose_algorithm(df, streams, start_date, end_date, threshold, algo_type)
+        result = choose_algorithm(df, streams, start_date, end_date, threshold, algo_type, window, stride,
+                                  ranges=ranges)
     except Exception as e:
         print('e', e)
         return jsonify({'error': str(e)}), 400
 
     print('result', result)
 
+    if ranges is not None:
+        return jsonify({"result": [
+            {"start_date": start, "end_date": end,
+             "result": {detector: clean(detector_result) for detector, detector_result in range_result.items()}
+             if isinstance(algo_type, list) else clean(range_result)}
+            for (start, end), range_result in zip(ranges, result)
+        ]})
+
+    if window and isinstance(algo_type, list):
+        return jsonify({"result": {detector: clean_windowed(detector_result) for detector, detector_result in result.items()}})
+
+    if window:
+        return jsonify({"result": clean_windowed(result)})
+
+    if isinstance(algo_type, list):
+        return jsonify({"result": {detector: clean(detector_result) for detector, detector_result in result.items()}})
+
+    return jsonify({"result": clean(result)})
+
+
+def envelope(ranges):
+    # Earliest start and latest end of the ranges; an open side stays open
+    starts = [start for start, _ in ranges]
+    ends = [end for _, end in ranges]
+    start = None if not ranges or any(s in (None, '') for s in starts) else min(starts, key=pd.Timestamp)
+    end = None if not ranges or any(e in (None, '') for e in ends) else max(ends, key=pd.Timestamp)
+    return start, end
+
+
+def clean(result):
     clean_result = {}
     for stream, metrics in result.items():
         clean_metrics = {k: to_native(v) for k, v in metrics.items()}
         clean_result[stream] = clean_metrics
+    return clean_result
+
 
-    return jsonify({"result": clean_result})
+def clean_windowed(result):
+    # Column lists per stream; NaN metrics (e.g. flat windows) become null
+    metric = result['metric']
+    return {
+        "window_end": [ts.isoformat() if hasattr(ts, 'isoformat') else to_native(ts) for ts in metric.index],
+        "metric": {stream: [None if np.isnan(v) else float(v) for v in metric[stream]] for stream in metric.columns},
+        "is_outlier": {stream: result['is_outlier'][stream].tolist() for stream in metric.columns},
+    }
 
 def to_native(val):
     if isinstance(val, np.generic):
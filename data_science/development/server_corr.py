@@ -1,5 +1,7 @@
 import sys
 import os
+import io
+import threading
 import pandas as pd
 from flask import Flask, request, jsonify, send_file
 import json
@@ -7,8 +9,8 @@ import numpy as np
 from pathlib import Path
 
 from data_science.development.test import get_dataset, get_corr
-
-UPLOAD_FOLDER = os.path.join('data_science', 'storage')
+from data_science.algorithms.correlation_state import RollingCorrelationState
+from data_science.development.result_cache import ResultCache
 
 # ensure the project root is on the import path
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
@@ -16,8 +18,12 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 from data_science.development.choose_algorithm import choose_algorithm
+from data_science.development.csv_ingest import read_csv_range
+from data_science.development.dataset_store import load_dataset, load_analysis_frame
+from data_science.development.dataset_routes import datasets
 
 app = Flask(__name__)
+app.register_blueprint(datasets)
 
 
 @app.route('/')
@@ -29,6 +35,31 @@ BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 DATASET_PATH = os.path.abspath(os.path.join(BASE_DIR, '..', 'datasets', 'complex.csv'))
 STORAGE_DIR = os.path.abspath(os.path.join(BASE_DIR, '..', 'storage'))
 
+# Results of /analyze-csv and /analyze-corr, keyed by upload content and parameters
+CACHE_MEMORY_BYTES = 64 * 1024 * 1024
+CACHE_DISK_BYTES = 1024 * 1024 * 1024
+RESULT_CACHE = ResultCache(os.path.join(STORAGE_DIR, 'cache'), CACHE_MEMORY_BYTES, CACHE_DISK_BYTES)
+
+
+@app.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    return jsonify(RESULT_CACHE.stats())
+
+
+def read_source():
+    # Data for /analyze-csv and /analyze-corr: a stored dataset when dataset_id is given, otherwise
+    # the uploaded file. The second value identifies the data in the result cache; both are None
+    # when the request has neither.
+    dataset_id = request.form.get('dataset_id')
+    if dataset_id:
+        return load_dataset(dataset_id), f'dataset:{dataset_id}'.encode()
+
+    uploaded_file = request.files.get('file')
+    if uploaded_file is None:
+        return None, None
+    content = uploaded_file.read()
+    return io.BytesIO(content), content
+
 
 @app.route('/analyze-csv', methods=['POST'])
 def analyzeCsv():
@@ -37,19 +68,31 @@ def analyzeCsv():
     # print('window_size',request.args.get('selected'))
     # selected = ['data_point'] + selected
 
-    uploaded_file = request.files.get('file')
     window_size = int(request.form.get('window_size')) if request.form.get('window_size') else None
     print('window_size', window_size)
 
-    file_path = get_dataset(uploaded_file, "data_point", window_size)
-    print('file_path', file_path)
+    try:
+        source, content = read_source()
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': str(e)}), 404
+    if source is None:
+        return jsonify({'error': 'No file or dataset_id provided'}), 400
+
+    cache_key = ResultCache.make_key(content, endpoint='analyze-csv', time_col="data_point", window_size=window_size)
+    report = RESULT_CACHE.get(cache_key)
+
+    if report is None:
+        file_path = get_dataset(source, "data_point", window_size)
+        print('file_path', file_path)
 
-    base_dir = Path(__file__).parent.parent.parent  # moves up from scripts/ to development/
-    csv_path = base_dir / file_path
+        base_dir = Path(__file__).parent.parent.parent  # moves up from scripts/ to development/
+        csv_path = base_dir / file_path
+        report = csv_path.read_bytes()
+        RESULT_CACHE.put(cache_key, report)
 
     try:
         return send_file(
-            csv_path,
+            io.BytesIO(report),
             mimetype="text/csv",
             as_attachment=True,  # bật để trình duyệt tự download
             download_name='report.csv'  # tên file khi download
@@ -65,71 +108,178 @@ def analyze():
     end_date = request.form.get('end_date')
     threshold = float(request.form.get('threshold')) if request.form.get('threshold') else None
     algo_type = request.form.get('algo_type')
-
+    # A JSON list of detectors runs them all on the same slice, e.g. ["correlation", "mean", "volatility"]
+    if request.form.get('algo_types'):
+        algo_type = json.loads(request.form.get('algo_types'))
+    # Sliding-window mode: one verdict per window of `window` rows, every `stride` rows
+    window = int(request.form.get('window')) if request.form.get('window') else None
+    stride = int(request.form.get('stride')) if request.form.get('stride') else 1
+    # A JSON list of [start_date, end_date] pairs is evaluated against one loaded frame
+    ranges = json.loads(request.form.get('ranges')) if request.form.get('ranges') else None
+    if ranges is not None:
+        try:
+            ranges = [(r.get('start_date'), r.get('end_date')) if isinstance(r, dict) else tuple(r) for r in ranges]
+            start_date, end_date = envelope(ranges)
+        except Exception as e:
+            return jsonify({'error': f'Invalid ranges: {e}'}), 400
+
+    dataset_id = request.form.get('dataset_id')
     uploaded_file = request.files.get('file')
-    if not uploaded_file:
+    if not uploaded_file and not dataset_id:
         return 'No files were sent', 400
 
-    if uploaded_file.filename == '':
+    if not dataset_id and uploaded_file.filename == '':
         return 'No files selected', 400
 
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-    save_path = os.path.join(UPLOAD_FOLDER, uploaded_file.filename)
-    uploaded_file.save(save_path)
-
     try:
-        # Read CSV directly from file path
-        df = pd.read_csv(save_path, parse_dates=['created_at'])
-        df.sort_values(by='created_at', inplace=True)
-        df.set_index('created_at', inplace=True)
-        df = df.interpolate()
+        if dataset_id:
+            # Memory-mapped columns of a previously uploaded dataset, sliced to the date range
+            df = load_analysis_frame(dataset_id, streams, start_date, end_date)
+        else:
+            # Parse only created_at and the requested streams, within the date range, from the upload stream
+            df = read_csv_range(uploaded_file.stream, streams, start_date, end_date,
+                                assume_sorted=request.form.get('assume_sorted', '').lower() in ('1', 'true'))
 
     except Exception as e:
         return f'Error in reading CSV: {e}', 400
 
     # run analysis
     try:
-        result = choose_algorithm(df, streams, start_date, end_date, threshold, algo_type)
+        result = choose_algorithm(df, streams, start_date, end_date, threshold, algo_type, window, stride,
+                                  ranges=ranges)
     except Exception as e:
         print('e', e)
         return jsonify({'error': str(e)}), 400
 
     print('result', result)
 
+    if ranges is not None:
+        return jsonify({"result": [
+            {"start_date": start, "end_date": end,
+             "result": {detector: clean(detector_result) for detector, detector_result in range_result.items()}
+             if isinstance(algo_type, list) else clean(range_result)}
+            for (start, end), range_result in zip(ranges, result)
+        ]})
+
+    if window and isinstance(algo_type, list):
+        return jsonify({"result": {detector: clean_windowed(detector_result) for detector, detector_result in result.items()}})
+
+    if window:
+        return jsonify({"result": clean_windowed(result)})
+
+    if isinstance(algo_type, list):
+        return jsonify({"result": {detector: clean(detector_result) for detector, detector_result in result.items()}})
+
+    return jsonify({"result": clean(result)})
+
+
+def envelope(ranges):
+    # Earliest start and latest end of the ranges; an open side stays open
+    starts = [start for start, _ in ranges]
+    ends = [end for _, end in ranges]
+    start = None if not ranges or any(s in (None, '') for s in starts) else min(starts, key=pd.Timestamp)
+    end = None if not ranges or any(e in (None, '') for e in ends) else max(ends, key=pd.Timestamp)
+    return start, end
+
+
+def clean(result):
     clean_result = {}
     for stream, metrics in result.items():
         clean_metrics = {k: to_native(v) for k, v in metrics.items()}
         clean_result[stream] = clean_metrics
+    return clean_result
+
 
-    return jsonify({"result": clean_result})
+def clean_windowed(result):
+    # Column lists per stream; NaN metrics (e.g. flat windows) become null
+    metric = result['metric']
+    return {
+        "window_end": [ts.isoformat() if hasattr(ts, 'isoformat') else to_native(ts) for ts in metric.index],
+        "metric": {stream: [None if np.isnan(v) else float(v) for v in metric[stream]] for stream in metric.columns},
+        "is_outlier": {stream: result['is_outlier'][stream].tolist() for stream in metric.columns},
+    }
 
 
 @app.route('/analyze-corr', methods=['POST'])
 def analyze_corr():
-    uploaded_file = request.files.get('file')
     time_col = request.form.get('time_col') if request.form.get('time_col') else 'data_point'
     window_size = int(request.form.get('window_size')) if request.form.get('window_size') else 15
     output_dir = request.form.get('output_dir')
-    start_year = int(request.form.get('start_year')) if request.form.get('start_year') else 2025
-    start_month = int(request.form.get('start_month')) if request.form.get('start_month') else 1
-    start_day = int(request.form.get('start_day')) if request.form.get('start_day') else 1
-    start_hour = int(request.form.get('start_hour')) if request.form.get('start_hour') else 0
-    start_minute = int(request.form.get('start_minute')) if request.form.get('start_minute') else 0
-    start_second = int(request.form.get('start_second')) if request.form.get('start_second') else 0
-    end_year = int(request.form.get('end_year')) if request.form.get('end_year') else 2025
-    end_month = int(request.form.get('end_month')) if request.form.get('end_month') else 1
-    end_day = int(request.form.get('end_day')) if request.form.get('end_day') else 6
-    end_hour = int(request.form.get('end_hour')) if request.form.get('end_hour') else 0
-    end_minute = int(request.form.get('end_minute')) if request.form.get('end_minute') else 10
-    end_second = int(request.form.get('end_second')) if request.form.get('end_second') else 0
-
-    corrs = get_corr(uploaded_file, time_col, window_size, output_dir, start_year, start_month, start_day, start_hour,
-                         start_minute, start_second, end_year, end_month, end_day, end_hour, end_minute, end_second, )
+    start = request.form.get('start') or '2025-01-01T00:00:00'
+    end = request.form.get('end') or '2025-01-06T00:10:00'
+
+    try:
+        start = pd.Timestamp(start).isoformat()
+        end = pd.Timestamp(end).isoformat()
+    except ValueError as e:
+        return jsonify({'error': f'Invalid start/end timestamp: {e}'}), 400
+
+    try:
+        source, content = read_source()
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': str(e)}), 404
+    if source is None:
+        return jsonify({'error': 'No file or dataset_id provided'}), 400
+
+    cache_key = ResultCache.make_key(
+        content, endpoint='analyze-corr', time_col=time_col, window_size=window_size,
+        start=start, end=end,
+    )
+    corrs = RESULT_CACHE.get(cache_key)
+
+    if corrs is None:
+        corrs = get_corr(source, time_col, window_size, output_dir, start, end)
+        RESULT_CACHE.put(cache_key, corrs)
 
     return jsonify({"success": True, "corrs": corrs})
 
 
+# Live correlation state per device, persisted under STORAGE_DIR so a restart resumes it.
+# Requests are served by several threads; the lock covers loading, updating and saving a state.
+_CORR_STATES = {}
+_CORR_LOCK = threading.Lock()
+
+
+def get_corr_state(device, streams, window_size):
+    state = _CORR_STATES.get(device)
+    state_path = os.path.join(STORAGE_DIR, f'corr_state_{device}.npz')
+    if state is None and os.path.exists(state_path):
+        state = RollingCorrelationState.load(state_path)
+    if state is None or state.streams != streams or state.window_size != window_size:
+        state = RollingCorrelationState(streams, window_size)
+    _CORR_STATES[device] = state
+    return state, state_path
+
+
+@app.route('/stream-corr', methods=['POST'])
+def stream_corr():
+    payload = request.get_json(silent=True) or {}
+    device = str(payload.get('device', 'default'))
+    streams = payload.get('streams') or []
+    window_size = int(payload.get('window_size') or 15)
+    rows = payload.get('rows') or []
+
+    if not device.isalnum():
+        return jsonify({'error': 'device must be alphanumeric'}), 400
+    if len(streams) < 2:
+        return jsonify({'error': 'At least 2 streams are required'}), 400
+
+    with _CORR_LOCK:
+        try:
+            state, state_path = get_corr_state(device, streams, window_size)
+            completed = state.extend(pd.DataFrame(rows, columns=streams))
+        except Exception as e:
+            return jsonify({'error': str(e)}), 400
+
+        os.makedirs(STORAGE_DIR, exist_ok=True)
+        state.save(state_path)
+        count, skipped = state.count, state.skipped
+
+    corrs = {f'{s1}-{s2}': [None if np.isnan(v) else float(v) for v in values]
+             for (s1, s2), values in completed.items()}
+    return jsonify({"success": True, "count": count, "skipped": skipped, "corrs": corrs})
+
+
 def to_native(val):
     if isinstance(val, np.generic):
         return val.item()
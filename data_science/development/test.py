@@ -1,16 +1,25 @@
 import pandas as pd
 from datetime import datetime, timedelta
 import os
+import sys
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 
+# ensure the project root is on the import path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from data_science.algorithms.rolling_correlation import pad_correlations
+from data_science.algorithms.correlation_sweep import get_sweep
+
 def get_dataset(csv_file, time_col="data_point", window_size=15, output_dir="datasets"):
     """
     Loads and preprocesses time series sensor data from a CSV file.
 
     Parameters:
-        csv_file (str): Path to the CSV file containing the data.
+        csv_file (str | DataFrame): Path to the CSV file containing the data, or the data itself.
 
     Returns:
         df (DataFrame): Processed DataFrame with standardized column names and datetime values.
@@ -18,8 +27,8 @@ def get_dataset(csv_file, time_col="data_point", window_size=15, output_dir="dat
         max_dp (int): Maximum data point index.
         time_col (str): Name of the time reference column ("data_point").
     """
-    # Load the CSV file into a DataFrame
-    df = pd.read_csv(csv_file)
+    # Load the CSV file into a DataFrame (a stored dataset may be passed as a DataFrame already)
+    df = csv_file.copy() if isinstance(csv_file, pd.DataFrame) else pd.read_csv(csv_file)
 
     # Strip any whitespace from column names
     df.columns = df.columns.str.strip()
@@ -29,10 +38,10 @@ def get_dataset(csv_file, time_col="data_point", window_size=15, output_dir="dat
     df.rename(columns={original_time_col: "data_point"}, inplace=True)
 
     # Replace the original time data with a sequential index
-    df["data_point"] = list(range(len(df)))
+    df["data_point"] = np.arange(len(df))
 
     # Generate a datetime column assuming a uniform 10-minute interval starting from Jan 1, 2025
-    df["datetime"] = [datetime(2025, 1, 1, 0, 0) + timedelta(minutes=10 * i) for i in range(len(df))]
+    df["datetime"] = pd.date_range(datetime(2025, 1, 1, 0, 0), periods=len(df), freq=timedelta(minutes=10))
 
     # Determine the min and max values of the data_point index
     min_dp = df["data_point"].min()
@@ -59,25 +68,9 @@ def get_dataset(csv_file, time_col="data_point", window_size=15, output_dir="dat
     # Return the cleaned DataFrame with only relevant columns
     normalized_df = df[[time_col, "datetime"] + numeric_cols]
 
-    # Get the list of sensor columns (excluding time and datetime)
-    stream_cols = normalized_df.columns.drop([time_col, "datetime"])
-
-    correlations = {}
-
-    # Iterate over all unique pairs of sensor columns
-    for i in range(len(stream_cols)):
-        for j in range(i + 1, len(stream_cols)):
-            pair = (stream_cols[i], stream_cols[j])
-            corrs = []
-
-            # Slide the window across the data and compute correlation
-            for start in range(0, len(normalized_df) - window_size + 1):
-                window = normalized_df.iloc[start:start + window_size]
-                corr = window[stream_cols[i]].corr(window[stream_cols[j]])
-                corrs.append(corr)
-
-            # Store correlation values for the sensor pair
-            correlations[pair] = corrs
+    # Compute the sliding-window correlation of every sensor pair (one array per pair);
+    # the prefix sums and results are reused when the same data comes back with another window size
+    correlations = get_sweep(normalized_df.drop(columns="datetime"), time_col).correlations(window_size)
 
     # return correlations
     df_to_save = df.copy()
@@ -86,11 +79,8 @@ def get_dataset(csv_file, time_col="data_point", window_size=15, output_dir="dat
         # Construct a short column name for the pair (e.g., c(1, 2))
         col_name = f"c({s1[-1]}, {s2[-1]})"
 
-        # Pad the correlation list to align with the full DataFrame length
-        padded_corr = [None] * (len(df_to_save) - len(corr_values)) + corr_values
-
-        # Add the padded correlation values as a new column
-        df_to_save[col_name] = padded_corr
+        # Pad the correlation values to align with the full DataFrame length
+        df_to_save[col_name] = pad_correlations(corr_values, len(df_to_save))
 
     # Define the full output path and save the DataFrame as CSV
     output_path = os.path.join("data_science", output_dir, "complex_formatted.csv")
@@ -109,36 +99,23 @@ def get_corr(
     time_col="data_point",
     window_size=15,
     output_dir="datasets/",
-    start_year=2025,
-    start_month=1,
-    start_day=1,
-    start_hour=0,
-    start_minute=0,
-    start_second=0,
-    end_year=2025,
-    end_month=1,
-    end_day=6,
-    end_hour=0,
-    end_minute=10,
-    end_second=0
+    start="2025-01-01T00:00:00",
+    end="2025-01-06T00:10:00",
 ):
-    print('get_corr')
-    print('start_year', start_year)
-    print('start_month', start_month)
     """
-    Loads and preprocesses time series sensor data from a CSV file.
+    Loads time series sensor data from a CSV file and correlates every pair of streams
+    over a datetime range.
 
     Parameters:
-        csv_file (str): Path to the CSV file containing the data.
+        csv_file (str | DataFrame): Path to the CSV file containing the data, or the data itself.
+        start (str): ISO 8601 start of the range (inclusive).
+        end (str): ISO 8601 end of the range (inclusive).
 
     Returns:
-        df (DataFrame): Processed DataFrame with standardized column names and datetime values.
-        min_dp (int): Minimum data point index.
-        max_dp (int): Maximum data point index.
-        time_col (str): Name of the time reference column ("data_point").
+        corrs (dict): Correlation of each stream pair, keyed by "stream1-stream2".
     """
-    # Load the CSV file into a DataFrame
-    df = pd.read_csv(csv_file)
+    # Load the CSV file into a DataFrame (a stored dataset may be passed as a DataFrame already)
+    df = csv_file.copy() if isinstance(csv_file, pd.DataFrame) else pd.read_csv(csv_file)
 
     # Strip any whitespace from column names
     df.columns = df.columns.str.strip()
@@ -148,10 +125,10 @@ def get_corr(
     df.rename(columns={original_time_col: "data_point"}, inplace=True)
 
     # Replace the original time data with a sequential index
-    df["data_point"] = list(range(len(df)))
+    df["data_point"] = np.arange(len(df))
 
     # Generate a datetime column assuming a uniform 10-minute interval starting from Jan 1, 2025
-    df["datetime"] = [datetime(2025, 1, 1, 0, 0) + timedelta(minutes=10 * i) for i in range(len(df))]
+    df["datetime"] = pd.date_range(datetime(2025, 1, 1, 0, 0), periods=len(df), freq=timedelta(minutes=10))
 
     # Determine the min and max values of the data_point index
     min_dp = df["data_point"].min()
@@ -181,25 +158,27 @@ def get_corr(
     # Get the list of sensor columns (excluding time and datetime)
     selected_streams = normalized_df.columns.drop([time_col, "datetime"])
 
-    # --- Parse datetime ranges from GUI ---
-    start_dt = datetime(
-        start_year, start_month, start_day,
-        start_hour, start_minute, start_second
-    )
-    end_dt = datetime(
-        end_year, end_month, end_day,
-        end_hour, end_minute, end_second
-    )
+    # --- Parse the ISO datetime range ---
+    start_dt = pd.Timestamp(start)
+    end_dt = pd.Timestamp(end)
+    if start_dt.tzinfo is not None:
+        start_dt = start_dt.tz_convert(None)
+    if end_dt.tzinfo is not None:
+        end_dt = end_dt.tz_convert(None)
+
+    # The datetime column is sorted, so the range is located once by binary search
+    times = pd.DatetimeIndex(normalized_df["datetime"])
+    lo = times.searchsorted(start_dt, side="left")
+    hi = times.searchsorted(end_dt, side="right")
+
+    # One correlation matrix covers every pair of streams in the range
+    corr_matrix = normalized_df.iloc[lo:hi][selected_streams].corr()
+
     corrs = {}
-    #########
     for i in range(len(selected_streams)):
         for j in range(i + 1, len(selected_streams)):
             s1, s2 = selected_streams[i], selected_streams[j]
-            mask = (df['datetime'] >= start_dt) & (df['datetime'] <= end_dt)
-            sub_df = df.loc[mask, [s1, s2]]
-            corr = sub_df[s1].corr(sub_df[s2])
-            # corrs[(s1, s2)] = corr
-            corrs[s1 + "-" + s2] = corr
+            corrs[s1 + "-" + s2] = corr_matrix.at[s1, s2]
     print(corrs)
     return corrs
 
@@ -1,3 +1,5 @@
+import sys
+import json
 import pandas as pd
 import numpy as np
 import os
@@ -5,6 +7,15 @@ import matplotlib.pyplot as plt
 import tkinter as tk
 from tkinter import ttk
 
+# ensure the project root is on the import path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from data_science.algorithms.rolling_correlation import pad_correlations
+from data_science.algorithms.correlation_sweep import get_sweep
+from data_science.algorithms.correlation_tensor import rolling_correlation_tensor, upper_pairs
+
 # --- Paths Setup ---
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 DATASET_PATH = os.path.abspath(os.path.join(BASE_DIR, '..', 'datasets', 'complex.csv'))
@@ -34,30 +45,35 @@ def normalize_data(df, time_col='data_point'):
 
 
 def compute_sliding_correlations(df, window_size, time_col='data_point'):
-    stream_cols = df.columns.drop(time_col)
-    correlations = {}
-    for i in range(len(stream_cols)):
-        for j in range(i + 1, len(stream_cols)):
-            s1, s2 = stream_cols[i], stream_cols[j]
-            corrs = []
-            for start in range(len(df) - window_size + 1):
-                window = df.iloc[start:start + window_size]
-                corrs.append(window[s1].corr(window[s2]))
-            correlations[(s1, s2)] = corrs
-    return correlations
+    return get_sweep(df, time_col).correlations(window_size)
+
+
+def sweep_sliding_correlations(df, window_sizes, time_col='data_point'):
+    return get_sweep(df, time_col).sweep(window_sizes)
 
 
 def save_correlations(df, correlations, output_dir, time_col='data_point'):
     df_to_save = df.copy()
     for (s1, s2), vals in correlations.items():
         col_name = f'c({s1},{s2})'
-        padding = [None] * (len(df_to_save) - len(vals)) + vals
-        df_to_save[col_name] = padding
+        df_to_save[col_name] = pad_correlations(vals, len(df_to_save))
     out_path = os.path.join(output_dir, 'complex_formatted.csv')
     df_to_save.to_csv(out_path, index=False)
     print(f'Saved correlations to: {out_path}')
 
 
+def save_correlation_tensor(df, window_size, output_dir, time_col='data_point', max_workers=None):
+    # All-pairs rolling correlations as a memory-mapped (windows x pairs) .npy, pair names in a .json
+    stream_cols = [c for c in df.columns if c != time_col]
+    out_path = os.path.join(output_dir, 'complex_correlations.npy')
+    rolling_correlation_tensor(df[stream_cols], window_size, out_path, upper=True, max_workers=max_workers)
+    first, second = upper_pairs(len(stream_cols))
+    with open(os.path.join(output_dir, 'complex_correlations.json'), 'w') as f:
+        json.dump({'window_size': window_size,
+                   'pairs': [[stream_cols[i], stream_cols[j]] for i, j in zip(first, second)]}, f)
+    print(f'Saved correlation tensor to: {out_path}')
+
+
 def plot_with_correlation(df, correlations, window_size, time_col='data_point'):
     t = df[time_col].values
     for (s1, s2), vals in correlations.items():
@@ -127,6 +143,7 @@ def process_callback(window_size, stream_vars):
     corrs = compute_sliding_correlations(df_norm, window_size)
     plot_with_correlation(df_norm, corrs, window_size)
     save_correlations(df_norm, corrs, STORAGE_DIR)
+    save_correlation_tensor(df_norm, window_size, STORAGE_DIR)
 
 # --- Main ---
 if __name__ == '__main__':
@@ -0,0 +1,34 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from data_science.algorithms.correlation_state import RollingCorrelationState
+
+
+class RollingCorrelationStateTests(unittest.TestCase):
+    def test_non_finite_rows_are_skipped(self):
+        rng = np.random.default_rng(2)
+        clean = pd.DataFrame(rng.normal(size=(60, 2)), columns=['a', 'b'])
+        rows = pd.concat([clean.iloc[:30], pd.DataFrame({'a': [np.nan, np.inf], 'b': [1.0, 2.0]}),
+                          clean.iloc[30:]], ignore_index=True)
+
+        state = RollingCorrelationState(['a', 'b'], 10)
+        completed = state.extend(rows)
+
+        expected = clean['a'].rolling(10).corr(clean['b']).dropna().to_numpy()
+        np.testing.assert_allclose(completed[('a', 'b')], expected, atol=1e-12)
+        self.assertEqual((state.count, state.skipped), (60, 2))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'state.npz')
+            state.save(path)
+            restored = RollingCorrelationState.load(path)
+        self.assertEqual(restored.skipped, 2)
+        self.assertAlmostEqual(restored.correlations()[('a', 'b')], expected[-1], places=12)
+
+
+if __name__ == '__main__':
+    unittest.main()
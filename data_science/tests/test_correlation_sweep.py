@@ -0,0 +1,30 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from data_science.algorithms.correlation_sweep import CorrelationSweep
+
+
+class CorrelationSweepTests(unittest.TestCase):
+    def test_results_are_evicted_least_recently_used_first(self):
+        rng = np.random.default_rng(3)
+        df = pd.DataFrame(rng.normal(size=(1000, 3)), columns=['s1', 's2', 's3'])
+        df.insert(0, 'data_point', np.arange(1000))
+        # Three pairs of about 1000 float64 values per window size: room for two sizes
+        sweep = CorrelationSweep(df, max_result_bytes=2 * 3 * 1000 * 8)
+
+        first = sweep.correlations(10)
+        sweep.correlations(20)
+        self.assertIs(sweep.correlations(10), first)
+        sweep.correlations(30)
+
+        self.assertEqual(list(sweep._results), [10, 30])
+        self.assertLessEqual(sweep.result_bytes, sweep.max_result_bytes)
+        recomputed = sweep.correlations(20)
+        np.testing.assert_array_equal(recomputed[('s1', 's2')],
+                                      CorrelationSweep(df).correlations(20)[('s1', 's2')])
+
+
+if __name__ == '__main__':
+    unittest.main()
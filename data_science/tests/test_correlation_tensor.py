@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from data_science.algorithms.correlation_tensor import rolling_correlation_tensor, upper_pairs
+from data_science.algorithms.rolling_correlation import rolling_correlation
+
+
+class RollingCorrelationTensorTests(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        self.values = rng.normal(size=(500, 5)).cumsum(axis=0)
+        self.values[200:230, 3] = 4.0
+        self.window = 20
+        self.expected = {(i, j): rolling_correlation(self.values[:, i], self.values[:, j], self.window)
+                         for i, j in zip(*upper_pairs(5))}
+
+    def assert_matches_pairs(self, tensor, upper):
+        for column, (i, j) in enumerate(zip(*upper_pairs(5))):
+            actual = tensor[:, column] if upper else tensor[:, i, j]
+            np.testing.assert_allclose(actual, self.expected[(i, j)], atol=1e-9, equal_nan=True)
+
+    def test_in_process_matches_rolling_correlation(self):
+        self.assert_matches_pairs(rolling_correlation_tensor(self.values, self.window, block_size=2), upper=False)
+        self.assert_matches_pairs(rolling_correlation_tensor(self.values, self.window, upper=True), upper=True)
+
+    def test_worker_processes_match_rolling_correlation(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'tensor.npy')
+            tensor = rolling_correlation_tensor(self.values, self.window, path, upper=True, block_size=2,
+                                                max_workers=2)
+            self.assert_matches_pairs(tensor, upper=True)
+            del tensor
+            self.assertEqual(os.listdir(directory), ['tensor.npy'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import io
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from data_science.development.csv_ingest import read_csv_range
+
+
+def csv_source(df):
+    return io.StringIO(df.to_csv(index=False))
+
+
+class ReadCsvRangeTests(unittest.TestCase):
+    def setUp(self):
+        times = pd.date_range('2024-01-01', periods=100, freq='min')
+        self.df = pd.DataFrame({'created_at': times, 's1': np.arange(100.0), 's2': np.arange(100.0) * 2})
+        # Sorted for the first 90 rows, then a late row that falls inside the range
+        late = pd.DataFrame({'created_at': [pd.Timestamp('2024-01-01 00:05:30')], 's1': [-1.0], 's2': [-2.0]})
+        self.unsorted = pd.concat([self.df.iloc[:90], late, self.df.iloc[90:]], ignore_index=True)
+
+    def test_file_unsorted_after_the_first_chunks_is_read_to_the_end(self):
+        result = read_csv_range(csv_source(self.unsorted), ['s1', 's2'], '2024-01-01 00:05', '2024-01-01 00:10',
+                                chunksize=10)
+
+        expected = self.unsorted.set_index('created_at').sort_index().loc['2024-01-01 00:05':'2024-01-01 00:10']
+        pd.testing.assert_frame_equal(result, expected, check_freq=False)
+        self.assertIn(pd.Timestamp('2024-01-01 00:05:30'), result.index)
+
+    def test_sorted_file_can_stop_early(self):
+        source = csv_source(self.df)
+        result = read_csv_range(source, ['s1', 's2'], '2024-01-01 00:05', '2024-01-01 00:10', chunksize=10,
+                                assume_sorted=True)
+
+        expected = self.df.set_index('created_at').loc['2024-01-01 00:05':'2024-01-01 00:10']
+        pd.testing.assert_frame_equal(result, expected, check_freq=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import io
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from data_science.development.csv_ingest import read_csv_range
+from data_science.development.dataset_store import import_csv, load_dataset, load_analysis_frame, open_dataset
+
+
+class DatasetStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        times = pd.date_range('2024-01-01', periods=8, freq='min')
+        self.df = pd.DataFrame({
+            'created_at': times[[0, 1, 5, 2, 3, 7, 4, 6]],
+            's1': [1.0, np.nan, 6.0, 3.0, np.nan, 8.0, 5.0, 7.0],
+            's2': np.arange(8.0),
+            'label': ['a', None, 'c', 'd', 'e', None, 'g', 'h'],
+        })
+        self.content = self.df.to_csv(index=False).encode()
+        self.dataset_id = import_csv(self.content, datasets_dir=self.directory.name)
+
+    def test_rows_keep_file_order_and_missing_text(self):
+        stored = load_dataset(self.dataset_id, datasets_dir=self.directory.name)
+
+        expected = pd.read_csv(io.BytesIO(self.content), parse_dates=['created_at'])
+        np.testing.assert_array_equal(stored['created_at'].to_numpy(), expected['created_at'].to_numpy())
+        np.testing.assert_array_equal(stored['s1'].to_numpy(), expected['s1'].to_numpy())
+        self.assertEqual(stored['label'].isna().tolist(), expected['label'].isna().tolist())
+        self.assertEqual(stored['label'].dropna().tolist(), ['a', 'c', 'd', 'e', 'g', 'h'])
+
+    def test_time_ranges_match_reading_the_csv(self):
+        dataset = open_dataset(self.dataset_id, self.directory.name)
+        self.assertEqual(dataset.meta['start'], '2024-01-01T00:00:00')
+        self.assertEqual(dataset.meta['end'], '2024-01-01T00:07:00')
+
+        window = dataset.frame(['created_at', 's2'], '2024-01-01 00:02', '2024-01-01 00:05')
+        self.assertEqual(window['s2'].tolist(), [3.0, 4.0, 6.0, 2.0])
+
+        stored = load_analysis_frame(self.dataset_id, ['s1', 's2'], '2024-01-01 00:01', '2024-01-01 00:06',
+                                     datasets_dir=self.directory.name)
+        expected = read_csv_range(io.BytesIO(self.content), ['s1', 's2'], '2024-01-01 00:01', '2024-01-01 00:06')
+        np.testing.assert_allclose(stored.to_numpy(), expected.to_numpy())
+        np.testing.assert_array_equal(stored.index.to_numpy(), expected.index.to_numpy())
+
+
+if __name__ == '__main__':
+    unittest.main()
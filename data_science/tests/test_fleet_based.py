@@ -0,0 +1,42 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from data_science.algorithms.fleet_based import fleet_based
+from data_science.algorithms.multi_based import multi_based
+
+
+class FleetBasedTests(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(4)
+        n = 3000
+        self.streams = ['field1', 'field2', 'field3']
+        self.df = pd.DataFrame(rng.normal(size=(n, 3)), columns=self.streams)
+        self.df['device'] = rng.choice(['d1', 'd2', 'd3', 'd4'], size=n)
+        self.df['created_at'] = pd.date_range('2024-01-01', periods=n, freq='min', tz='Europe/Berlin')
+
+    def test_naive_bounds_are_read_in_the_timezone_of_the_data(self):
+        start, end = '2024-01-01 05:00', '2024-01-01 20:00'
+        result = fleet_based(self.df, self.streams, start_date=start, end_date=end, types='correlation')
+
+        for device, rows in self.df.groupby('device'):
+            expected = multi_based(rows.set_index('created_at'), self.streams, start, end, types=['correlation'])
+            for stream in self.streams:
+                self.assertAlmostEqual(result['metric'].at[device, stream],
+                                       expected['correlation'][stream]['avg_corr'], places=12)
+
+    def test_worker_processes_give_the_in_process_result(self):
+        in_process = fleet_based(self.df, self.streams, types='mean')
+        pooled = fleet_based(self.df, self.streams, types='mean', max_workers=2)
+        pd.testing.assert_frame_equal(pooled['metric'], in_process['metric'])
+
+    def test_rows_without_a_device_are_ignored(self):
+        expected = fleet_based(self.df, self.streams, types='volatility')
+        orphans = self.df.iloc[::7].assign(device=np.nan, field1=100.0)
+        result = fleet_based(pd.concat([orphans, self.df]), self.streams, types='volatility')
+        pd.testing.assert_frame_equal(result['metric'], expected['metric'], check_index_type=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
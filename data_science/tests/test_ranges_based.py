@@ -0,0 +1,38 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from data_science.algorithms.multi_based import multi_based
+from data_science.algorithms.ranges_based import ranges_based
+
+
+class RangesBasedTests(unittest.TestCase):
+    def test_quiet_range_matches_multi_based(self):
+        rng = np.random.default_rng(1)
+        n = 20000
+        base = rng.normal(size=(n, 3))
+        base[:, 1] += base[:, 0]
+        scale = np.where(np.arange(n) < n // 2, 1000.0, 0.01)[:, None]
+        df = pd.DataFrame(base * scale + [5.0, 50.0, -3.0], columns=list('abc'),
+                          index=pd.date_range('2024-01-01', periods=n, freq='s'))
+        streams = list('abc')
+        types = ['correlation', 'mean', 'volatility']
+        ranges = [('2024-01-01 04:00:00', '2024-01-01 04:00:59'),
+                  ('2024-01-01 00:00:00', '2024-01-01 05:00:00'),
+                  ('2024-01-01 05:00:00', None)]
+
+        results = ranges_based(df, streams, ranges, types=types)
+
+        for (start, end), result in zip(ranges, results):
+            expected = multi_based(df, streams, start, end, types=types)
+            for detector in types:
+                for stream in streams:
+                    self.assertAlmostEqual(result[detector][stream]['avg_corr'],
+                                           expected[detector][stream]['avg_corr'], places=9)
+                    self.assertEqual(result[detector][stream]['is_outlier'],
+                                     expected[detector][stream]['is_outlier'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+
+from data_science.development.result_cache import ResultCache
+
+
+class ResultCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_entries_round_trip_through_disk_without_pickle(self):
+        with open(os.path.join(self.directory.name, 'stale.pkl'), 'wb') as f:
+            pickle.dump({'old': 1}, f)
+        cache = ResultCache(self.directory.name)
+        cache.put('report', b'a,b\n1,2\n')
+        cache.put('corrs', {'s1-s2': np.float64(0.5), 's1-s3': float('nan')})
+
+        reopened = ResultCache(self.directory.name, max_memory_bytes=0)
+        self.assertEqual(reopened.get('report'), b'a,b\n1,2\n')
+        corrs = reopened.get('corrs')
+        self.assertEqual(corrs['s1-s2'], 0.5)
+        self.assertTrue(np.isnan(corrs['s1-s3']))
+        self.assertEqual(sorted(os.listdir(self.directory.name)), ['corrs.json', 'report.bin'])
+
+        stats = reopened.stats()
+        self.assertEqual((stats['hits_disk'], stats['disk_entries']), (2, 2))
+        self.assertEqual(stats['disk_bytes'], sum(
+            os.path.getsize(os.path.join(self.directory.name, name)) for name in os.listdir(self.directory.name)))
+
+    def test_disk_is_trimmed_least_recently_used_first(self):
+        cache = ResultCache(self.directory.name, max_memory_bytes=0, max_disk_bytes=250)
+        for key in ('a', 'b'):
+            cache.put(key, bytes(100))
+        cache.get('a')
+        cache.put('c', bytes(100))
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), bytes(100))
+        self.assertEqual(cache.stats()['disk_bytes'], 200)
+        self.assertEqual(sorted(os.listdir(self.directory.name)), ['a.bin', 'c.bin'])
+
+
+if __name__ == '__main__':
+    unittest.main()
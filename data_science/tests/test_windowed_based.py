@@ -0,0 +1,44 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from data_science.algorithms.windowed_based import windowed_based
+
+
+def pandas_window_correlation(df, window, stride):
+    """Average correlation of each stream with the others, window by window, using DataFrame.corr."""
+    metrics = []
+    for start in range(0, len(df) - window + 1, stride):
+        corr = df.iloc[start:start + window].corr().to_numpy().copy()
+        np.fill_diagonal(corr, np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            metrics.append(np.nansum(corr, axis=1) / (~np.isnan(corr)).sum(axis=1))
+    return np.array(metrics)
+
+
+class WindowedBasedTests(unittest.TestCase):
+    def test_quiet_windows_after_regime_change_match_pandas(self):
+        rng = np.random.default_rng(0)
+        n = 40000
+        base = rng.normal(size=(n, 4))
+        base[:, 1] += base[:, 0]
+        base[:, 2] -= 0.5 * base[:, 0]
+        # Loud first half, quiet second half: the quiet windows are tiny next to the prefix sums
+        scale = np.where(np.arange(n) < n // 2, 1000.0, 0.01)[:, None]
+        df = pd.DataFrame(base * scale + [5.0, 50.0, -3.0, 7.0], columns=list('abcd'),
+                          index=pd.date_range('2024-01-01', periods=n, freq='s'))
+        df.iloc[30000:30100, 3] = 2.0
+
+        result = windowed_based(df, list('abcd'), 50, 100, types='correlation')
+
+        metric = result['metric'].to_numpy()
+        expected = pandas_window_correlation(df, 50, 100)
+        np.testing.assert_array_equal(np.isnan(metric), np.isnan(expected))
+        np.testing.assert_allclose(metric, expected, rtol=0, atol=1e-9, equal_nan=True)
+        # Only the flat stretch of stream d has no correlation
+        self.assertEqual(np.isnan(metric).sum(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()